@@ -5,6 +5,7 @@ from catalog import constants
 from catalog.extensions.marshmallow import (
     Schema,
     fields,
+    validators,
 )
 
 __author__ = 'Kien.HT'
@@ -36,6 +37,12 @@ class UnitGetListRequest(Schema):
                           min_val=1, max_val=constants.SQL_MAX_INTVAL)
     page_size = fields.Integer(strict=False, allow_none=False, missing=10,
                                min_val=1, max_val=constants.MAX_PAGE_SIZE_INTERNAL)
+    include_total = fields.Boolean(allow_str=True, missing=True)
+    count_mode = fields.String(validate=validators.OneOf([
+        constants.COUNT_MODE.EXACT,
+        constants.COUNT_MODE.CACHED,
+        constants.COUNT_MODE.ESTIMATED,
+    ]))
 
 
 class UnitGetListResponse(Schema):
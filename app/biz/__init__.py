@@ -19,3 +19,5 @@ def on_teko_msg(arg):
 
 __author__ = 'Kien.HT'
 _logger = logging.getLogger(__name__)
+
+from . import import_jobs, create_product_chunks
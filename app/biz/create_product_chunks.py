@@ -0,0 +1,276 @@
+# coding=utf-8
+import logging
+
+from catalog import models as m, utils
+from catalog.biz.import_jobs import register_import_processor, parent_child_group
+from catalog.constants import UOM_CODE_ATTRIBUTE, UOM_RATIO_CODE_ATTRIBUTE
+from catalog.extensions import exceptions as exc, signals
+from catalog.models.db_constants import AttributeValueType
+from catalog.services import seller as seller_sv
+from catalog.services.attribute_sets.metadata import get_attribute_set_metadata
+from catalog.services.imports.resolvers import ReferenceDataResolver
+from catalog.services.products.bulk_create import BulkProductCreator
+from catalog.utils import safe_cast
+
+_logger = logging.getLogger(__name__)
+
+IMPORT_TYPE = 'create_product'
+
+_PRODUCT_COLUMNS = (
+    ('product name', 'Tên sản phẩm'),
+    ('category', 'Danh mục ngành hàng'),
+    ('brand', 'Thương hiệu'),
+    ('warranty months', 'Thời hạn bảo hành (tháng)'),
+    ('vendor tax', 'Thuế mua vào'),
+    ('product type', 'Loại hình sản phẩm'),
+)
+_VARIANT_COLUMNS = (
+    ('uom', 'Đơn vị tính'),
+    ('uom_ratio', 'Tỷ lệ so với đơn vị tính gốc'),
+)
+_YES = ('yes', 'có', 'true', '1')
+_EXPIRATION_TYPES = {'ngày': 1, 'tháng': 2}
+_OPTION_VALUE_TYPES = (AttributeValueType.SELECTION.value, AttributeValueType.MULTI_SELECT.value)
+
+
+def _cell(row, code):
+    value = row.get(code)
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value == '' else value
+
+
+def _text(row, code):
+    value = _cell(row, code)
+    return str(value) if value is not None else None
+
+
+def _int(row, code):
+    value = safe_cast(_cell(row, code), float)
+    return int(value) if value is not None else None
+
+
+def _yes(row, code):
+    return str(_cell(row, code)).lower() in _YES
+
+
+def _require(row, columns):
+    for code, title in columns:
+        if _cell(row, code) is None:
+            raise exc.BadRequestException(f'Thiếu thông tin {title}')
+
+
+def _row_type(row):
+    return str(row.get('type') or '').strip().lower()
+
+
+class ProductGroup(object):
+    """
+    Rows creating one product: a `don` row alone, or a `cha` row with the
+    `con` rows below it
+    """
+
+    def __init__(self, product_row, error=None):
+        self.product_row = product_row
+        self.variant_rows = []
+        self.error = error
+        self.tag = None
+
+    @property
+    def rows(self):
+        return [self.product_row] + [row for row in self.variant_rows if row is not self.product_row]
+
+
+def group_products(rows):
+    """
+    :param rows: list of (row index, row dict) in file order
+    :rtype: list[ProductGroup]
+    """
+    groups = []
+    parent = None
+    for row in rows:
+        row_type = _row_type(row[1])
+        if row_type == 'con':
+            if parent:
+                parent.variant_rows.append(row)
+            else:
+                groups.append(ProductGroup(row, 'Sản phẩm CON phải nằm ngay sau sản phẩm CHA'))
+            continue
+        parent = None
+        if row_type == 'don':
+            group = ProductGroup(row)
+            group.variant_rows.append(row)
+        elif row_type == 'cha':
+            group = parent = ProductGroup(row)
+            group.tag = utils.random_string(10)
+        else:
+            group = ProductGroup(row, f'Loại sản phẩm "{row[1].get("type")}" không hợp lệ')
+        groups.append(group)
+    for group in groups:
+        if not group.error and not group.variant_rows:
+            group.error = 'Sản phẩm CHA chưa có sản phẩm CON'
+    return groups
+
+
+class RowConverter(object):
+    """
+    Turn the rows of a create_product file, keyed by column code, into the
+    product and variant data of BulkProductCreator
+    """
+
+    def __init__(self, import_record, seller, session=None):
+        self.import_record = import_record
+        self.seller = seller
+        self.session = session or m.db.session
+        self.resolver = ReferenceDataResolver(seller_id=import_record.seller_id, session=self.session)
+        metadata = get_attribute_set_metadata(import_record.attribute_set_id, self.session)
+        self.attributes = [a for a in metadata['attributes']
+                           if a['code'] not in (UOM_CODE_ATTRIBUTE, UOM_RATIO_CODE_ATTRIBUTE)]
+        self.options = metadata['options']
+        self.uom_attributes = dict(self.session.query(m.Attribute.code, m.Attribute.id).filter(
+            m.Attribute.code.in_((UOM_CODE_ATTRIBUTE, UOM_RATIO_CODE_ATTRIBUTE))))
+
+    def product_data(self, row):
+        _require(row, _PRODUCT_COLUMNS)
+        return {
+            'name': _text(row, 'product name'),
+            'category_id': self.resolver.category_id(_cell(row, 'category')),
+            'master_category_id': self.resolver.master_category_id(_cell(row, 'master category')),
+            'attribute_set_id': self.import_record.attribute_set_id,
+            'brand_id': self.resolver.brand_id(_cell(row, 'brand')),
+            'model': _text(row, 'model'),
+            'warranty_months': _int(row, 'warranty months'),
+            'warranty_note': _text(row, 'warranty note'),
+            'tax_in_code': self.resolver.tax_code(_cell(row, 'vendor tax')),
+            'type': self.resolver.product_type_code(_cell(row, 'product type')),
+            'description': _text(row, 'short description'),
+            'detailed_description': _text(row, 'description'),
+        }
+
+    def _attribute_value(self, attribute, value):
+        if attribute['value_type'] not in _OPTION_VALUE_TYPES:
+            return str(value)
+        options = {str(o['value']).strip().lower(): o['id'] for o in self.options.get(attribute['id']) or []}
+        values = str(value).split(',') if attribute['value_type'] == AttributeValueType.MULTI_SELECT.value \
+            else [str(value)]
+        ids = []
+        for item in values:
+            option_id = options.get(item.strip().lower())
+            if option_id is None:
+                raise exc.BadRequestException(f'Giá trị "{item.strip()}" của thuộc tính {attribute["name"]} '
+                                              f'không tồn tại trên hệ thống')
+            ids.append(str(option_id))
+        return ','.join(ids)
+
+    def _attributes(self, row):
+        ratio = safe_cast(_cell(row, 'uom_ratio'), float)
+        if not ratio or ratio <= 0:
+            raise exc.BadRequestException('Tỷ lệ so với đơn vị tính gốc không hợp lệ')
+        attributes = [
+            {'id': self.uom_attributes.get(UOM_CODE_ATTRIBUTE), 'value': self.resolver.uom_id(_cell(row, 'uom'))},
+            {'id': self.uom_attributes.get(UOM_RATIO_CODE_ATTRIBUTE), 'value': ratio},
+        ]
+        for attribute in self.attributes:
+            value = _cell(row, attribute['code'].lower())
+            if value is None:
+                if attribute['is_variation']:
+                    raise exc.BadRequestException(f'Thiếu thông tin {attribute["name"]}')
+                continue
+            attributes.append({
+                'id': attribute['id'],
+                'value': self._attribute_value(attribute, value),
+                'is_variation': bool(attribute['is_variation']),
+            })
+        return attributes
+
+    def variant_data(self, row):
+        _require(row, _VARIANT_COLUMNS)
+        if not self.seller.get('isAutoGeneratedSKU'):
+            _require(row, (('sku', 'SKU'),))
+        created_by = self.import_record.created_by
+        terminal_groups = [code.strip().split('=>')[0].strip()
+                           for code in str(_cell(row, 'terminal_group') or '').split(',') if code.strip()]
+        for code in terminal_groups:
+            self.resolver.terminal_group_id(code)
+        expiration_type = _text(row, 'expiration type')
+        sellable = {
+            'created_by': created_by,
+            'barcode': _text(row, 'barcode'),
+            'part_number': _text(row, 'part number'),
+            'allow_selling_without_stock': _yes(row, 'allow selling without stock?'),
+            'manage_serial': _yes(row, 'is tracking serial?'),
+            'expiry_tracking': _yes(row, 'expiry tracking'),
+            'expiration_type': _EXPIRATION_TYPES.get(expiration_type.lower(), safe_cast(expiration_type, int))
+            if expiration_type else None,
+            'days_before_exp_lock': _int(row, 'days before exp lock'),
+            'shipping_types': self.resolver.shipping_type_ids(_cell(row, 'shipping type')),
+            'terminal_groups': terminal_groups,
+            'short_description': _text(row, 'short description'),
+            'description': _text(row, 'description'),
+        }
+        if not self.seller.get('isAutoGeneratedSKU'):
+            sellable['seller_sku'] = _text(row, 'sku')
+        return {
+            'attributes': self._attributes(row),
+            'images': [{'url': url.strip()} for url in (_text(row, 'image urls') or '').splitlines() if url.strip()],
+            'sellable': sellable,
+        }
+
+
+def _result(import_record, group, index_row, status, message, product_id=None, sku=None):
+    _, row = index_row
+    data = dict(row)
+    if sku:
+        data['sku'] = sku
+    return m.ResultImport(
+        import_id=import_record.id,
+        status=status,
+        message=message,
+        tag=group.tag,
+        product_id=product_id,
+        data=data,
+    )
+
+
+@register_import_processor(IMPORT_TYPE, joins_previous=parent_child_group)
+def process_create_product_rows(import_record, rows):
+    """
+    Create the products of a chunk of a create_product file with
+    BulkProductCreator, then write the ResultImport of each row. The
+    products and their results are committed together.
+    """
+    from catalog.biz.result_import import ImportStatus
+
+    seller = seller_sv.get_seller_by_id(import_record.seller_id)
+    converter = RowConverter(import_record, seller)
+    creator = BulkProductCreator(seller, import_record.created_by)
+    groups = group_products([(index, {str(k).strip().lower(): v for k, v in row.items()}) for index, row in rows])
+    for key, group in enumerate(groups):
+        if group.error:
+            continue
+        try:
+            creator.add(key, converter.product_data(group.product_row[1]),
+                        [converter.variant_data(row) for _, row in group.variant_rows])
+        except exc.BadRequestException as e:
+            group.error = e.message
+    created = {result.key: result for result in creator.save(commit=False)}
+
+    succeeded = 0
+    with signals.outbox():
+        for key, group in enumerate(groups):
+            result = created.get(key)
+            error = group.error or (result.error if result else None)
+            if error:
+                m.db.session.add_all([_result(import_record, group, row, ImportStatus.FAILURE, error)
+                                      for row in group.rows])
+                continue
+            skus = {index: sellable.sku for (index, _), sellable in zip(group.variant_rows, result.sellables)}
+            for row in group.rows:
+                m.db.session.add(_result(import_record, group, row, ImportStatus.SUCCESS, 'Thành công',
+                                         product_id=result.product.id, sku=skus.get(row[0])))
+            succeeded += len(group.rows)
+            for sellable in result.sellables:
+                signals.stage(signals.sellable_create_signal, sellable)
+        m.db.session.commit()
+    _logger.info(f'Import {import_record.id}: {succeeded}/{len(rows)} rows of a chunk imported')
+    return succeeded
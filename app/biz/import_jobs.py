@@ -0,0 +1,232 @@
+# coding=utf-8
+import json
+import logging
+
+import celery as _celery
+from sqlalchemy import func
+
+import config
+from catalog import celery, models as m
+from catalog.extensions import signals
+from catalog.services.imports.file_import import ImportFile
+from catalog.services.imports.reader import ImportFileReader
+from catalog.services.imports.spool import open_import_file, upload_spooled_file
+
+_logger = logging.getLogger(__name__)
+
+STATUS_PROCESSING = 'processing'
+STATUS_DONE = 'done'
+STATUS_ERROR = 'error'
+
+_processors = {}
+
+
+class ChunkProcessor(object):
+    def __init__(self, process_rows, joins_previous=None):
+        self.process_rows = process_rows
+        self.joins_previous = joins_previous
+
+
+def register_import_processor(import_type, joins_previous=None):
+    """
+    Register the function importing a chunk of rows of `import_type`:
+    `process_rows(import_record, rows)` gets a list of (row index, row dict),
+    writes the ResultImport of each row and returns the number of rows
+    imported successfully. Rows are stored as JSON between the dispatch and
+    the chunk task, dates come as strings.
+
+    :param joins_previous: function(row) telling whether a row must be
+        imported with the row before it, such rows are never split across
+        chunks
+    """
+    def decorator(process_rows):
+        _processors[import_type] = ChunkProcessor(process_rows, joins_previous)
+        return process_rows
+
+    return decorator
+
+
+def parent_child_group(row):
+    """
+    `con` rows belong to the `cha` row above them and stay in its chunk
+    """
+    return str(row.get('type') or '').strip().lower() == 'con'
+
+
+def split_chunks(rows, chunk_size, joins_previous=None):
+    """
+    :param rows: iterable of row dicts
+    :return: list of (start, end) row index ranges, end excluded
+    """
+    chunks = []
+    start = 0
+    count = 0
+    for index, row in enumerate(rows):
+        in_group = joins_previous(row) if joins_previous else False
+        if index - start >= chunk_size and not in_group:
+            chunks.append((start, index))
+            start = index
+        count = index + 1
+    if count > start:
+        chunks.append((start, count))
+    return chunks
+
+
+def _importer_cls(import_type):
+    return next((cls for cls in ImportFile.__subclasses__() if cls.IMPORT_FILE_TYPE == import_type), ImportFile)
+
+
+def _open_import_file(import_record):
+    importer_cls = _importer_cls(import_record.type)
+    return ImportFileReader(open_import_file(import_record), sheet_name=importer_cls.SHEET_NAME,
+                            title_row_offset=importer_cls.TITLE_ROW_OFFSET,
+                            code_row_offset=importer_cls.CODE_ROW_OFFSET)
+
+
+def dispatch_import(import_id, chunk_size=None):
+    """
+    Split an import into chunks of rows imported by parallel celery tasks.
+    The file is read once here, the rows of each chunk are stored with it
+    so a chunk task reads only its own rows. Each chunk adds its successful
+    rows to `total_row_success` and the import is done once every chunk is.
+
+    :return: False if no chunk processor is registered for the import type,
+        the caller then imports the file in one task as before
+    """
+    import_record = m.FileImport.query.get(import_id)
+    processor = _processors.get(import_record.type) if import_record else None
+    if not processor:
+        return False
+
+    with _open_import_file(import_record) as reader:
+        rows = list(reader.iter_rows())
+    chunks = []
+    for start, end in split_chunks(rows, chunk_size or config.IMPORT_CHUNK_SIZE, processor.joins_previous):
+        chunk = m.ImportChunk(import_id=import_id, start_row=start, end_row=end,
+                              rows=json.dumps(rows[start:end], default=str))
+        m.db.session.add(chunk)
+        chunks.append(chunk)
+    import_record.status = STATUS_PROCESSING if chunks else STATUS_DONE
+    m.db.session.commit()
+    if chunks:
+        _celery.chord(
+            process_import_chunk.s(import_id, chunk.id) for chunk in chunks
+        )(finish_import.s(import_id).on_error(fail_import.s(import_id)))
+    _logger.info(f'Import {import_id}: {len(chunks)} chunks dispatched')
+    return True
+
+
+@celery.task()
+def process_import_chunk(import_id, chunk_id):
+    """
+    Import the rows of a chunk, a chunk delivered again is not imported
+    twice. A failing chunk is marked failed and the other chunks go on.
+    """
+    claimed = m.ImportChunk.query.filter(
+        m.ImportChunk.id == chunk_id,
+        m.ImportChunk.status == m.ImportChunk.STATUS_PENDING
+    ).update({m.ImportChunk.status: STATUS_PROCESSING}, synchronize_session=False)
+    m.db.session.commit()
+    chunk = m.ImportChunk.query.get(chunk_id)
+    if not claimed:
+        _logger.warning(f'Import {import_id}: chunk {chunk.start_row}-{chunk.end_row} is already {chunk.status}')
+        return chunk.succeeded
+
+    import_record = m.FileImport.query.get(import_id)
+    processor = _processors[import_record.type]
+    rows = list(enumerate(json.loads(chunk.rows), chunk.start_row))
+    try:
+        succeeded = processor.process_rows(import_record, rows) or 0
+        chunk.status = m.ImportChunk.STATUS_DONE
+    except Exception as e:
+        _logger.exception(f'Import {import_id}: chunk {chunk.start_row}-{chunk.end_row} failed: {e}')
+        m.db.session.rollback()
+        chunk = m.ImportChunk.query.get(chunk_id)
+        succeeded = 0
+        chunk.status = m.ImportChunk.STATUS_FAILED
+    chunk.succeeded = succeeded
+    chunk.rows = None
+    # chunks finish concurrently: the counter is incremented in SQL without
+    # reading the other chunks, which would lock their rows, and the claim
+    # above makes sure a chunk adds its rows only once
+    m.FileImport.query.filter(m.FileImport.id == import_id).update({
+        m.FileImport.total_row_success: func.coalesce(m.FileImport.total_row_success, 0) + succeeded
+    }, synchronize_session=False)
+    m.db.session.commit()
+    return succeeded
+
+
+@celery.task()
+def finish_import(results, import_id):
+    failed = m.ImportChunk.query.filter(
+        m.ImportChunk.import_id == import_id,
+        m.ImportChunk.status != m.ImportChunk.STATUS_DONE
+    ).count()
+    import_record = m.FileImport.query.get(import_id)
+    import_record.status = STATUS_ERROR if failed else STATUS_DONE
+    m.db.session.commit()
+    _logger.info(f'Import {import_id}: {sum(results)} rows imported, {failed} chunks failed')
+
+
+@celery.task()
+def fail_import(request, exc, traceback, import_id):
+    """
+    Errback of the chord, the import can not finish normally when a chunk
+    task itself is lost or raises
+    """
+    _logger.error(f'Import {import_id}: chunk task {request.id} failed: {exc}')
+    m.FileImport.query.filter(m.FileImport.id == import_id).update({
+        m.FileImport.status: STATUS_ERROR,
+    }, synchronize_session=False)
+    m.db.session.commit()
+
+
+@celery.task(bind=True, acks_late=True, max_retries=config.FILE_UPLOAD_RETRIES)
+def upload_import_file(self, import_id, content_type=None):
+    """
+    Push a spooled import file to the file service, store its url in `path`
+    then start the import: as chunk tasks when its type has a chunk
+    processor, with the AFTER_IMPORT_SIGNAL of its type otherwise, as the
+    importers download the file from `path`. The task is acknowledged once
+    done, so it runs again if its worker stops meanwhile.
+    """
+    import_record = m.FileImport.query.get(import_id)
+    if not import_record or import_record.path:
+        return
+    try:
+        url = upload_spooled_file(import_record, content_type)
+    except IOError as e:
+        _logger.warning(f'Import {import_id}: upload attempt {self.request.retries + 1} failed: {e}')
+        if self.request.retries >= self.max_retries:
+            # the spooled file is kept, see spool._prune
+            m.FileImport.query.filter(m.FileImport.id == import_id).update(
+                {m.FileImport.status: STATUS_ERROR}, synchronize_session=False)
+            m.db.session.commit()
+            raise
+        raise self.retry(exc=e, countdown=2 ** self.request.retries)
+    m.FileImport.query.filter(m.FileImport.id == import_id).update(
+        {m.FileImport.path: url}, synchronize_session=False)
+    m.db.session.commit()
+
+    try:
+        if dispatch_import(import_id):
+            return
+    except Exception as e:
+        # the task does not run again once `path` is set
+        _logger.exception(f'Import {import_id}: can not dispatch chunks: {e}')
+        m.db.session.rollback()
+        m.FileImport.query.filter(m.FileImport.id == import_id).update(
+            {m.FileImport.status: STATUS_ERROR}, synchronize_session=False)
+        m.db.session.commit()
+        return
+
+    after_import_signal = _importer_cls(import_record.type).AFTER_IMPORT_SIGNAL
+    if after_import_signal:
+        after_import_signal.send({
+            'id': import_id,
+        })
+
+
+@signals.on_import_file_spooled
+def on_import_file_spooled(params):
+    upload_import_file.delay(params['id'], params.get('content_type'))
@@ -33,6 +33,12 @@ class RAM_QUEUE:
     RAM_PLATFORM_SELLER_UPSERT_KEY = 'catalog.platform_seller.upsert'
 
 
+class COUNT_MODE:
+    EXACT = 'exact'
+    CACHED = 'cached'
+    ESTIMATED = 'estimated'
+
+
 class ExportSellable:
     EXPORT_GENERAL_INFO = 1
     EXPORT_ALL_ATTRIBUTE = 2
@@ -18,6 +18,20 @@ __author__ = 'Kien'
 _logger = logging.getLogger(__name__)
 
 
+def _sparse_only(schema_cls, sparse_key, fields, **kwargs):
+    """
+    `only` option of `schema_cls` keeping every top-level field but
+    restricting the items nested under `sparse_key` to `fields`
+    """
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    schema = schema_cls(**kwargs)
+    item_fields = schema.fields[sparse_key].schema.fields
+    return tuple(name for name in schema.fields if name != sparse_key) + tuple(
+        f'{sparse_key}.{name}' for name in fields if name in item_fields
+    )
+
+
 class Namespace(OriginalNamespace):
     def expect(self, schema_cls, location, **kwargs):
         """wargs
@@ -58,7 +72,7 @@ class Namespace(OriginalNamespace):
         return request_handle_wrapper
 
     def marshal_with(self, schema_cls, as_list=False,
-                     code=HTTPStatus.OK, description=None, **kwargs):
+                     code=HTTPStatus.OK, description=None, sparse_key=None, **kwargs):
         """
         A decorator specifying the fields to use for serialization.
 
@@ -68,16 +82,23 @@ class Namespace(OriginalNamespace):
         :param int code: Optionally give the expected HTTP response code
                             if its different from 200
         :param description:
+        :param str sparse_key: nested list field trimmed to the `fields`
+                            request argument, if any
         """
         def wrapper(func):
             def request_handle_decorator(*args, **kw):
+                schema_kwargs = kwargs
+                fields = getattr(g, 'args', {}).get('fields') if sparse_key else None
+                if fields:
+                    schema_kwargs = dict(kwargs, only=_sparse_only(schema_cls, sparse_key, fields, **kwargs))
+
                 def dump_from_schema(data, as_list):
                     if not as_list or not isinstance(data, list):
-                        return schema_cls(**kwargs).dump(data)
+                        return schema_cls(**schema_kwargs).dump(data)
                     else:
                         result = []
                         for d in data:
-                            result.append(schema_cls(**kwargs).dump(d))
+                            result.append(schema_cls(**schema_kwargs).dump(d))
                         return result
                 rv = func(*args, **kw)
                 if isinstance(rv, tuple):
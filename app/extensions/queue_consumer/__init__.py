@@ -4,17 +4,23 @@ lý tương ứng trong code.
 
 Cách làm như sau:
 
-Lắng nghe trên message queue, với mỗi message nhận được:
+Lắng nghe trên message queue, nhận msg theo từng batch (tối đa prefetch msg
+hoặc chờ tối đa batch_wait_ms), với mỗi msg trong batch:
   1. Gọi hàm xử lý message: thông qua Blinker Signal
-  2. Nếu mọi thứ OK (không Exception): lưu trạng thái msg trả về thành công,
-  gửi ACK tới rabbitmq.
-  3. Nếu mọi thứ không OK (Có Exception): lưu log msg vào db
+  2. Nếu mọi thứ OK (không Exception): lưu trạng thái msg trả về thành công
+  3. Nếu mọi thứ không OK (Có Exception): lưu traceback vào msg log
+Sau đó lưu log của cả batch vào db trong 1 transaction và gửi ACK tới rabbitmq.
 
 """
 import logging
+import threading
+import time
+from queue import Queue, Empty
+
 import rabbitpy
 from sqlalchemy import orm
 
+import config
 from catalog import models as m
 from catalog import utils
 from catalog.extensions.sqlalchemy_utils import json_encode
@@ -29,7 +35,7 @@ class QueueConsumer(object):
     """
     Thực hiện lắng nghe msgqueue
     """
-    def __init__(self, amqp_url, queue_name, debug=False):
+    def __init__(self, amqp_url, queue_name, debug=False, prefetch=None, batch_wait_ms=None):
         """
         Tạo 1 đối tượng QueueConsumer kết nối tới rabbitmq và lắng nghe msg
         trên queue_name
@@ -37,13 +43,19 @@ class QueueConsumer(object):
         :param amqp_url: rabbitmq connection string
         :param queue_name: queue name
         :param debug: forward exception
+        :param prefetch: max number of unacked msgs, also the batch size
+        :param batch_wait_ms: max time waiting for a batch to fill up
         """
         self._amqp_url = amqp_url
         self._queue_name = queue_name
         self._debug = debug
+        self._prefetch = prefetch or config.QUEUE_CONSUMER_PREFETCH
+        self._batch_wait = (config.QUEUE_CONSUMER_BATCH_WAIT_MS if batch_wait_ms is None else batch_wait_ms) / 1000
+        # one session maker for the msg logs of every batch
+        self._session_maker = orm.sessionmaker(bind=m.db.engine)
 
-    def _save_message_to_db(self, msg, queue_name):
-        """ Lưu msg vào DB.
+    def _build_msg_log(self, msg, queue_name):
+        """ Tạo msg log, chưa lưu vào DB.
 
         :param msg:
         :param queue_name:
@@ -52,7 +64,7 @@ class QueueConsumer(object):
         def ensure_str(s):
             return s.decode() if isinstance(s, (bytes, bytearray)) else s
 
-        msg_log = m.MsgLog(
+        return m.MsgLog(
             routing_key=msg.routing_key,
             exchange=msg.exchange,
             queue=queue_name or self._queue_name,
@@ -63,35 +75,69 @@ class QueueConsumer(object):
             )
         )
 
-        # create another session to manage the msg_log
-        session_maker = orm.sessionmaker(bind=m.db.engine)
-        session = session_maker()
-        session.add(msg_log)
-        session.commit()
-
-        msg_id = msg_log.id
-        session.close()
-        return msg_id
+    def _save_messages_to_db(self, msg_logs):
+        """ Lưu log của 1 batch msg vào DB trong 1 transaction.
 
-    def _on_msg_received(self, msg, queue_name=None):
+        :param msg_logs:
+        :return:
+        """
+        session = self._session_maker()
+        try:
+            session.bulk_save_objects(msg_logs)
+            session.commit()
+        finally:
+            session.close()
+
+    def _on_msgs_received(self, msgs, queue_name=None):
         """
-        Xử lý khi nhận được 1 message từ RabbitMQ.
+        Xử lý 1 batch message nhận được từ RabbitMQ: xử lý từng msg, lưu log
+        của cả batch rồi ACK 1 lần cho cả batch. Nếu consumer dừng giữa
+        chừng, các msg chưa ACK sẽ được RabbitMQ gửi lại.
 
-        :param rabbitpy.message.Message msg:
+        :param list[rabbitpy.message.Message] msgs:
         :param queue_name:
         :return:
         """
-        msg_id = self._save_message_to_db(
-            msg,
-            queue_name=queue_name or self._queue_name
-        )
-        msg.ack()
-
-        message_processor.MessageProcessor.process_message(
-            msg_id=msg_id,
-            queue_name=queue_name,
-            debug=self._debug
-        )
+        queue_name = queue_name or self._queue_name
+        msg_logs = []
+        try:
+            for msg in msgs:
+                msg_log = self._build_msg_log(msg, queue_name)
+                msg_logs.append(msg_log)
+                MessageProcessor.process_message(
+                    msg=msg_log,
+                    queue_name=queue_name,
+                    debug=self._debug
+                )
+        finally:
+            if msg_logs:
+                self._save_messages_to_db(msg_logs)
+                msgs[len(msg_logs) - 1].ack(all_previous=True)
+
+    def _receive(self, queue, buffer):
+        try:
+            for message in queue.consume(prefetch=self._prefetch):
+                _logger.info('Received message:\n%s\n%s\n%s' % (
+                    message.routing_key,
+                    message.properties,
+                    message.body,
+                ))
+                buffer.put(message)
+        except Exception as e:
+            buffer.put(e)
+
+    def _next_batch(self, buffer):
+        batch = [buffer.get()]
+        deadline = time.monotonic() + self._batch_wait
+        while len(batch) < self._prefetch and not isinstance(batch[-1], Exception):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(buffer.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
 
     def run(self):
         """
@@ -102,15 +148,17 @@ class QueueConsumer(object):
         with rabbitpy.Connection(self._amqp_url) as conn:
             with conn.channel() as channel:
                 queue = rabbitpy.Queue(channel, self._queue_name)
+                buffer = Queue()
+                threading.Thread(target=self._receive, args=(queue, buffer), daemon=True).start()
 
                 # Consume msg
-                for message in queue:
-                    _logger.info('Received message:\n%s\n%s\n%s' % (
-                        message.routing_key,
-                        message.properties,
-                        message.body,
-                    ))
-                    self._on_msg_received(
-                        msg=message,
-                        queue_name=queue.name
-                    )
+                while True:
+                    batch = self._next_batch(buffer)
+                    msgs = [msg for msg in batch if not isinstance(msg, Exception)]
+                    if msgs:
+                        self._on_msgs_received(
+                            msgs=msgs,
+                            queue_name=queue.name
+                        )
+                    if len(msgs) < len(batch):
+                        raise batch[-1]
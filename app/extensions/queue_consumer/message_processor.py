@@ -3,7 +3,6 @@ import logging
 import json
 import traceback
 from werkzeug import local
-from sqlalchemy import orm
 from flask import current_app
 
 from catalog import models as m
@@ -33,17 +32,16 @@ class MessageProcessor(object):
         - Lưu exception vào ReceivedMesssage.error
     """
 
-    def __init__(self, msg_id, queue_name, debug=False):
+    def __init__(self, msg, queue_name, debug=False):
         """
 
-        :param msg_id:
+        :param m.MsgLog msg: message built by the consumer, saved with its
+            batch once processed
         :param queue_name:
         :param debug:
         """
-        self.msg = m.MsgLog.query.get(msg_id)  # type: m.MsgLog
+        self.msg = msg  # type: m.MsgLog
         self.queue_name = queue_name
-        self.session_maker = orm.sessionmaker(bind=m.db.engine)
-        self.session = self.session_maker()
         self._debug = debug
 
     def process(self):
@@ -76,9 +74,6 @@ class MessageProcessor(object):
             self.msg.error_message = repr(exc_val)
             self.msg.log = traceback_info
             self.msg.status = m.MsgLog.Status.failed
-
-            self.session.commit()
-            self.session.close()
         else:
             self.msg.status = m.MsgLog.Status.ok
 
@@ -86,14 +81,14 @@ class MessageProcessor(object):
             return True
 
     @classmethod
-    def process_message(cls, msg_id, queue_name, debug=False):
+    def process_message(cls, msg, queue_name, debug=False):
         """
 
-        :param msg_id:
+        :param m.MsgLog msg:
         :param queue_name:
         :param debug:
         :return:
         """
-        with MessageProcessor(msg_id, queue_name, debug=debug) as processor:
+        with MessageProcessor(msg, queue_name, debug=debug) as processor:
             with current_app.app_context():
                 processor.process()
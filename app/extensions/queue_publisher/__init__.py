@@ -1,4 +1,7 @@
 import logging
+import os
+import threading
+from contextlib import contextmanager
 
 import pika
 
@@ -7,6 +10,101 @@ _logger = logging.getLogger(__name__)
 
 from catalog import app
 
+# errors after which the connection is dropped and the publish retried once
+_RECONNECT_ERRORS = (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError)
+
+
+class _PooledConnection(object):
+    """
+    A connection with a channel in confirm mode, for single messages, and a
+    transactional channel, for batches, both opened lazily
+    """
+
+    def __init__(self, amqp_url):
+        self.connection = pika.BlockingConnection(pika.URLParameters(amqp_url))
+        self._channel = None
+        self._tx_channel = None
+
+    @property
+    def channel(self):
+        if self._channel is None:
+            self._channel = self.connection.channel()
+            self._channel.confirm_delivery()
+        return self._channel
+
+    @property
+    def tx_channel(self):
+        if self._tx_channel is None:
+            self._tx_channel = self.connection.channel()
+            self._tx_channel.tx_select()
+        return self._tx_channel
+
+    @property
+    def is_open(self):
+        return self.connection.is_open
+
+    def close(self):
+        try:
+            if self.connection.is_open:
+                self.connection.close()
+        except Exception as e:
+            _logger.warning(f'Can not close AMQP connection: {e}')
+
+
+class ConnectionPool(object):
+    """
+    Connections kept open between publishes, one pool per process: a forked
+    child does not reuse the sockets of its parent
+    """
+
+    def __init__(self, amqp_url, max_size):
+        self._amqp_url = amqp_url
+        self._max_size = max_size
+        self._idle = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._idle = []
+                self._pid = os.getpid()
+            while self._idle:
+                connection = self._idle.pop()
+                if connection.is_open:
+                    return connection
+        return _PooledConnection(self._amqp_url)
+
+    def _release(self, connection):
+        with self._lock:
+            if self._pid == os.getpid() and len(self._idle) < self._max_size and connection.is_open:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    @contextmanager
+    def connection(self):
+        connection = self._acquire()
+        try:
+            yield connection
+        except BaseException:
+            # the channels may be left mid-transaction, never hand them out again
+            connection.close()
+            raise
+        else:
+            self._release(connection)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(amqp_url):
+    with _pools_lock:
+        if amqp_url not in _pools:
+            _pools[amqp_url] = ConnectionPool(amqp_url, app.config['AMQP_CONNECTION_POOL_SIZE'])
+        return _pools[amqp_url]
+
 
 class QueuePublisher(object):
     def __init__(self, exchange=None, debug=False):
@@ -18,18 +116,59 @@ class QueuePublisher(object):
         """
         self._amqp_url = app.config['TEKO_AMQP_URL']
         self._exchange = app.config.get('CATALOG_EXCHANGE', 'teko.catalog')
+        self._pool = _get_pool(self._amqp_url)
 
-    def publish_message(self, message=None, routing_key=None, headers=None):
-        connection = pika.BlockingConnection(pika.URLParameters(self._amqp_url))
-        channel = connection.channel()
-        properties = pika.BasicProperties(
+    def _properties(self, headers):
+        return pika.BasicProperties(
             app_id='catalog-service',
             headers=headers
         )
-        channel.basic_publish(
+
+    def _with_connection(self, publish):
+        try:
+            with self._pool.connection() as connection:
+                return publish(connection)
+        except _RECONNECT_ERRORS as e:
+            _logger.warning(f'AMQP connection lost, reconnecting: {e}')
+        with self._pool.connection() as connection:
+            return publish(connection)
+
+    def publish_message(self, message=None, routing_key=None, headers=None):
+        """
+        Publish one message and wait for the broker to confirm it
+        """
+        self._with_connection(lambda connection: connection.channel.basic_publish(
             exchange=self._exchange,
             routing_key=routing_key,
             body=message,
-            properties=properties
-        )
-        connection.close()
+            properties=self._properties(headers)
+        ))
+
+    def publish_many(self, messages, batch_size=None):
+        """
+        Publish messages in batches, each batch committed in one broker
+        transaction so it is either fully accepted or retried as a whole
+
+        :param list[dict] messages: keyword arguments of `publish_message`
+        :return: number of published messages
+        """
+        messages = list(messages)
+        batch_size = batch_size or app.config['AMQP_PUBLISH_BATCH_SIZE']
+
+        def _publish_batch(batch):
+            def _publish(connection):
+                channel = connection.tx_channel
+                for item in batch:
+                    channel.basic_publish(
+                        exchange=self._exchange,
+                        routing_key=item.get('routing_key'),
+                        body=item.get('message'),
+                        properties=self._properties(item.get('headers'))
+                    )
+                channel.tx_commit()
+
+            self._with_connection(_publish)
+
+        for i in range(0, len(messages), batch_size):
+            _publish_batch(messages[i:i + batch_size])
+        return len(messages)
@@ -1,17 +1,25 @@
 import json
 import logging
+import threading
+import time
+from datetime import datetime, timedelta
 
 import config
 
 from catalog.biz.category.category import can_create_category_on_srm
 from catalog.biz.listing import push_sellable_product_detail
+from catalog.extensions.ram_queue_consumer.batch import BatchHandler, BatchRamConsumer
+from catalog.extensions.ram_queue_consumer.parallel import PartitionedRamConsumer
+from catalog.extensions.ram_queue_consumer.content_hash import ContentHashes, content_hash, TARGET_DETAIL_V2, \
+    TARGET_SELLABLE_PUSH, TARGET_DETAIL_PUSH
 from catalog.extensions.ram_queue_consumer.sellable_product_consummer import ProductDetail
 from contextlib import contextmanager
 
 from google.protobuf import json_format
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 
-from catalog import models, producer
+from catalog import app, models, producer
 from catalog.biz.brand_upsert import brand_pb2
 from catalog.biz.category import CategoryMessage, CategorySchema, CategoryUpdateMessage, CategoryUpdateSchema
 from catalog.biz.listing import update_product_detail_table, update_product_detail_by_brand, \
@@ -24,6 +32,7 @@ from catalog.extensions.queue_publisher import QueuePublisher
 from catalog.extensions.signals import ram_category_created_signal, platform_seller_upsert_created_signal
 from catalog.services import seller as seller_service
 from catalog.services.seller import get_platform_by_seller_id
+from catalog.utils.fan_out import fan_out_by_id_range
 from ram.v1_0.consumer.ram_consumer import RamConsumer
 from ram.v1_0.stop_retry_exception import StopRetryException
 from ram.v1_0.ram_config import DEFAULT_PARENT_KEY
@@ -92,18 +101,20 @@ def _process_category_upsert(session, object_message, event='created'):
         message = CategoryMessage()
         data = CategorySchema().dump(category)
     messages = []
+    outgoing = []
     seller_ids = _get_category_seller_ids(object_message, category.seller_id)
     for seller_id in seller_ids:
         for key, value in data.items():
             if value is not None:
                 setattr(message, key, value)
         setattr(message, 'sellerId', seller_id)
-        _push_message(
-            message=message,
-            routing_key=routing_key,
-            headers=headers
-        )
+        outgoing.append({
+            'message': message.SerializeToString(),
+            'routing_key': routing_key,
+            'headers': headers
+        })
         messages.append(message)
+    QueuePublisher().publish_many(outgoing)
     return messages
 
 
@@ -185,10 +196,21 @@ def process_update_brand(message):
         # Sync product details
         updated_by = brand.updated_by or 'system'
         update_product_detail_by_brand(brand.id, updated_by=updated_by)
-        select_skus = f'''select id, "{DEFAULT_PARENT_KEY}", "{RAM_QUEUE.RAM_UPDATE_PRODUCT_DETAIL_V2}", 1,
-                        "CREATED", JSON_OBJECT("sku", sku, "updated_by", "{updated_by}"), now()
-                        FROM sellable_products where brand_id = {brand.id}'''
-        producer.send_by_select(session, select_skus)
+
+        def _send_chunk(chunk_session, start_id, end_id):
+            select_skus = f'''select id, "{DEFAULT_PARENT_KEY}", "{RAM_QUEUE.RAM_UPDATE_PRODUCT_DETAIL_V2}", 1,
+                            "CREATED", JSON_OBJECT("sku", sku, "updated_by", "{updated_by}"), now()
+                            FROM sellable_products where brand_id = {brand.id}
+                            AND id BETWEEN {start_id} AND {end_id}'''
+            producer.send_by_select(chunk_session, select_skus)
+
+        # own session, the chunks commit and must not commit the brand scope
+        fan_out_session = Session()
+        try:
+            fan_out_by_id_range(fan_out_session, f'brand_v2:{brand.id}', f' WHERE a.brand_id = {brand.id}',
+                                _send_chunk)
+        finally:
+            fan_out_session.close()
 
 
 def process_update_attribute(message):
@@ -214,62 +236,245 @@ def process_update_attribute(message):
     #     producer.send_by_select(session, select_skus)
 
 
+def _push_product_data(session, obj):
+    """
+    :return: kwargs of `publish_message` for the sellable, None when there
+        is nothing to push
+    """
+    sellable_product = session.query(models.SellableProduct).get(obj.get('id'))
+    sellable_product.set_seller_category_code(session)
+    routing_key = obj.get('routing_key', 'teko.catalog.sellable.updated')
+    if routing_key == 'teko.catalog.sellable.created':
+        message_scheme = sellable_pb2.SellableMessage()
+        data = SellableCreateSchema().dump(sellable_product)
+    else:
+        data = SellableUpdateSchema().dump(sellable_product)
+        message_scheme = sellable_update_pb2.SellableUpdateMessage()
+    if data.get('categCode'):
+        if routing_key != 'teko.catalog.sellable.created':
+            hashes = ContentHashes(session, TARGET_SELLABLE_PUSH, [sellable_product.sku])
+            if not hashes.changed(sellable_product.sku, content_hash(data)):
+                return None
+        message = json_format.ParseDict(data, message_scheme, ignore_unknown_fields=True)
+        return {
+            'sku': sellable_product.sku,
+            'message': message.SerializeToString(),
+            'routing_key': routing_key,
+            'headers': obj.get('headers', {}),
+        }
+    return None
+
+
 def process_push_product_data(message):
     obj = parse_message_has_id(message)
     with session_scope() as session:
-        sellable_product = session.query(models.SellableProduct).get(obj.get('id'))
-        sellable_product.set_seller_category_code(session)
-        routing_key = obj.get('routing_key', 'teko.catalog.sellable.updated')
-        if routing_key == 'teko.catalog.sellable.created':
-            message_scheme = sellable_pb2.SellableMessage()
-            data = SellableCreateSchema().dump(sellable_product)
-        else:
-            data = SellableUpdateSchema().dump(sellable_product)
-            message_scheme = sellable_update_pb2.SellableUpdateMessage()
-        if data.get('categCode'):
-            message = json_format.ParseDict(data, message_scheme, ignore_unknown_fields=True)
-            publisher = queue_publisher.QueuePublisher()
-            publisher.publish_message(
-                message=message.SerializeToString(),
-                routing_key=routing_key,
-                headers=obj.get('headers', {})
-            )
+        item = _push_product_data(session, obj)
+        if item:
+            queue_publisher.QueuePublisher().publish_message(
+                message=item['message'], routing_key=item['routing_key'], headers=item['headers'])
+
+
+def process_push_product_data_batch(messages):
+    """
+    The messages of the batch are published once it is committed, in one
+    broker transaction, so the per-message fallback of a failed batch does
+    not publish them twice. If publishing fails, the hashes stored by the
+    batch are dropped so that the fallback pushes the sellables again.
+    """
+    objs = [parse_message_has_id(message) for message in messages]
+    with session_scope() as session:
+        items = [item for item in (_push_product_data(session, obj) for obj in objs) if item]
+    if not items:
+        return
+    try:
+        queue_publisher.QueuePublisher().publish_many(items, batch_size=len(items))
+    except Exception:
+        with session_scope() as session:
+            session.query(models.ProductDetailHash).filter(
+                models.ProductDetailHash.target == TARGET_SELLABLE_PUSH,
+                models.ProductDetailHash.sku.in_([item['sku'] for item in items])
+            ).delete(synchronize_session=False)
+        raise
+
+
+def _update_product_detail(session, data):
+    update_product_detail_table(
+        skus=data.get('sku'),
+        updated_by=data.get('updated_by')
+    )
+    product_detail = session.query(models.ProductDetail).filter(
+        models.ProductDetail.sku == data.get('sku')
+    ).first()
+    hashes = ContentHashes(session, TARGET_DETAIL_PUSH, [product_detail.sku])
+    digest = content_hash([product_detail.data, data.get('ppm_listed_price')])
+    if not hashes.changed(product_detail.sku, digest):
+        return
+    push_sellable_product_detail(product_data=product_detail.data, ppm_listed_price=data.get('ppm_listed_price'))
 
 
 def process_update_product_detail(message):
     with session_scope() as session:
-        data = json.loads(message)
-        update_product_detail_table(
-            skus=data.get('sku'),
-            updated_by=data.get('updated_by')
-        )
-        product_detail = session.query(models.ProductDetail).filter(
-            models.ProductDetail.sku == data.get('sku')
-        ).first()
-        push_sellable_product_detail(product_data=product_detail.data, ppm_listed_price=data.get('ppm_listed_price'))
+        _update_product_detail(session, json.loads(message))
 
 
-def __get_product_detail_v2(session, message):
-    data = json.loads(message)
-    sku = data.get('sku')
-    updated_by = data.get('updated_by')
-    product_detail = ProductDetail(session)
-    return product_detail.init_product_detail_v2(sku, updated_by)
+def process_update_product_detail_batch(messages):
+    with session_scope() as session:
+        for message in messages:
+            _update_product_detail(session, json.loads(message))
+
+
+def upsert_product_details_v2(session, skus, updated_by):
+    """
+    Rebuild the product_details_v2 rows of many SKUs in one pass, rows whose
+    content did not change are left untouched
+
+    :return: number of upserted rows
+    """
+    sku_details = ProductDetail(session).init_product_details_v2(skus, updated_by)
+    if not sku_details:
+        return 0
+    detail_skus = [d.get('sku') for d in sku_details]
+    existed = {row.sku: row for row in session.query(models.ProductDetailsV2).filter(
+        models.ProductDetailsV2.sku.in_(detail_skus))}
+    hashes = ContentHashes(session, TARGET_DETAIL_V2, detail_skus)
+    upserted = 0
+    for sku_detail in sku_details:
+        exist = existed.get(sku_detail.get('sku'))
+        changed = hashes.changed(sku_detail.get('sku'), content_hash(sku_detail, exclude=('updated_by',)))
+        if exist and not changed:
+            continue
+        upserted += 1
+        if exist:
+            for k, v in sku_detail.items():
+                setattr(exist, k, v)
+        else:
+            sku_detail['created_by'] = sku_detail['updated_by']
+            model = models.ProductDetailsV2(**sku_detail)
+            session.add(model)
+    return upserted
+
+
+def enqueue_product_detail_v2_rebuild(session, sku, updated_by):
+    """
+    Coalescing stage of the v2 rebuilds: the first event of a SKU schedules
+    the rebuild at the end of the window, later events of the same SKU only
+    replace `updated_by`. A SKU whose rebuild had failed for good is
+    scheduled again.
+    """
+    # MySQL assigns from left to right, `failed_at` is reset last
+    session.execute(text("""
+INSERT INTO product_detail_rebuilds (sku, updated_by, due_at, attempts)
+VALUES (:sku, :updated_by, :due_at, 0)
+ON DUPLICATE KEY UPDATE updated_by = VALUES(updated_by),
+    due_at = IF(failed_at IS NULL, due_at, VALUES(due_at)),
+    attempts = IF(failed_at IS NULL, attempts, 0),
+    failed_at = NULL
+"""), {
+        'sku': sku,
+        'updated_by': updated_by,
+        'due_at': datetime.now() + timedelta(seconds=config.PRODUCT_DETAIL_V2_COALESCE_SECONDS),
+    })
+
+
+def _rebuild_failed(row, error):
+    row.attempts = (row.attempts or 0) + 1
+    row.last_error = str(error)
+    if isinstance(error, StopRetryException) or row.attempts >= config.PRODUCT_DETAIL_V2_REBUILD_MAX_ATTEMPTS:
+        row.failed_at = datetime.now()
+        _logger.error(f'Give up rebuilding product detail v2 of {row.sku}: {error}')
+    else:
+        # back off so the SKUs queued behind it are rebuilt first
+        row.due_at = datetime.now() + timedelta(
+            seconds=max(config.PRODUCT_DETAIL_V2_COALESCE_SECONDS, 1) * 2 ** row.attempts)
+        _logger.warning(f'Can not rebuild product detail v2 of {row.sku}, attempt {row.attempts}: {error}')
+
+
+def _rebuild_one_by_one(session, rows, updated_by):
+    failed = []
+    for row in rows:
+        try:
+            with session.begin_nested():
+                upsert_product_details_v2(session, [row.sku], updated_by)
+        except Exception as e:
+            _rebuild_failed(row, e)
+            failed.append(row)
+    return failed
+
+
+def flush_product_detail_v2_rebuilds(session, limit=None):
+    """
+    Rebuild the pending SKUs whose window has elapsed. The rows stay locked
+    until the transaction ends, so an event received meanwhile waits and
+    schedules a new rebuild instead of being lost; rows locked by another
+    flusher are skipped.
+
+    The SKUs of a user are rebuilt together, if that fails each SKU is
+    rebuilt in its own savepoint and only the failing ones are kept for a
+    later attempt.
+
+    :return: number of handled SKUs
+    """
+    pending = session.query(models.ProductDetailRebuild).filter(
+        models.ProductDetailRebuild.due_at <= datetime.now(),
+        models.ProductDetailRebuild.failed_at.is_(None)
+    ).order_by(models.ProductDetailRebuild.due_at).limit(
+        limit or config.PRODUCT_DETAIL_V2_BATCH_SIZE
+    ).with_for_update(skip_locked=True).all()
+    rows_by_user = {}
+    for row in pending:
+        rows_by_user.setdefault(row.updated_by, []).append(row)
+    for updated_by, rows in rows_by_user.items():
+        failed = []
+        try:
+            with session.begin_nested():
+                upsert_product_details_v2(session, [row.sku for row in rows], updated_by)
+        except Exception as e:
+            if len(rows) == 1:
+                _rebuild_failed(rows[0], e)
+                failed = rows
+            else:
+                failed = _rebuild_one_by_one(session, rows, updated_by)
+        for row in rows:
+            if row not in failed:
+                session.delete(row)
+    return len(pending)
+
+
+def _run_product_detail_v2_flusher():
+    interval = max(config.PRODUCT_DETAIL_V2_COALESCE_SECONDS / 2, 1)
+    with app.app_context():
+        while True:
+            try:
+                with session_scope() as session:
+                    flushed = flush_product_detail_v2_rebuilds(session)
+            except Exception as e:
+                _logger.exception(f'Can not flush product detail v2 rebuilds: {e}')
+                flushed = 0
+            if not flushed:
+                time.sleep(interval)
 
 
 def process_update_product_detail_v2(message):
+    data = json.loads(message)
+    with session_scope() as session:
+        if config.PRODUCT_DETAIL_V2_COALESCE_SECONDS > 0:
+            enqueue_product_detail_v2_rebuild(session, data.get('sku'), data.get('updated_by'))
+        else:
+            upsert_product_details_v2(session, [data.get('sku')], data.get('updated_by'))
+
+
+def process_update_product_detail_v2_batch(messages):
+    skus_by_user = {}
+    for message in messages:
+        data = json.loads(message)
+        skus_by_user.setdefault(data.get('updated_by'), []).append(data.get('sku'))
     with session_scope() as session:
-        sku_detail = __get_product_detail_v2(session, message)
-        if sku_detail:
-            exist = session.query(models.ProductDetailsV2).filter(
-                models.ProductDetailsV2.sku == sku_detail.get('sku')).first()
-            if exist:
-                for k, v in sku_detail.items():
-                    setattr(exist, k, v)
+        for updated_by, skus in skus_by_user.items():
+            if config.PRODUCT_DETAIL_V2_COALESCE_SECONDS > 0:
+                for sku in skus:
+                    enqueue_product_detail_v2_rebuild(session, sku, updated_by)
             else:
-                sku_detail['created_by'] = sku_detail['updated_by']
-                model = models.ProductDetailsV2(**sku_detail)
-                session.add(model)
+                upsert_product_details_v2(session, list(dict.fromkeys(skus)), updated_by)
 
 
 def __get_platform_categories_query(session, owner_seller_id):
@@ -311,25 +516,40 @@ def run_default_consumer():
     consumer.start()
 
 
+def _create_consumer(key, handler, batch_handler):
+    if config.RAM_CONSUMER_WORKERS > 1:
+        return PartitionedRamConsumer(
+            map_event_key_with_handler={key: handler},
+            workers=config.RAM_CONSUMER_WORKERS
+        )
+    if config.RAM_CONSUMER_BATCH_SIZE > 1:
+        return BatchRamConsumer(
+            map_event_key_with_handler={key: BatchHandler(batch_handler, handler)},
+            batch_size=config.RAM_CONSUMER_BATCH_SIZE,
+            wait_ms=config.RAM_CONSUMER_BATCH_WAIT_MS
+        )
+    return RamConsumer(map_event_key_with_handler={key: handler})
+
+
 def run_push_push_product_data_consumer():
-    consumer = RamConsumer(map_event_key_with_handler={
-        RAM_QUEUE.RAM_PUSH_PRODUCT_DATA: process_push_product_data
-    })
+    consumer = _create_consumer(
+        RAM_QUEUE.RAM_PUSH_PRODUCT_DATA, process_push_product_data, process_push_product_data_batch)
 
     consumer.start()
 
 
 def run_update_product_detail_consumer():
-    consumer = RamConsumer(map_event_key_with_handler={
-        RAM_QUEUE.RAM_UPDATE_PRODUCT_DETAIL: process_update_product_detail
-    })
+    consumer = _create_consumer(
+        RAM_QUEUE.RAM_UPDATE_PRODUCT_DETAIL, process_update_product_detail, process_update_product_detail_batch)
 
     consumer.start()
 
 
 def run_update_product_detail_v2_consumer():
-    consumer = RamConsumer(map_event_key_with_handler={
-        RAM_QUEUE.RAM_UPDATE_PRODUCT_DETAIL_V2: process_update_product_detail_v2
-    })
+    if config.PRODUCT_DETAIL_V2_COALESCE_SECONDS > 0:
+        threading.Thread(target=_run_product_detail_v2_flusher, daemon=True).start()
+    consumer = _create_consumer(
+        RAM_QUEUE.RAM_UPDATE_PRODUCT_DETAIL_V2, process_update_product_detail_v2,
+        process_update_product_detail_v2_batch)
 
     consumer.start()
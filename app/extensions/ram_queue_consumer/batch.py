@@ -0,0 +1,108 @@
+# coding=utf-8
+import logging
+import threading
+import time
+
+from catalog import app
+from ram.v1_0.consumer.ram_consumer import RamConsumer
+
+_logger = logging.getLogger(__name__)
+
+
+class BatchHandler(object):
+    """
+    A batch-aware handler of an event key: `handle_batch` processes a list of
+    messages in one transaction, `handle_one` is the per-message handler used
+    when the batch fails
+    """
+
+    def __init__(self, handle_batch, handle_one):
+        self.handle_batch = handle_batch
+        self.handle_one = handle_one
+
+
+class _Item(object):
+    def __init__(self, message):
+        self.message = message
+        self.error = None
+        self.done = threading.Event()
+
+
+class BatchCollector(object):
+    """
+    Groups the messages submitted concurrently into one batch, waiting at
+    most `wait_ms` for `batch_size` of them to arrive. `submit`
+    returns only once the batch of its message is processed and raises the
+    error of that message, so RAM acknowledges a message after its commit
+    and retries it on failure as before.
+    """
+
+    def __init__(self, handler, batch_size, wait_ms):
+        self._handler = handler
+        self._batch_size = batch_size
+        self._wait = wait_ms / 1000
+        self._cond = threading.Condition()
+        self._pending = []
+
+    def submit(self, message):
+        item = _Item(message)
+        with self._cond:
+            self._pending.append(item)
+            leader = len(self._pending) == 1
+            if len(self._pending) >= self._batch_size:
+                self._cond.notify_all()
+            if leader:
+                deadline = time.monotonic() + self._wait
+                while len(self._pending) < self._batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending, []
+        if leader:
+            self._process(batch)
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+
+    def _process(self, batch):
+        try:
+            self._handler.handle_batch([item.message for item in batch])
+        except Exception as e:
+            _logger.warning(f'Batch of {len(batch)} messages failed, processing them one by one: {e}')
+            for item in batch:
+                try:
+                    self._handler.handle_one(item.message)
+                except Exception as error:
+                    item.error = error
+        finally:
+            for item in batch:
+                item.done.set()
+
+
+class BatchRamConsumer(object):
+    """
+    Run RAM consumers whose handlers process messages in batches. RAM hands
+    messages to a handler one at a time, so `batch_size` consumer loops feed
+    the collectors and a batch holds the messages they received meanwhile.
+    """
+
+    def __init__(self, map_event_key_with_handler, batch_size, wait_ms):
+        self._collectors = {
+            key: BatchCollector(handler, batch_size, wait_ms)
+            for key, handler in map_event_key_with_handler.items()
+        }
+        self._batch_size = batch_size
+
+    def _run_loop(self):
+        with app.app_context():
+            RamConsumer(map_event_key_with_handler={
+                key: collector.submit for key, collector in self._collectors.items()
+            }).start()
+
+    def start(self):
+        threads = [threading.Thread(target=self._run_loop, daemon=True) for _ in range(self._batch_size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,60 @@
+import hashlib
+import json
+import logging
+
+from prometheus_client import Counter
+
+from catalog import models
+
+_logger = logging.getLogger(__name__)
+
+TARGET_DETAIL_V2 = 'v2'
+TARGET_SELLABLE_PUSH = 'sellable_push'
+TARGET_DETAIL_PUSH = 'detail_push'
+
+CONTENT_HASH_CHECKS = Counter(
+    'catalog_product_detail_hash_checks_total',
+    'Product detail writes and pushes checked against the stored content hash',
+    ['target', 'result']
+)
+
+
+def content_hash(data, exclude=()):
+    """
+    Stable digest of a JSON-like payload, keys in `exclude` are ignored
+    """
+    if isinstance(data, dict) and exclude:
+        data = {k: v for k, v in data.items() if k not in exclude}
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class ContentHashes:
+    """
+    Stored hashes of a batch of SKUs for one target. `changed` tells whether
+    a payload differs from the last one and records the new digest in the
+    session, so it is only persisted along with the write it guards.
+    """
+
+    def __init__(self, session, target, skus):
+        self.session = session
+        self.target = target
+        self.rows = {row.sku: row for row in session.query(models.ProductDetailHash).filter(
+            models.ProductDetailHash.target == target,
+            models.ProductDetailHash.sku.in_(set(skus))
+        )} if skus else {}
+
+    def changed(self, sku, digest):
+        row = self.rows.get(sku)
+        if row and row.hash == digest:
+            CONTENT_HASH_CHECKS.labels(self.target, 'skipped').inc()
+            return False
+
+        CONTENT_HASH_CHECKS.labels(self.target, 'changed').inc()
+        if row:
+            row.hash = digest
+        else:
+            row = models.ProductDetailHash(sku=sku, target=self.target, hash=digest)
+            self.session.add(row)
+            self.rows[sku] = row
+        return True
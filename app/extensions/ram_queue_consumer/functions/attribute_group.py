@@ -101,8 +101,7 @@ class AttributeGroup:
         sellable_product = self.sellable_product
         common_group = next(filter(lambda x: x.get('code') == _ATTRIBUTE_GROUP_COMMON_CODE, attribute_groups), None)
         if common_group:
-            brand = self.session.query(m.Brand).filter(
-                m.Brand.id == sellable_product.brand_id).first() if sellable_product.brand_id else None
+            brand = self.session.query(m.Brand).get(sellable_product.brand_id) if sellable_product.brand_id else None
             _add_map(_get_brand(common_group, brand), map_groups)
             _add_map(_get_warranty_month(common_group, sellable_product), map_groups)
             _add_map(_get_warranty_note(common_group, sellable_product), map_groups)
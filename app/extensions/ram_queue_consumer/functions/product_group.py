@@ -14,6 +14,7 @@ class ProductGroup:
         self.sellable_product = sellable_product
         self.map_variants, self.map_attribute_values = self.__get_variant_attribute_values(all_variant_attributes)
         self.product_skus = self.__get_skus_of_product()
+        self.variants = self.__get_variants_of_product()
 
     def __add_map(self, map_data, key, value):
         values = map_data.get(key)
@@ -34,7 +35,7 @@ class ProductGroup:
         return variants, variant_attribute_values
 
     def __get_base_variant_id(self, variant_id):
-        variant = self.session.query(m.ProductVariant).filter(m.ProductVariant.id == variant_id).first()
+        variant = self.variants.get(variant_id) or self.session.query(m.ProductVariant).get(variant_id)
         all_uom_ratios = variant.all_uom_ratios.split(',')
         if len(all_uom_ratios) <= 1:
             return -1
@@ -73,6 +74,14 @@ class ProductGroup:
             m.SellableProduct.product_id == self.sellable_product.product_id
         ).options(load_only('sku', 'uom_ratio', 'variant_id', 'editing_status_code')).all()
 
+    def __get_variants_of_product(self):
+        """
+        Uom ratios of every variant of the product, loaded at once instead of one query per variant
+        """
+        return {variant.id: variant for variant in self.session.query(m.ProductVariant).filter(
+            m.ProductVariant.product_id == self.sellable_product.product_id
+        ).options(load_only('id', 'all_uom_ratios'))}
+
     def __get_one_sku(self, sku, base_uom_name):
         attribute_values = []
         uom_option = None
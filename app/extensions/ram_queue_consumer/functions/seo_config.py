@@ -1,56 +1,25 @@
 import logging
 from catalog import models as m
 from catalog.extensions.ram_queue_consumer.functions.utils import get_variant_attribute_value, get_default
+from catalog.services.attribute_sets.seo_config_matcher import get_seo_config_matcher, \
+    NUMBER_SET_CONFIG_ATTRIBUTES as _NUMBER_SET_CONFIG_ATTRIBUTES
 
 __author__ = 'Quang.LM'
 
 _logger = logging.getLogger(__name__)
 
-_NUMBER_SET_CONFIG_ATTRIBUTES = 5
-
 
 class SeoConfig:
     def __init__(self, session, sellable_product):
         self.session = session
         self.sellable_product = sellable_product
-        self.match_config = None
-
-    def __order_attribute_set_configs(self, query):
-        return query.order_by(m.AttributeSetConfig.attribute_5_id.desc(), m.AttributeSetConfig.attribute_4_id.desc(),
-                              m.AttributeSetConfig.attribute_3_id.desc(), m.AttributeSetConfig.attribute_2_id.desc(),
-                              m.AttributeSetConfig.attribute_1_id.desc(), m.AttributeSetConfig.brand_id.desc())
+        self.matcher = get_seo_config_matcher(sellable_product.attribute_set_id, session)
 
     def __get_default_seo_config(self):
-        query = self.__order_attribute_set_configs(self.session.query(m.AttributeSetConfig).filter(
-            m.AttributeSetConfig.attribute_set_id == self.sellable_product.attribute_set_id,
-            m.AttributeSetConfig.is_default == 1))
-        return query.first()
-
-    def __get_compare_variant_attributes(self, variant_attributes, attribute_id, value):
-        if not attribute_id and not value:
-            return 0
-        for va in variant_attributes:
-            if va.get('attribute_id') == attribute_id and va.get('value') == value:
-                return 0
-        return 1
+        return self.matcher.default
 
     def __get_seo_config(self, variant_attributes):
-        if self.match_config:
-            return self.match_config
-        query = self.__order_attribute_set_configs(self.session.query(m.AttributeSetConfig).filter(
-            m.AttributeSetConfig.attribute_set_id == self.sellable_product.attribute_set_id,
-            m.AttributeSetConfig.is_deleted == 0))
-        set_configs = query.all()
-        for config in set_configs:
-            if config.brand_id and config.brand_id != self.sellable_product.brand_id:
-                continue
-            for i in range(_NUMBER_SET_CONFIG_ATTRIBUTES):
-                attribute_id = getattr(config, f'attribute_{i + 1}_id')
-                value = getattr(config, f'attribute_{i + 1}_value')
-                compare_value = self.__get_compare_variant_attributes(variant_attributes, attribute_id, value)
-                if compare_value == 0:
-                    self.match_config = config
-                    return config
+        return self.matcher.match(self.sellable_product.brand_id, variant_attributes)
 
     def __get_seo_by_attribute(self, map_variant_attributes, object_value):
         variant_value = map_variant_attributes.get(object_value)
@@ -62,12 +31,11 @@ class SeoConfig:
         if object_type == 'product_name':
             return sellable_product.name
         if object_type == 'attribute_set':
-            attr_set = self.session.query(m.AttributeSet).filter(
-                m.AttributeSet.id == sellable_product.attribute_set_id).first()
+            attr_set = self.session.query(m.AttributeSet).get(sellable_product.attribute_set_id)
             if attr_set:
                 return attr_set.name
         if object_type == 'brand':
-            brand = self.session.query(m.Brand).filter(m.Brand.id == sellable_product.brand_id).first()
+            brand = self.session.query(m.Brand).get(sellable_product.brand_id) if sellable_product.brand_id else None
             if brand:
                 return brand.name
         if object_type == 'sku':
@@ -88,20 +56,18 @@ class SeoConfig:
                 __map_variant_attributes[str(va.get('attribute_id'))] = va
             return __map_variant_attributes
 
-        config_details = self.session.query(m.AttributeSetConfigDetail).filter(
-            m.AttributeSetConfigDetail.attribute_set_config_id == attribute_set_config_id) \
-            .order_by(m.AttributeSetConfigDetail.priority).all()
+        config_details = self.matcher.get_details(attribute_set_config_id)
         map_seo = {}
         map_variant_attributes = _get_map_variant_attributes()
         for config in config_details:
-            values = map_seo.get(config.field_display) or []
-            if config.object_type == 'attribute':
-                value = self.__get_seo_by_attribute(map_variant_attributes, config.object_value)
+            values = map_seo.get(config['field_display']) or []
+            if config['object_type'] == 'attribute':
+                value = self.__get_seo_by_attribute(map_variant_attributes, config['object_value'])
             else:
-                value = self.__get_seo_by_type(config.object_type, config.object_value)
+                value = self.__get_seo_by_type(config['object_type'], config['object_value'])
             if value is not None:
-                values.append(f'{get_default(config.text_before)}{value}{get_default(config.text_after)}')
-                map_seo[config.field_display] = values
+                values.append(f'{get_default(config["text_before"])}{value}{get_default(config["text_after"])}')
+                map_seo[config['field_display']] = values
 
         response = {}
         for k, v in map_seo.items():
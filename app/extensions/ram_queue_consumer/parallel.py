@@ -0,0 +1,159 @@
+# coding=utf-8
+import functools
+import json
+import logging
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from prometheus_client import Counter, Gauge
+
+import config
+from catalog import app, models
+from ram.v1_0.consumer.ram_consumer import RamConsumer
+from ram.v1_0.stop_retry_exception import StopRetryException
+
+_logger = logging.getLogger(__name__)
+
+WORKER_QUEUE_DEPTH = Gauge(
+    'catalog_ram_worker_queue_depth',
+    'Messages waiting or running on a partitioned RAM worker',
+    ['event_key', 'worker'],
+    multiprocess_mode='livesum'
+)
+WORKER_FAILED = Counter(
+    'catalog_ram_worker_failed_total',
+    'Messages a partitioned RAM worker gave up on, kept in ram_worker_messages',
+    ['event_key']
+)
+
+
+def message_key(message):
+    """
+    Ordering key of a RAM message: its SKU, else its id, else the raw message
+    """
+    try:
+        obj = json.loads(message)
+    except Exception:
+        return str(message)
+    if not isinstance(obj, dict):
+        return str(message)
+    key = obj.get('sku') or obj.get('id')
+    return str(key) if key is not None else str(message)
+
+
+def _messages():
+    return models.RamWorkerMessage.__table__
+
+
+class _Worker(object):
+    def __init__(self, event_key, index, handler, queue_size, retries):
+        self.event_key = event_key
+        self.handler = handler
+        self.retries = retries
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.depth = WORKER_QUEUE_DEPTH.labels(event_key, str(index))
+
+    def put(self, message_id, message):
+        self.depth.inc()
+        self.queue.put((message_id, message))
+
+    def _handle(self, message_id, message):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(2 ** (attempt - 1))
+            try:
+                self.handler(message)
+                with models.db.engine.begin() as conn:
+                    conn.execute(_messages().delete().where(_messages().c.id == message_id))
+                return
+            except StopRetryException as e:
+                error = e
+                break
+            except Exception as e:
+                error = e
+                _logger.warning(f'{self.event_key}: attempt {attempt + 1} failed for {message}: {e}')
+        WORKER_FAILED.labels(self.event_key).inc()
+        _logger.error(f'{self.event_key}: give up message {message_id}: {error}')
+        with models.db.engine.begin() as conn:
+            conn.execute(_messages().update().where(_messages().c.id == message_id).values(
+                attempts=_messages().c.attempts + attempt + 1,
+                last_error=str(error),
+                failed_at=datetime.now()
+            ))
+
+    def run(self):
+        with app.app_context():
+            while True:
+                message_id, message = self.queue.get()
+                try:
+                    self._handle(message_id, message)
+                except Exception as e:
+                    # the row stays pending and is handled again on the next start
+                    _logger.exception(f'{self.event_key}: can not record message {message_id}: {e}')
+                finally:
+                    self.depth.dec()
+
+
+class PartitionedRamConsumer(object):
+    """
+    Run the handlers of RAM messages on `workers` threads, a message going
+    to the worker picked by the hash of its key: messages of one key are
+    handled one at a time in the order they were received while other keys
+    proceed concurrently.
+
+    A single RAM consumer loop fetches the messages and hands them off
+    without waiting for them to be handled. Each message is saved in
+    ram_worker_messages before RAM acknowledges it and deleted once handled:
+    the messages left when the process stops are queued again, in order,
+    on the next start, and a message still failing after `retries` keeps
+    its row with `failed_at`. There must be a single partitioned consumer
+    process per event key. The fetch loop waits when a worker already has
+    `queue_size` messages.
+    """
+
+    def __init__(self, map_event_key_with_handler, workers, key_func=message_key, queue_size=None, retries=None):
+        queue_size = queue_size or config.RAM_CONSUMER_WORKER_QUEUE_SIZE
+        retries = config.RAM_CONSUMER_WORKER_RETRIES if retries is None else retries
+        self._workers = {
+            event_key: [_Worker(event_key, i, handler, queue_size, retries) for i in range(workers)]
+            for event_key, handler in map_event_key_with_handler.items()
+        }
+        self._key_func = key_func
+
+    def _put(self, event_key, message_id, message):
+        workers = self._workers[event_key]
+        partition = zlib.crc32(self._key_func(message).encode('utf-8')) % len(workers)
+        workers[partition].put(message_id, message)
+
+    def dispatch(self, event_key, message):
+        with models.db.engine.begin() as conn:
+            message_id = conn.execute(_messages().insert().values(
+                event_key=event_key, message=message)).inserted_primary_key[0]
+        self._put(event_key, message_id, message)
+
+    def _replay(self):
+        """Queue the messages saved by a previous run and not handled yet"""
+        with models.db.engine.connect() as conn:
+            rows = conn.execute(_messages().select().where(
+                _messages().c.event_key.in_(list(self._workers))
+            ).where(_messages().c.failed_at.is_(None)).order_by(_messages().c.id)).fetchall()
+        for row in rows:
+            self._put(row.event_key, row.id, row.message)
+        if rows:
+            _logger.info(f'Queued {len(rows)} RAM messages left by the previous run')
+
+    def _start_workers(self):
+        for workers in self._workers.values():
+            for worker in workers:
+                threading.Thread(target=worker.run, daemon=True).start()
+
+    def start(self):
+        with app.app_context():
+            self._start_workers()
+            self._replay()
+            RamConsumer(map_event_key_with_handler={
+                event_key: functools.partial(self.dispatch, event_key) for event_key in self._workers
+            }).start()
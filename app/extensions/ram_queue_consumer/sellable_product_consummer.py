@@ -148,13 +148,115 @@ def _get_config_seo(seo, advanced_info):
     }
 
 
+def _group_by(rows, key):
+    groups = {}
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return groups
+
+
+def _path_ids(path):
+    return list(map(lambda x: safe_cast(x, int), filter(lambda x: x, path.split('/'))))
+
+
+class _DetailBatch:
+    """
+    Related data of a batch of sellable products, each relation loaded with
+    one set-based query. Rows fetched here also live in the session identity
+    map, so later `query.get()` lookups of the same rows do not hit the database.
+    """
+
+    def __init__(self, session, sellable_products):
+        self.session = session
+        sku_ids = [sp.id for sp in sellable_products]
+        variant_ids = {sp.variant_id for sp in sellable_products}
+        product_ids = {sp.product_id for sp in sellable_products}
+
+        self.sellers = self.__by_id(m.Seller, {sp.seller_id for sp in sellable_products})
+        self.brands = self.__by_id(m.Brand, {sp.brand_id for sp in sellable_products if sp.brand_id})
+        self.attribute_sets = self.__by_id(m.AttributeSet, {sp.attribute_set_id for sp in sellable_products})
+        self.colors = self.__by_id(m.Color, {sp.color_id for sp in sellable_products if sp.color_id})
+        self.variants = self.__by_id(m.ProductVariant, variant_ids)
+        self.products = {p.id: p for p in session.query(m.Product).filter(
+            m.Product.id.in_(product_ids)).options(load_only('id', 'name')).all()}
+        self.product_types = {misc.code: misc for misc in session.query(m.Misc).filter(
+            m.Misc.type == 'product_type',
+            m.Misc.code.in_({sp.product_type for sp in sellable_products}))}
+
+        self.seo = self.__first_by(m.SellableProductSeoInfoTerminal, sku_ids)
+        self.tags = self.__first_by(m.SellableProductTag, sku_ids)
+        self.barcodes = _group_by(session.query(m.SellableProductBarcode).filter(
+            m.SellableProductBarcode.sellable_product_id.in_(sku_ids)), lambda x: x.sellable_product_id)
+        self.images = _group_by(session.query(m.VariantImage).filter(
+            m.VariantImage.product_variant_id.in_(variant_ids),
+            m.VariantImage.status == 1, m.VariantImage.is_displayed == 1
+        ).order_by(m.VariantImage.priority), lambda x: x.product_variant_id)
+        self.shipping_types = _group_by(session.query(
+            m.SellableProductShippingType.sellable_product_id, m.ShippingType.code
+        ).join(
+            m.SellableProductShippingType,
+            m.SellableProductShippingType.shipping_type_id == m.ShippingType.id
+        ).filter(m.SellableProductShippingType.sellable_product_id.in_(sku_ids)), lambda x: x[0])
+
+        self.__load_bundles(sku_ids)
+        self.__load_category_trees(product_ids)
+        self.__load_master_category_trees({sp.master_category_id for sp in sellable_products
+                                           if sp.master_category_id})
+
+    def __by_id(self, model, ids):
+        if not ids:
+            return {}
+        return {row.id: row for row in self.session.query(model).filter(model.id.in_(ids))}
+
+    def __first_by(self, model, sku_ids):
+        rows = {}
+        for row in self.session.query(model).filter(model.sellable_product_id.in_(sku_ids)):
+            rows.setdefault(row.sellable_product_id, row)
+        return rows
+
+    def __load_bundles(self, sku_ids):
+        bundles = self.session.query(m.SellableProductBundle).filter(
+            or_(m.SellableProductBundle.bundle_id.in_(sku_ids),
+                m.SellableProductBundle.sellable_product_id.in_(sku_ids))).all()
+        self.bundles = bundles
+        related_ids = {b.bundle_id for b in bundles} | {b.sellable_product_id for b in bundles}
+        self.bundle_skus = {sp.id: sp for sp in self.session.query(m.SellableProduct).filter(
+            m.SellableProduct.id.in_(related_ids)).options(load_only('sku', 'name'))} if related_ids else {}
+
+    def __load_category_trees(self, product_ids):
+        product_categories = self.session.query(m.ProductCategory).filter(
+            m.ProductCategory.product_id.in_(product_ids)).all()
+        self.product_category_ids = {}
+        for pc in product_categories:
+            self.product_category_ids.setdefault(pc.product_id, set()).add(pc.category_id)
+        leaf_ids = {pc.category_id for pc in product_categories}
+        self.leaf_categories = self.session.query(m.Category).filter(m.Category.id.in_(leaf_ids)) \
+            .order_by(m.Category.depth, m.Category.path).all() if leaf_ids else []
+        seller_ids = {c.seller_id for c in self.leaf_categories}
+        self.platforms = self.session.query(m.PlatformSellers).filter(
+            m.PlatformSellers.seller_id.in_(seller_ids),
+            m.PlatformSellers.is_owner.is_(True)).all() if seller_ids else []
+        ids = {i for c in self.leaf_categories for i in _path_ids(c.path)}
+        self.tree_categories = self.session.query(m.Category).filter(m.Category.id.in_(ids)) \
+            .order_by(m.Category.depth, m.Category.path).all() if ids else []
+
+    def __load_master_category_trees(self, master_category_ids):
+        self.master_categories = self.__by_id(m.MasterCategory, master_category_ids)
+        ids = {i for c in self.master_categories.values() for i in _path_ids(c.path)}
+        self.master_tree_categories = self.session.query(m.MasterCategory).filter(
+            m.MasterCategory.id.in_(ids)).order_by(m.MasterCategory.depth, m.MasterCategory.path).all() if ids else []
+
+
 class ProductDetail:
 
     def __init__(self, session):
         self.session = session
+        self.batch = None
+        self.advanced = None
+        self.category_trees = {}
 
     def __get_seller(self, sellable_product):
-        seller = self.session.query(m.Seller).filter(m.Seller.id == sellable_product.seller_id).first()
+        seller = self.batch.sellers.get(sellable_product.seller_id)
         if seller:
             return {
                 'id': seller.id,
@@ -164,20 +266,16 @@ class ProductDetail:
         return _init_default(('id', 'name', 'display_name'))
 
     def __get_seo(self, sellable_product):
-        seo = self.session.query(m.SellableProductSeoInfoTerminal).filter(
-            m.SellableProductSeoInfoTerminal.sellable_product_id == sellable_product.id).first()
-        return seo
+        return self.batch.seo.get(sellable_product.id)
 
     def __get_url_key(self, seo, sellable_product):
         if seo and seo.url_key:
             return seo.url_key
-        variant = self.session.query(m.ProductVariant).filter(
-            m.ProductVariant.id == sellable_product.variant_id).first()
+        variant = self.batch.variants.get(sellable_product.variant_id)
         return variant.url_key if variant else ''
 
     def __get_product_type(self, sellable_product):
-        misc = self.session.query(m.Misc).filter(m.Misc.type == 'product_type',
-                                                 m.Misc.code == sellable_product.product_type).first()
+        misc = self.batch.product_types.get(sellable_product.product_type)
         if misc:
             return {
                 'code': misc.code,
@@ -189,10 +287,7 @@ class ProductDetail:
         }
 
     def __get_images(self, sellable_product):
-        images = self.session.query(m.VariantImage).filter(
-            m.VariantImage.product_variant_id == sellable_product.variant_id,
-            m.VariantImage.status == 1, m.VariantImage.is_displayed == 1
-        ).order_by(m.VariantImage.priority).all()
+        images = self.batch.images.get(sellable_product.variant_id, [])
         response = []
         for img in images:
             response.append({
@@ -204,7 +299,7 @@ class ProductDetail:
         return response
 
     def __get_color(self, sellable_product):
-        color = self.session.query(m.Color).filter(m.Color.id == sellable_product.color_id).first()
+        color = self.batch.colors.get(sellable_product.color_id)
         if color:
             return {
                 'code': color.code,
@@ -213,47 +308,41 @@ class ProductDetail:
         return None
 
     def __get_barcodes(self, sellable_product):
-        barcodes = self.session.query(m.SellableProductBarcode). \
-            filter(m.SellableProductBarcode.sellable_product_id == sellable_product.id).all()
-        return barcodes
+        return self.batch.barcodes.get(sellable_product.id, [])
 
     def __get_category_tree(self, sellable_product):
-        sku_categories = self.session.query(m.ProductCategory).filter(
-            m.ProductCategory.product_id == sellable_product.product_id).all()
-        leaf_category_ids = list(map(lambda x: x.category_id, sku_categories))
-        leaf_categories = self.session.query(m.Category).filter(m.Category.id.in_(leaf_category_ids)) \
-            .order_by(m.Category.depth, m.Category.path).all()
-        seller_ids = list(map(lambda x: x.seller_id, leaf_categories))
-        platforms = self.session.query(m.PlatformSellers).filter(m.PlatformSellers.seller_id.in_(seller_ids),
-                                                                 m.PlatformSellers.is_owner.is_(True)).all()
-        ids = []
-        root_ids = {}
+        product_id = sellable_product.product_id
+        if product_id in self.category_trees:
+            return self.category_trees[product_id]
+
+        leaf_category_ids = self.batch.product_category_ids.get(product_id, set())
+        leaf_categories = list(filter(lambda x: x.id in leaf_category_ids, self.batch.leaf_categories))
+        seller_ids = set(map(lambda x: x.seller_id, leaf_categories))
+        platforms = list(filter(lambda x: x.seller_id in seller_ids, self.batch.platforms))
+        ids = set()
         for cat in leaf_categories:
-            platform_category_ids = list(map(lambda x: safe_cast(x, int), filter(lambda x: x, cat.path.split('/'))))
-            root_ids[cat.seller_id] = platform_category_ids[0]
-            ids.extend(platform_category_ids)
-        all_categories = self.session.query(m.Category).filter(m.Category.id.in_(ids)) \
-            .order_by(m.Category.depth, m.Category.path).all()
+            ids.update(_path_ids(cat.path))
+        all_categories = list(filter(lambda x: x.id in ids, self.batch.tree_categories))
         categories = []
         for platform in platforms:
             platform_categories = list(filter(lambda x: x.seller_id == platform.seller_id, all_categories))
             categories.append({'platform_id': platform.platform_id, 'seller_id': platform.seller_id,
                                'platform_categories': platform_categories})
 
+        self.category_trees[product_id] = categories
         return categories
 
     def __get_master_category_tree(self, sellable_product):
         if not sellable_product.master_category_id:
             return []
-        cat = self.session.query(m.MasterCategory).filter(
-            m.MasterCategory.id == sellable_product.master_category_id).first()
-        ids = list(map(lambda x: safe_cast(x, int), filter(lambda x: x, cat.path.split('/'))))
-        return self.session.query(m.MasterCategory).filter(m.MasterCategory.id.in_(ids)) \
-            .order_by(m.MasterCategory.depth, m.MasterCategory.path).all()
+        cat = self.batch.master_categories.get(sellable_product.master_category_id)
+        if not cat:
+            return []
+        ids = set(_path_ids(cat.path))
+        return list(filter(lambda x: x.id in ids, self.batch.master_tree_categories))
 
     def __get_attribute_set(self, sellable_product):
-        attribute_set = self.session.query(m.AttributeSet).filter(
-            m.AttributeSet.id == sellable_product.attribute_set_id).first()
+        attribute_set = self.batch.attribute_sets.get(sellable_product.attribute_set_id)
         if attribute_set:
             return {
                 'id': attribute_set.id,
@@ -262,7 +351,7 @@ class ProductDetail:
         return _init_default(('id', 'name'))
 
     def __get_brand(self, sellable_product):
-        brand = self.session.query(m.Brand).filter(m.Brand.id == sellable_product.brand_id).first()
+        brand = self.batch.brands.get(sellable_product.brand_id)
         if brand:
             return {
                 'id': brand.id,
@@ -273,32 +362,16 @@ class ProductDetail:
         return _init_default(('code', 'name'))
 
     def __get_shipping_types(self, sellable_product):
-        shipping_types = self.session.query(
-            m.ShippingType
-        ).join(
-            m.SellableProductShippingType,
-            m.SellableProductShippingType.shipping_type_id == m.ShippingType.id
-        ).filter(m.SellableProductShippingType.sellable_product_id == sellable_product.id).all()
-        return list(map(lambda x: x.code, shipping_types))
-
-    def __get_sellable_product_by_sku(self, sku):
-        return self.session.query(m.SellableProduct).filter(m.SellableProduct.sku == sku).first()
-
-    def __get_sellable_product_bundle(self, sellable_product_id):
-        query = self.session.query(m.SellableProduct).filter(
-            m.SellableProduct.id == sellable_product_id).options(load_only('sku', 'name'))
-        return query.first()
+        return list(map(lambda x: x[1], self.batch.shipping_types.get(sellable_product.id, [])))
 
     def __get_bundles(self, sellable_product):
         sku_id = sellable_product.id
-        bundles = self.session.query(m.SellableProductBundle).filter(
-            or_(m.SellableProductBundle.bundle_id == sku_id,
-                m.SellableProductBundle.sellable_product_id == sku_id)).all()
+        bundles = filter(lambda b: sku_id in (b.bundle_id, b.sellable_product_id), self.batch.bundles)
 
         response = {}
         for b in bundles:
             if b.bundle_id == sku_id:
-                child = self.__get_sellable_product_bundle(b.sellable_product_id)
+                child = self.batch.bundle_skus.get(b.sellable_product_id)
                 if child:
                     response['bundle_products'] = {
                         'sku': child.sku,
@@ -308,7 +381,7 @@ class ProductDetail:
                         'seo_name': None
                     }
             elif b.sellable_product_id == sku_id:
-                parent = self.__get_sellable_product_bundle(b.bundle_id)
+                parent = self.batch.bundle_skus.get(b.bundle_id)
                 if parent:
                     response['parent_bundles'] = {
                         'sku': parent.sku,
@@ -317,21 +390,38 @@ class ProductDetail:
         return response
 
     def __get_tags(self, sellable_product):
-        tag = self.session.query(m.SellableProductTag).filter(
-            m.SellableProductTag.sellable_product_id == sellable_product.id).first()
+        tag = self.batch.tags.get(sellable_product.id)
         if not tag or not tag.tags:
             return []
         tags = tag.tags.split(',')
         return list(filter(lambda x: x, tags))
 
     def __get_advanced_info(self, sellable_product):
-        advanced = AdvancedInfo(self.session)
-        return advanced.get_advanced_info(sellable_product)
+        return self.advanced.get_advanced_info(sellable_product)
 
     def init_product_detail_v2(self, sku, updated_by):
-        sellable_product = self.__get_sellable_product_by_sku(sku)
-        if not sellable_product:
-            return {}
+        details = self.init_product_details_v2([sku], updated_by)
+        return details[0] if details else {}
+
+    def init_product_details_v2(self, skus, updated_by):
+        """
+        Build the product_details_v2 rows of many SKUs at once: every relation
+        is loaded with one query for the whole batch, then the payloads are
+        assembled in memory
+
+        :param list[str] skus:
+        :param str updated_by:
+        :return: list of row dicts, unknown SKUs are skipped
+        """
+        sellable_products = self.session.query(m.SellableProduct).filter(m.SellableProduct.sku.in_(skus)).all()
+        if not sellable_products:
+            return []
+        self.batch = _DetailBatch(self.session, sellable_products)
+        self.advanced = AdvancedInfo(self.session)
+        self.category_trees = {}
+        return [self.__build_product_detail_v2(sp, updated_by) for sp in sellable_products]
+
+    def __build_product_detail_v2(self, sellable_product, updated_by):
         categories = self.__get_category_tree(sellable_product)
         master_categories = self.__get_master_category_tree(sellable_product)
         bundles = self.__get_bundles(sellable_product)
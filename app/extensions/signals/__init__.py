@@ -1,12 +1,12 @@
 # coding=utf-8
 import logging
 
-import blinker
+from .instrumentation import InstrumentedNamespace
 
 __author__ = 'Kien.HT'
 _logger = logging.getLogger(__name__)
 
-signals = blinker.Namespace()
+signals = InstrumentedNamespace()
 
 product_created_signal = signals.signal('product-created')
 on_product_created = product_created_signal.connect
@@ -98,6 +98,12 @@ on_listing_update = listing_update_signal.connect
 attribute_set_created_signal = signals.signal('attribute_set_created')
 on_attribute_set_created = attribute_set_created_signal.connect
 
+attribute_set_updated_signal = signals.signal('attribute_set_updated')
+on_attribute_set_updated = attribute_set_updated_signal.connect
+
+attribute_set_config_updated_signal = signals.signal('attribute_set_config_updated')
+on_attribute_set_config_updated = attribute_set_config_updated_signal.connect
+
 attribute_updated_signal = signals.signal('attribute_updated')
 on_attribute_updated = attribute_updated_signal.connect
 
@@ -127,3 +133,8 @@ on_platform_seller_upsert_created = platform_seller_upsert_created_signal.connec
 
 export_product_signal = signals.signal('export_product')
 on_export_product = export_product_signal.connect
+
+import_file_spooled_signal = signals.signal('import_file_spooled')
+on_import_file_spooled = import_file_spooled_signal.connect
+
+from .outbox import outbox, stage
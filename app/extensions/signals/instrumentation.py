@@ -0,0 +1,75 @@
+# coding=utf-8
+import logging
+import time
+
+import blinker
+from prometheus_client import Counter, Histogram
+
+import config
+
+_logger = logging.getLogger(__name__)
+
+RECEIVER_SECONDS = Histogram(
+    'catalog_signal_receiver_seconds',
+    'Wall time of a signal receiver',
+    ['signal', 'receiver'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+RECEIVER_ERRORS = Counter(
+    'catalog_signal_receiver_errors_total',
+    'Exceptions raised by a signal receiver',
+    ['signal', 'receiver']
+)
+SIGNAL_FANOUT = Histogram(
+    'catalog_signal_fanout_receivers',
+    'Number of receivers called by one send of a signal',
+    ['signal'],
+    buckets=(0, 1, 2, 3, 5, 8, 13)
+)
+
+
+def _receiver_name(receiver):
+    module = getattr(receiver, '__module__', None) or ''
+    name = getattr(receiver, '__qualname__', None) or getattr(receiver, '__name__', None) or repr(receiver)
+    return f'{module}.{name}' if module else name
+
+
+class InstrumentedSignal(blinker.NamedSignal):
+    """
+    Signal timing each of its receivers. Receivers are still called in the
+    caller's thread and in order, an exception stops the send as before.
+    """
+
+    def send(self, *sender, **kwargs):
+        if len(sender) > 1:
+            raise TypeError(f'send() accepts only one positional argument, {len(sender)} given')
+        sender = sender[0] if sender else None
+        if not self.receivers:
+            return []
+
+        receivers = list(self.receivers_for(sender))
+        SIGNAL_FANOUT.labels(self.name).observe(len(receivers))
+        slow_ms = config.SIGNAL_SLOW_RECEIVER_MS
+        result = []
+        for receiver in receivers:
+            receiver_name = _receiver_name(receiver)
+            started_at = time.perf_counter()
+            try:
+                result.append((receiver, receiver(sender, **kwargs)))
+            except Exception:
+                RECEIVER_ERRORS.labels(self.name, receiver_name).inc()
+                raise
+            finally:
+                elapsed = time.perf_counter() - started_at
+                RECEIVER_SECONDS.labels(self.name, receiver_name).observe(elapsed)
+                if slow_ms and elapsed * 1000 >= slow_ms:
+                    _logger.warning(f'Slow receiver {receiver_name} of {self.name}: {elapsed * 1000:.0f}ms')
+        return result
+
+
+class InstrumentedNamespace(blinker.Namespace):
+    def signal(self, name, doc=None):
+        try:
+            return self[name]
+        except KeyError:
+            return self.setdefault(name, InstrumentedSignal(name, doc))
@@ -0,0 +1,107 @@
+# coding=utf-8
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from catalog.models import db
+
+_logger = logging.getLogger(__name__)
+
+_DEPTH_KEY = 'signal_outbox_depth'
+# staged per transaction or savepoint, dropped on rollback
+_PENDING_KEY = 'signal_outbox_pending'
+# committed, sent when the outermost outbox scope exits
+_READY_KEY = 'signal_outbox_ready'
+
+
+def _dedup_key(signal, sender):
+    sender_id = sender if isinstance(sender, (int, str)) else getattr(sender, 'id', None)
+    return signal.name, sender_id if sender_id is not None else id(sender)
+
+
+def stage(signal, sender):
+    """
+    Send `signal` once the current transaction of the session is committed.
+    Inside an outbox scope the same (signal, object id) is sent only once;
+    outside of it the signal is sent right away.
+    """
+    session = db.session()
+    if not session.info.get(_DEPTH_KEY):
+        signal.send(sender)
+        return
+    _pending(session, session.transaction)[_dedup_key(signal, sender)] = (signal, sender)
+
+
+def _boundary(transaction):
+    # subtransactions share the database transaction of their parent
+    while transaction.parent is not None and not transaction.nested:
+        transaction = transaction.parent
+    return transaction
+
+
+def _pending(session, transaction):
+    return session.info.setdefault(_PENDING_KEY, {}).setdefault(_boundary(transaction), OrderedDict())
+
+
+def _merge(target, signals):
+    for key, value in signals.items():
+        target.pop(key, None)
+        target[key] = value
+
+
+@contextmanager
+def outbox():
+    """
+    Unit of work for signals: those staged in the block are kept with the
+    session, dropped if their transaction is rolled back, and sent in bulk
+    after the block for the committed ones
+    """
+    session = db.session()
+    session.info[_DEPTH_KEY] = session.info.get(_DEPTH_KEY, 0) + 1
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        session.info[_DEPTH_KEY] -= 1
+        if not session.info[_DEPTH_KEY]:
+            _dispatch(session, failed)
+
+
+def _dispatch(session, failed):
+    pending = sum(len(signals) for signals in (session.info.pop(_PENDING_KEY, None) or {}).values())
+    if pending:
+        _logger.warning(f'Dropped {pending} signals staged without a commit')
+    ready = session.info.pop(_READY_KEY, None) or {}
+    for signal, sender in ready.values():
+        try:
+            signal.send(sender)
+        except Exception as e:
+            if not failed:
+                raise
+            _logger.exception(f'Can not send {signal.name}: {e}')
+
+
+@event.listens_for(db.session, 'after_commit')
+def _on_commit(session):
+    # also fired when a savepoint is released: its signals then wait for the
+    # enclosing transaction instead of being sent
+    transaction = session.transaction
+    pending = session.info.get(_PENDING_KEY, {}).pop(transaction, None)
+    if not pending:
+        return
+    if transaction.parent is not None:
+        _merge(_pending(session, transaction.parent), pending)
+    else:
+        _merge(session.info.setdefault(_READY_KEY, OrderedDict()), pending)
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _on_transaction_end(session, transaction):
+    # what is left for a transaction or savepoint here was rolled back,
+    # signals of the enclosing transaction are kept
+    session.info.get(_PENDING_KEY, {}).pop(transaction, None)
@@ -44,6 +44,7 @@ from .sellable_product_bundle import SellableProductBundle
 from .sellable_product_terminal import SellableProductTerminal
 from .category import Category
 from .master_category import MasterCategory
+from .category_closure import CategoryClosure, MasterCategoryClosure
 from .terminal import Terminal
 from .terminal_group import TerminalGroup
 from .terminal_group_terminal import TerminalGroupTerminal
@@ -79,9 +80,16 @@ from .sellable_product_shipping_type import SellableProductShippingType
 from .category_shipping_type import CategoryShippingType
 from .request_log import RequestLog
 from .product_details_v2 import ProductDetailsV2
+from .product_detail_hash import ProductDetailHash
+from .product_detail_rebuild import ProductDetailRebuild
+from .fan_out_job import FanOutJob
+from .sku_sequence import SkuSequence
+from .import_chunk import ImportChunk
+from .ram_worker_message import RamWorkerMessage
 from .ram_event import RamEvent
 from .tbl_index import TblIndex
 from .sellable_product_barcodes import SellableProductBarcode
+from .sellable_product_search_token import SellableProductSearchToken
 from .sellable_product_sub_sku import SellableProductSubSku
 from .platform_sellers import PlatformSellers
 from .product_categories import ProductCategory
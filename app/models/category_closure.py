@@ -0,0 +1,35 @@
+# coding=utf-8
+import logging
+
+from catalog.models import db
+
+_logger = logging.getLogger(__name__)
+
+
+class CategoryClosure(db.Model):
+    """
+    Ancestor/descendant pairs of the category tree, including the
+    (node, node) pair at depth 0. It mirrors `Category.path` so that a
+    subtree can be resolved with one indexed join instead of LIKE chains.
+    """
+    __tablename__ = 'category_closures'
+    _log = False
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True,
+                              index=True)
+    depth = db.Column(db.Integer, nullable=False, default=0)
+
+
+class MasterCategoryClosure(db.Model):
+    """
+    Same as `CategoryClosure`, for the master category tree
+    """
+    __tablename__ = 'master_category_closures'
+    _log = False
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('master_categories.id', ondelete='CASCADE'),
+                            primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('master_categories.id', ondelete='CASCADE'),
+                              primary_key=True, index=True)
+    depth = db.Column(db.Integer, nullable=False, default=0)
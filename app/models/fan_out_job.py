@@ -0,0 +1,32 @@
+# coding=utf-8
+import logging
+from sqlalchemy import func
+
+from catalog.models import db
+
+_logger = logging.getLogger(__name__)
+
+
+class FanOutJob(db.Model):
+    """
+    Progress of a change applied to sellable products chunk by chunk, e.g.
+    the products of a brand or an attribute, or the rebuild of the search
+    index; `last_id` is the last processed sellable product id
+    """
+    __tablename__ = 'fan_out_jobs'
+    _log = False
+
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(255), nullable=False, index=True)
+    status = db.Column(db.String(16), nullable=False, default=STATUS_RUNNING)
+    start_id = db.Column(db.Integer)
+    end_id = db.Column(db.Integer)
+    last_id = db.Column(db.Integer)
+    chunk_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.TIMESTAMP, server_default=func.now(), default=func.now(), nullable=False)
+    updated_at = db.Column(db.TIMESTAMP, server_default=func.now(), default=func.now(),
+                           onupdate=func.now(), nullable=False)
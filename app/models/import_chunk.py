@@ -0,0 +1,36 @@
+# coding=utf-8
+import logging
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import LONGTEXT
+
+from catalog.models import db
+
+_logger = logging.getLogger(__name__)
+
+
+class ImportChunk(db.Model):
+    """
+    Rows `start_row` to `end_row` (excluded) of an import file, imported by
+    one celery task. `rows` holds the rows as JSON until the chunk is done,
+    `succeeded` is then the number of rows imported successfully.
+    """
+    __tablename__ = 'import_chunks'
+    __table_args__ = (
+        db.UniqueConstraint('import_id', 'start_row', name='uq_import_chunks_import_id_start_row'),
+    )
+    _log = False
+
+    STATUS_PENDING = 'pending'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    import_id = db.Column(db.Integer, nullable=False)
+    start_row = db.Column(db.Integer, nullable=False)
+    end_row = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default=STATUS_PENDING)
+    rows = db.Column(LONGTEXT)
+    succeeded = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.TIMESTAMP, server_default=func.now(), default=func.now(), nullable=False)
+    updated_at = db.Column(db.TIMESTAMP, server_default=func.now(), default=func.now(),
+                           onupdate=func.now(), nullable=False)
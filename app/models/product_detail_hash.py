@@ -0,0 +1,22 @@
+# coding=utf-8
+import logging
+from sqlalchemy import func
+
+from catalog.models import db
+
+_logger = logging.getLogger(__name__)
+
+
+class ProductDetailHash(db.Model):
+    """
+    Digest of the last payload written or published for a SKU, per target
+    (`v2` row, sellable push, detail push), so unchanged rebuilds can be skipped
+    """
+    __tablename__ = 'product_detail_hashes'
+    _log = False
+
+    sku = db.Column(db.String(64), primary_key=True)
+    target = db.Column(db.String(32), primary_key=True)
+    hash = db.Column(db.String(40), nullable=False)
+    updated_at = db.Column(db.TIMESTAMP, server_default=func.now(), default=func.now(),
+                           onupdate=func.now(), nullable=False)
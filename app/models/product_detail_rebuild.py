@@ -0,0 +1,27 @@
+# coding=utf-8
+import logging
+
+from catalog.models import db
+
+_logger = logging.getLogger(__name__)
+
+
+class ProductDetailRebuild(db.Model):
+    """
+    SKUs waiting for their product_details_v2 row to be rebuilt. Events of
+    the same SKU received before `due_at` collapse into this single row,
+    which keeps the latest `updated_by`.
+
+    A failed rebuild is retried later with `attempts` incremented, the row
+    gets `failed_at` once PRODUCT_DETAIL_V2_REBUILD_MAX_ATTEMPTS is reached
+    and waits for the next event of the SKU.
+    """
+    __tablename__ = 'product_detail_rebuilds'
+    _log = False
+
+    sku = db.Column(db.String(64), primary_key=True)
+    updated_by = db.Column(db.String(255))
+    due_at = db.Column(db.DateTime, nullable=False, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    failed_at = db.Column(db.DateTime)
@@ -0,0 +1,31 @@
+# coding=utf-8
+import logging
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import LONGTEXT
+
+from catalog.models import db
+
+_logger = logging.getLogger(__name__)
+
+
+class RamWorkerMessage(db.Model):
+    """
+    RAM message handed off to a partitioned worker. The row is written
+    before RAM acknowledges the message and deleted once it is handled, so
+    the messages still queued when the consumer stops are handled on its
+    next start. A message the worker gives up on keeps its row with
+    `failed_at` set.
+    """
+    __tablename__ = 'ram_worker_messages'
+    __table_args__ = (
+        db.Index('ix_ram_worker_messages_event_key_failed_at', 'event_key', 'failed_at'),
+    )
+    _log = False
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    event_key = db.Column(db.String(255), nullable=False)
+    message = db.Column(LONGTEXT, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    failed_at = db.Column(db.DateTime)
+    created_at = db.Column(db.TIMESTAMP, server_default=func.now(), default=func.now(), nullable=False)
@@ -0,0 +1,20 @@
+# coding=utf-8
+import logging
+
+from catalog.models import db
+
+_logger = logging.getLogger(__name__)
+
+
+class SellableProductSearchToken(db.Model):
+    """
+    N-gram index of the accent-stripped name and barcodes of sellable
+    products, used to narrow keyword searches down to candidate ids.
+    Tokens are prefixed by the field they come from, e.g. `n:abc`, `b:893`.
+    """
+    __tablename__ = 'sellable_product_search_tokens'
+    _log = False
+
+    token = db.Column(db.String(32), primary_key=True)
+    sellable_product_id = db.Column(db.Integer, db.ForeignKey('sellable_products.id', ondelete='CASCADE'),
+                                    primary_key=True, index=True)
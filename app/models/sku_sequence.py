@@ -0,0 +1,18 @@
+# coding=utf-8
+import logging
+
+from catalog.models import db
+
+_logger = logging.getLogger(__name__)
+
+
+class SkuSequence(db.Model):
+    """
+    Last SKU reserved for the month `prefix` (yymm), blocks of SKUs are
+    reserved by moving `last_sku` forward
+    """
+    __tablename__ = 'sku_sequences'
+    _log = False
+
+    prefix = db.Column(db.String(4), primary_key=True)
+    last_sku = db.Column(db.BigInteger, nullable=False)
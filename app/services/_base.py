@@ -1,4 +1,9 @@
 # coding=utf-8
+import base64
+import binascii
+import hashlib
+import json
+
 from sqlalchemy import (
     asc,
     desc,
@@ -6,11 +11,17 @@ from sqlalchemy import (
     or_,
     orm,
     func,
+    text,
 )
 from sqlalchemy.orm import lazyload
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.schema import Column, Table
 
+import config
 from catalog import models
+from catalog.constants import COUNT_MODE
 from catalog.extensions import exceptions as exc
+from catalog.extensions.flask_cache import cache
 
 
 class Singleton:
@@ -26,9 +37,50 @@ class Singleton:
         return cls.instance
 
 
+def encode_cursor(values):
+    """Pack the sort-key values of a row into an opaque pagination cursor
+
+    :param list values:
+    :rtype: str
+    """
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor, size):
+    """Unpack a cursor made by `encode_cursor`
+
+    :param str cursor:
+    :param int size: number of sort-key values the cursor must contain
+    :rtype: list
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, AttributeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise exc.BadRequestException('Con trỏ phân trang không hợp lệ')
+    return values
+
+
+def _seek_condition(columns, values):
+    """Row-value comparison `(c1, c2, ...) < (v1, v2, ...)` expanded to
+    OR/AND so that MySQL can still range-scan the index on c1
+    """
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return column < value
+    return or_(
+        column < value,
+        and_(column == value, _seek_condition(columns[1:], values[1:]))
+    )
+
+
 class QueryBase:
     model = None
     obvious_not_found = None
+    # unique sort key used by keyset pagination, all columns descending
+    cursor_columns = ()
     def __init__(self, query=None):
         self.obvious_not_found = False
         if query:
@@ -85,6 +137,38 @@ class QueryBase:
         self.query = self.query.offset((page - 1) * page_size).limit(page_size)
         return self
 
+    def seek(self, after, page_size):
+        """Keyset pagination over `cursor_columns`
+
+        Continue right after the row encoded in `after` instead of skipping
+        rows with OFFSET, so a deep page costs the same as the first one.
+
+        :param after: `next_cursor` of the previous page, empty for the first page
+        :param page_size:
+        """
+        if self.obvious_not_found:
+            return self
+
+        columns = self.cursor_columns
+        if after:
+            values = decode_cursor(after, len(columns))
+            self.query = self.query.filter(_seek_condition(columns, values))
+        self.query = self.query.order_by(None).order_by(
+            *[column.desc() for column in columns]
+        ).limit(page_size)
+        return self
+
+    def next_cursor(self, items, page_size):
+        """Cursor of the page following `items`, None if it is the last page
+
+        :param items: rows of the current page
+        :param page_size:
+        """
+        if not self.cursor_columns or not items or len(items) < page_size:
+            return None
+        last = items[-1]
+        return encode_cursor([getattr(last, column.key) for column in self.cursor_columns])
+
     def __iter__(self):
         yield from self.query
 
@@ -92,9 +176,62 @@ class QueryBase:
         if self.obvious_not_found:
             return 0
 
-        count_query = self.query
-        count_query = count_query.options(lazyload('*')).statement.with_only_columns([func.count()]).order_by(None)
-        return models.db.session.execute(count_query).scalar()
+        return models.db.session.execute(self._count_statement()).scalar()
+
+    def _count_statement(self):
+        return self.query.options(lazyload('*')).statement.with_only_columns([func.count()]).order_by(None)
+
+    def count(self, include_total=True, mode=None):
+        """Total records of the current filters
+
+        :param include_total: False to skip counting, None is returned
+        :param mode: one of COUNT_MODE, exact by default
+            - cached: reuse the total of identical filters for COUNT_CACHE_TIMEOUT seconds
+            - estimated: read the optimizer row estimate, only for unfiltered
+              or seller-only scans, otherwise falls back to an exact count
+        """
+        if not include_total:
+            return None
+        if self.obvious_not_found:
+            return 0
+
+        if mode == COUNT_MODE.CACHED:
+            return self._cached_count()
+        if mode == COUNT_MODE.ESTIMATED and self._is_estimable():
+            return self._estimated_count()
+        return len(self)
+
+    def _cached_count(self):
+        statement = self._count_statement().compile(dialect=models.db.engine.dialect)
+        normalized = json.dumps(statement.params, sort_keys=True, default=str)
+        digest = hashlib.sha1(f'{statement}|{normalized}'.encode()).hexdigest()
+        key = f'count:{self.__class__.__name__}:{digest}'
+
+        total = cache.get(key)
+        if total is None:
+            total = len(self)
+            cache.set(key, total, timeout=config.COUNT_CACHE_TIMEOUT)
+        return total
+
+    def _is_estimable(self):
+        if models.db.engine.dialect.name != 'mysql':
+            return False
+        statement = self.query.statement
+        if len(statement.froms) != 1 or not isinstance(statement.froms[0], Table):
+            return False
+        if statement.whereclause is None:
+            return True
+        seller_id = getattr(self.__class__.model, 'seller_id', None)
+        columns = [e for e in visitors.iterate(statement.whereclause, {}) if isinstance(e, Column)]
+        return seller_id is not None and all(c is seller_id.property.columns[0] for c in columns)
+
+    def _estimated_count(self):
+        statement = self.query.options(lazyload('*')).statement.order_by(None).compile(
+            dialect=models.db.engine.dialect,
+            compile_kwargs={'literal_binds': True}
+        )
+        plan = models.db.session.execute(text(f'EXPLAIN {statement}')).first()
+        return int(plan['rows'] or 0) if plan else 0
 
     def get_query(self):
         return self.query
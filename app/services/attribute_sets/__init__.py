@@ -4,6 +4,8 @@ import logging
 from ._base import AttributeSetBaseService
 from .config import AttributeSetConfigService
 from .attribute_set import AttributeSetService
+from .metadata import get_attribute_set_metadata, invalidate_attribute_set_metadata
+from .seo_config_matcher import get_seo_config_matcher, invalidate_seo_config_matchers
 
 __author__ = 'Kien.HT'
 _logger = logging.getLogger(__name__)
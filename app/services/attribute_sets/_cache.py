@@ -0,0 +1,47 @@
+# coding=utf-8
+import logging
+import time
+
+from catalog.extensions.flask_cache import cache
+
+_logger = logging.getLogger(__name__)
+
+
+class VersionedCache:
+    """
+    Process-local cache of compiled attribute set data. A version counter
+    kept in the shared cache is bumped on invalidation so that the other
+    processes drop their copy too; `timeout` bounds staleness when the
+    cache backend is not shared.
+    """
+
+    def __init__(self, name, timeout):
+        self.version_key = f'{name}:version'
+        self.timeout = timeout
+        self.entries = {}
+
+    def _current_version(self):
+        try:
+            return cache.get(self.version_key) or 0
+        except Exception as e:
+            _logger.warning(f'Can not read {self.version_key}: {e}')
+            return None
+
+    def get(self, key, loader):
+        version = self._current_version()
+        cached = self.entries.get(key)
+        if cached:
+            loaded_at, cached_version, value = cached
+            if cached_version == version and time.time() - loaded_at < self.timeout:
+                return value
+
+        value = loader()
+        self.entries[key] = (time.time(), version, value)
+        return value
+
+    def invalidate(self):
+        self.entries.clear()
+        try:
+            cache.inc(self.version_key)
+        except Exception as e:
+            _logger.warning(f'Can not bump {self.version_key}: {e}')
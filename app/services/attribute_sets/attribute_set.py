@@ -241,6 +241,7 @@ class AttributeSetService(Singleton, AttributeSetBaseService):
             m.db.session.rollback()
             raise exc.BadRequestException(str(e))
         else:
+            signals.attribute_set_updated_signal.send(set_id)
             return attr_set
 
     def get_config(self, config_id):
@@ -344,6 +345,7 @@ class AttributeSetService(Singleton, AttributeSetBaseService):
         instance.is_variation = 1
         instance.variation_display_type = variation_display_type
         m.db.session.commit()
+        signals.attribute_set_updated_signal.send(attribute_set_id)
         return instance
 
     def update_order_variation_attribute(self, set_id, ids):
@@ -6,7 +6,7 @@ from catalog import utils
 from catalog.services import Singleton
 from catalog import models as m
 from catalog.services.attribute_sets import AttributeSetBaseService
-from catalog.extensions import exceptions as exc
+from catalog.extensions import exceptions as exc, signals
 
 
 class AttributeSetConfigService(Singleton, AttributeSetBaseService):
@@ -70,6 +70,7 @@ class AttributeSetConfigService(Singleton, AttributeSetBaseService):
             m.db.session.rollback()
             raise e
         else:
+            signals.attribute_set_config_updated_signal.send(config_id)
             return ret
 
     def allow_config_detail(self, attribute_set_config_id, attribute_id):
@@ -136,6 +137,7 @@ class AttributeSetConfigService(Singleton, AttributeSetBaseService):
             m.db.session.rollback()
             raise e
         else:
+            signals.attribute_set_config_updated_signal.send(data['attribute_set_id'])
             return self.get_config_list(data['attribute_set_id'])
 
     def get_config_detail_common(self, config_id):
@@ -0,0 +1,150 @@
+# coding=utf-8
+import logging
+
+import config
+from catalog import models as m
+from catalog.constants import OPTION_VALUE_NOT_DISPLAY
+from catalog.extensions import signals
+from ._cache import VersionedCache
+
+_logger = logging.getLogger(__name__)
+
+_metadata = VersionedCache('attribute_set_metadata', config.ATTRIBUTE_SET_METADATA_TIMEOUT)
+
+
+def _get_unit_code(map_units, unit_id):
+    unit = map_units.get(unit_id) if unit_id else None
+    return unit.code if unit else ''
+
+
+def _load_options(session, attr_ids):
+    """
+    :return: (displayed options per attribute id, all option values per attribute id)
+    """
+    options = session.query(m.AttributeOption).filter(
+        m.AttributeOption.attribute_id.in_(attr_ids)
+    ).all() if attr_ids else []
+    unit_ids = {o.unit_id for o in options if o.unit_id and o.unit_id > 0}
+    map_units = {u.id: u for u in session.query(m.ProductUnit).filter(
+        m.ProductUnit.id.in_(unit_ids))} if unit_ids else {}
+
+    map_options = {}
+    map_values = {}
+    for o in options:
+        map_values.setdefault(o.attribute_id, []).append(o.value)
+        if o.value == OPTION_VALUE_NOT_DISPLAY:
+            continue
+        map_options.setdefault(o.attribute_id, []).append({
+            'id': o.id,
+            'value': o.value,
+            'thumbnail_url': o.thumbnail_url,
+            'attribute_id': o.attribute_id,
+            'unit_id': o.unit_id,
+            'unit_code': _get_unit_code(map_units, o.unit_id),
+            'priority': o.priority
+        })
+    return map_options, map_values
+
+
+def load_attribute_set_metadata(attribute_set_id, session=None):
+    """
+    Compile the groups, attributes, options and unit codes of an attribute set
+
+    :return: dict with
+        - groups: groups ordered by priority, each with its `attributes`
+        - attributes: every attribute of the set, ordered by group then attribute priority
+        - variations: attribute id -> is_variation
+        - options: attribute id -> displayed options
+    """
+    session = session or m.db.session
+    rows = session.query(
+        m.AttributeGroup,
+        m.AttributeGroupAttribute,
+        m.Attribute
+    ).join(
+        m.AttributeGroupAttribute,
+        m.AttributeGroup.id == m.AttributeGroupAttribute.attribute_group_id, isouter=True
+    ).join(
+        m.Attribute,
+        m.Attribute.id == m.AttributeGroupAttribute.attribute_id, isouter=True
+    ).filter(
+        m.AttributeGroup.attribute_set_id == attribute_set_id
+    ).order_by(m.AttributeGroup.priority, m.AttributeGroupAttribute.priority).all()
+
+    map_options, map_values = _load_options(session, [attr.id for _, _, attr in rows if attr])
+    map_groups = {}
+    attributes = []
+    variations = {}
+    for group, attr_group, attr in rows:
+        if group.id not in map_groups:
+            map_groups[group.id] = {
+                'id': group.id,
+                'code': group.code,
+                'name': group.name,
+                'is_flat': group.is_flat,
+                'priority': group.priority,
+                'parent_id': group.parent_id,
+                'system_group': group.system_group,
+                'attributes': []
+            }
+        if not attr or not attr_group:
+            continue
+        map_groups[group.id]['attributes'].append({
+            'attribute_id': attr.id,
+            'code': attr.code,
+            'name': attr.display_name or attr.name,
+            'value_type': attr.value_type,
+            'is_searchable': attr.is_searchable,
+            'is_filterable': attr.is_filterable,
+            'is_comparable': attr.is_comparable,
+            'text_before': attr_group.text_before,
+            'text_after': attr_group.text_after,
+            'is_variation': attr_group.is_variation,
+            'priority': attr_group.priority,
+            'variation_display_type': attr_group.variation_display_type,
+            'is_displayed': attr_group.is_displayed,
+            'options': map_options.get(attr.id)
+        })
+        attributes.append({
+            'id': attr.id,
+            'code': attr.code,
+            'name': attr.name,
+            'display_name': attr.display_name,
+            'description': attr.description,
+            'value_type': attr.value_type,
+            'is_variation': attr_group.is_variation,
+            'system_group': group.system_group,
+            'option_values': map_values.get(attr.id, [])
+        })
+        variations[attr.id] = attr_group.is_variation
+
+    return {
+        'groups': list(map_groups.values()),
+        'attributes': attributes,
+        'variations': variations,
+        'options': map_options,
+    }
+
+
+def get_attribute_set_metadata(attribute_set_id, session=None):
+    """
+    Compiled metadata of an attribute set, cached in the process until an
+    attribute, an option or the set changes. The returned structure is
+    shared, callers must not modify it.
+    """
+    return _metadata.get(attribute_set_id, lambda: load_attribute_set_metadata(attribute_set_id, session))
+
+
+def invalidate_attribute_set_metadata():
+    """
+    Attributes and options are shared between attribute sets, so every
+    compiled set is dropped
+    """
+    _metadata.invalidate()
+
+
+@signals.on_attribute_updated
+@signals.on_attribute_option_updated
+@signals.on_attribute_set_updated
+def on_attribute_set_metadata_changed(sender, **kwargs):
+    invalidate_attribute_set_metadata()
@@ -0,0 +1,110 @@
+# coding=utf-8
+import logging
+from collections import namedtuple
+
+import config
+from catalog import models as m
+from catalog.extensions import signals
+from ._cache import VersionedCache
+
+_logger = logging.getLogger(__name__)
+
+NUMBER_SET_CONFIG_ATTRIBUTES = 5
+
+SeoConfigRule = namedtuple('SeoConfigRule', [
+    'id', 'brand_id', 'attribute_1_id', 'attribute_2_id', 'attribute_3_id', 'attribute_4_id', 'attribute_5_id'
+])
+
+_matchers = VersionedCache('seo_config_matcher', config.ATTRIBUTE_SET_METADATA_TIMEOUT)
+
+
+def _order_attribute_set_configs(query):
+    return query.order_by(m.AttributeSetConfig.attribute_5_id.desc(), m.AttributeSetConfig.attribute_4_id.desc(),
+                          m.AttributeSetConfig.attribute_3_id.desc(), m.AttributeSetConfig.attribute_2_id.desc(),
+                          m.AttributeSetConfig.attribute_1_id.desc(), m.AttributeSetConfig.brand_id.desc())
+
+
+def _to_rule(config):
+    return SeoConfigRule(config.id, config.brand_id or None, *(
+        getattr(config, f'attribute_{i + 1}_id') for i in range(NUMBER_SET_CONFIG_ATTRIBUTES)))
+
+
+class SeoConfigMatcher:
+    """
+    SEO configs of an attribute set compiled for lookup. A config matches a
+    SKU of its brand (or any brand if it has none) when one of its attribute
+    slots is empty or equals a variant attribute of the SKU; the first
+    matching config in priority order wins.
+    """
+
+    def __init__(self, attribute_set_id, session=None):
+        session = session or m.db.session
+        configs = _order_attribute_set_configs(session.query(m.AttributeSetConfig).filter(
+            m.AttributeSetConfig.attribute_set_id == attribute_set_id,
+            m.AttributeSetConfig.is_deleted == 0)).all()
+        default = _order_attribute_set_configs(session.query(m.AttributeSetConfig).filter(
+            m.AttributeSetConfig.attribute_set_id == attribute_set_id,
+            m.AttributeSetConfig.is_default == 1)).first()
+
+        self.rules = [_to_rule(config) for config in configs]
+        self.default = _to_rule(default) if default else None
+        # (brand_id, attribute_id, value) -> rank of the first config having that slot
+        self.index = {}
+        # brand_id -> rank of the first config having an empty slot
+        self.wildcards = {}
+        for rank, config in enumerate(configs):
+            brand_id = config.brand_id or None
+            for i in range(NUMBER_SET_CONFIG_ATTRIBUTES):
+                attribute_id = getattr(config, f'attribute_{i + 1}_id')
+                value = getattr(config, f'attribute_{i + 1}_value')
+                if not attribute_id and not value:
+                    self.wildcards.setdefault(brand_id, rank)
+                else:
+                    self.index.setdefault((brand_id, attribute_id, value), rank)
+
+        config_ids = [rule.id for rule in self.rules]
+        if self.default:
+            config_ids.append(self.default.id)
+        self.details = {}
+        for detail in session.query(m.AttributeSetConfigDetail).filter(
+                m.AttributeSetConfigDetail.attribute_set_config_id.in_(config_ids)
+        ).order_by(m.AttributeSetConfigDetail.priority) if config_ids else []:
+            self.details.setdefault(detail.attribute_set_config_id, []).append({
+                'field_display': detail.field_display,
+                'object_type': detail.object_type,
+                'object_value': detail.object_value,
+                'text_before': detail.text_before,
+                'text_after': detail.text_after,
+            })
+
+    def match(self, brand_id, variant_attributes):
+        brands = {None, brand_id or None}
+        ranks = [self.wildcards[b] for b in brands if b in self.wildcards]
+        for va in variant_attributes:
+            for b in brands:
+                rank = self.index.get((b, va.get('attribute_id'), va.get('value')))
+                if rank is not None:
+                    ranks.append(rank)
+        return self.rules[min(ranks)] if ranks else None
+
+    def get_details(self, config_id):
+        return self.details.get(config_id, [])
+
+
+def get_seo_config_matcher(attribute_set_id, session=None):
+    """
+    Compiled matcher of an attribute set, cached in the process until the
+    SEO configs or the attribute set change. The returned object is shared,
+    callers must not modify it.
+    """
+    return _matchers.get(attribute_set_id, lambda: SeoConfigMatcher(attribute_set_id, session))
+
+
+def invalidate_seo_config_matchers():
+    _matchers.invalidate()
+
+
+@signals.on_attribute_set_updated
+@signals.on_attribute_set_config_updated
+def on_seo_configs_changed(sender, **kwargs):
+    invalidate_seo_config_matchers()
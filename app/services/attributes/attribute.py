@@ -8,6 +8,7 @@ from catalog.services import Singleton
 from catalog.extensions import signals
 from catalog.constants import FULLFILLMENT_BY_SELLER
 from catalog.services import seller as seller_srv
+from catalog.services.attribute_sets.metadata import invalidate_attribute_set_metadata
 from .attribute_query import AttributeQuery
 
 
@@ -84,6 +85,7 @@ class AttributeService(Singleton):
 
         m.db.session.add(option)
         m.db.session.commit()
+        invalidate_attribute_set_metadata()
 
         return option
 
@@ -113,6 +115,7 @@ class AttributeService(Singleton):
         ).delete(synchronize_session=False)
 
         m.db.session.commit()
+        invalidate_attribute_set_metadata()
 
     def get_list_attribute_options(self, attribute_id, filters, page=1, page_size=10):
         """Get list attribute options
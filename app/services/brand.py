@@ -91,10 +91,12 @@ class BrandListQuery(QueryBase):
 def get_brand_list(**params):
     page = params.pop('page')
     page_size = params.pop('page_size')
+    include_total = params.pop('include_total', True)
+    count_mode = params.pop('count_mode', None)
     list_query = BrandListQuery()
     list_query.apply_filters(params)
     list_query.sort('updated_at', 'descend')
-    total_records = len(list_query)
+    total_records = list_query.count(include_total, count_mode)
     list_query.pagination(page, page_size)
 
     return {
@@ -16,6 +16,7 @@ from catalog.services.master_categories import MasterCategoryService
 import logging
 
 from catalog.extensions.exceptions import BadRequestException
+from catalog.utils.category import sync_closure
 from catalog.utils.validation_utils import validate_required
 from catalog.models import db
 from catalog.services.shipping_types.category_shipping_type import CategoryShippingTypeService
@@ -109,7 +110,7 @@ class CategoryService(Singleton):
                 return [], 0
             query.restrict_by_seller(kwargs['seller_id'])
         query.apply_filters(filters)
-        total_records = len(query)
+        total_records = query.count(kwargs.get('include_total', True), kwargs.get('count_mode'))
         query.pagination(page, page_size)
         categories = query.all()
         category_ids = list(map(lambda x: x.id, categories))
@@ -176,6 +177,7 @@ class CategoryService(Singleton):
         category = CategoryRepository.transaction_insert(data)
         category.path = category.path + str(category.id)
         category.is_active = True
+        sync_closure(category)
 
         if shipping_types:
             for shipping_type_id in shipping_types:
@@ -273,6 +275,7 @@ class CategoryService(Singleton):
             current_node.path = "{}/{}".format(parent_node.path, current_node.id)
             current_node.depth = parent_node.depth + 1
             current_node.parent_id = parent_node.id
+        sync_closure(current_node)
 
         child_nodes = current_node.children
         if child_nodes:
@@ -387,6 +390,7 @@ class CategoryService(Singleton):
         category = CategoryRepository.transaction_insert(data)
         category.path = category.path + str(category.id)
         category.is_active = True
+        sync_closure(category)
         models.db.session.flush()
         # models.db.session.commit() # Test to commit category eachtime a cat is created
         # category_created_signal.send(category)
@@ -434,3 +438,23 @@ class ProductCategoryService:
         product_category_query.apply_filter(**product_category_filter)
         product_categories = product_category_query.all()
         return product_categories
+
+    @staticmethod
+    def get_product_category_map(product_ids, seller_ids):
+        """
+        Categories of the products, loaded with one query
+
+        :return: dict {(product_id, category seller_id): Category}
+        """
+        if not product_ids or not seller_ids:
+            return {}
+        rows = models.db.session.query(models.ProductCategory.product_id, models.Category).join(
+            models.Category, models.Category.id == models.ProductCategory.category_id
+        ).filter(
+            models.ProductCategory.product_id.in_(product_ids),
+            models.Category.seller_id.in_(seller_ids)
+        ).all()
+        product_categories = {}
+        for product_id, category in rows:
+            product_categories.setdefault((product_id, category.seller_id), category)
+        return product_categories
@@ -1,6 +1,7 @@
 # coding=utf-8
 import time
 from catalog import models
+from catalog.utils.category import sync_closure
 from .query import CategoryRepository
 from catalog.extensions.signals import (
     category_created_signal,
@@ -41,6 +42,7 @@ def __insert_category(base_data, seller_id, parent=None):
     category.path = f'{category.id}'
     if parent:
         category.path = f'{parent.path}/{category.id}'
+    sync_closure(category)
     return category
 
 
@@ -58,6 +60,7 @@ def __get_and_init_dic(seller_id, dic, cat, parent=None):
                 item.parent_id = parent.id
                 item.depth = parent.depth + 1
                 item.path = f'{parent.path}/{item.id}'
+                sync_closure(item)
         else:
             upsert_type = __UPSERT_INSERT
             item = __insert_category(cat, seller_id, parent)
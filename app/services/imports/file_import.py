@@ -9,18 +9,16 @@ from ...extensions.flask_cache import cache
 _logger = logging.getLogger(__name__)
 from collections import ChainMap
 
-import pandas as pd
-import requests
-from flask import current_app
 from flask_login import current_user
 from sqlalchemy.orm import load_only
 from catalog.extensions import signals
 from catalog import utils
 from catalog import models
-from catalog.extensions import exceptions as exc
 from catalog.services import Singleton
 from .import_item_query import ImportItemQuery
 from .query import ImportHistoryQuery
+from .reader import ImportFileReader
+from . import spool
 from catalog.validators import imports as validators
 from catalog import models as m
 from ..attribute_sets.attribute_set import get_normal_attribute
@@ -40,6 +38,27 @@ static_column_convert = {
     'is tracking serial?': lambda x: True if 'Yes' else False,
 }
 
+
+def get_static_column_convert(resolver):
+    """
+    Same converters as `static_column_convert`, resolved from the reference
+    data preloaded by `resolver` instead of one query per cell. Unknown
+    values raise `exc.BadRequestException` so the row fails as before.
+
+    :param resolvers.ReferenceDataResolver resolver: resolver of the import job
+    """
+    return {
+        'brand': resolver.brand_id,
+        'category': resolver.category_id,
+        'master category': resolver.master_category_id,
+        'vendor tax': resolver.tax_id,
+        'product type': resolver.product_type_id,
+        'uom': resolver.unit_id,
+        'terminal_group': resolver.terminal_group_id,
+        'allow selling without stock?': static_column_convert['allow selling without stock?'],
+        'is tracking serial?': static_column_convert['is tracking serial?'],
+    }
+
 static_columns_config = {
     "name": {
         "id": 1,
@@ -245,36 +264,47 @@ class ImportFile(object):
     SHEET_NAME = 0
     IMPORT_FILE_TYPE = ''
     AFTER_IMPORT_SIGNAL = None
+    # row holding the column codes the rows are keyed by in chunked imports, the header when None
+    CODE_ROW_OFFSET = None
+    # check the required columns of get_static_columns_config before accepting the file,
+    # only enable it for a type once its template has been checked to carry these codes
+    VALIDATE_HEADERS = False
 
-    def import_file(self, file, user_info, set_id=None, platform_id=None):
+    def read_total_row(self, file, user_info, set_id=None):
         file.seek(0)
-        upload_url = current_app.config['FILE_API'] + '/upload/doc'
-        resp = requests.post(
-            url=upload_url,
-            files={'file': (file.filename, file, file.content_type)},
-        )
-        if resp.status_code != 200:
-            raise exc.BadRequestException('Upload file không thành công', errors=resp.json())
-        df = pd.read_excel(file, sheet_name=self.SHEET_NAME, header=self.TITLE_ROW_OFFSET)
+        with ImportFileReader(file, sheet_name=self.SHEET_NAME, title_row_offset=self.TITLE_ROW_OFFSET) as reader:
+            if self.VALIDATE_HEADERS:
+                reader.validate_headers(get_static_columns_config(
+                    attribute_set_id=set_id,
+                    seller_id=user_info.seller_id,
+                    type=self.IMPORT_FILE_TYPE
+                ))
+            return reader.count_rows()
+
+    def import_file(self, file, user_info, set_id=None, platform_id=None):
+        total_row = self.read_total_row(file, user_info, set_id)
+        key = utils.random_string(10)
+        spool.spool_file(file, key)
         import_record = models.FileImport(
             type=self.IMPORT_FILE_TYPE,
-            key=utils.random_string(10),
+            key=key,
             status='new',
-            total_row=df.shape[0],
+            total_row=total_row,
             attribute_set_id=set_id,
             seller_id=user_info.seller_id,
             platform_id=platform_id,
             created_by=user_info.email,
             name=file.filename,
-            path=resp.json().get('url')
         )
         models.db.session.add(import_record)
         models.db.session.commit()
 
-        if self.AFTER_IMPORT_SIGNAL:
-            self.AFTER_IMPORT_SIGNAL.send({
-                'id': import_record.id,
-            })
+        # the file is pushed to the file service in the background, which
+        # sends AFTER_IMPORT_SIGNAL once `path` is set
+        signals.import_file_spooled_signal.send({
+            'id': import_record.id,
+            'content_type': file.content_type,
+        })
         return import_record
 
 
@@ -283,6 +313,7 @@ class ImportFileProduct(ImportFile):
     SHEET_NAME = 'Import_SanPham'
     IMPORT_FILE_TYPE = 'create_product'
     AFTER_IMPORT_SIGNAL = signals.product_import_signal
+    CODE_ROW_OFFSET = 5
 
 
 class ImportFileProductBasicInfo(ImportFile):
@@ -0,0 +1,155 @@
+# coding=utf-8
+import logging
+
+import openpyxl
+import xlrd
+from openpyxl.utils.exceptions import InvalidFileException
+
+from catalog.extensions import exceptions as exc
+
+_logger = logging.getLogger(__name__)
+
+# .xls files are OLE2 compound documents, openpyxl only reads .xlsx
+_XLS_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _is_xls(file):
+    position = file.tell()
+    signature = file.read(len(_XLS_SIGNATURE))
+    file.seek(position)
+    return signature == _XLS_SIGNATURE
+
+
+class _XlsWorkbook(object):
+    """
+    Expose an xlrd workbook with the subset of the openpyxl read-only API
+    used by `ImportFileReader`. Cell values are converted the way
+    `pd.read_excel` did: dates to datetime, integral floats to int and
+    empty cells to None.
+    """
+
+    def __init__(self, file):
+        self._book = xlrd.open_workbook(file_contents=file.read(), on_demand=True)
+
+    @property
+    def worksheets(self):
+        return [_XlsSheet(self._book, self._book.sheet_by_index(index))
+                for index in range(self._book.nsheets)]
+
+    def __getitem__(self, name):
+        try:
+            return _XlsSheet(self._book, self._book.sheet_by_name(name))
+        except xlrd.XLRDError:
+            raise KeyError(name)
+
+    def close(self):
+        self._book.release_resources()
+
+
+class _XlsSheet(object):
+    def __init__(self, book, sheet):
+        self._book = book
+        self._sheet = sheet
+
+    def _value(self, cell):
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+            return None
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            return xlrd.xldate.xldate_as_datetime(cell.value, self._book.datemode)
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(cell.value)
+        if cell.ctype == xlrd.XL_CELL_NUMBER and cell.value == int(cell.value):
+            return int(cell.value)
+        return cell.value
+
+    def iter_rows(self, min_row=1, max_row=None, values_only=True):
+        max_row = min(max_row or self._sheet.nrows, self._sheet.nrows)
+        for index in range(min_row - 1, max_row):
+            yield tuple(self._value(cell) for cell in self._sheet.row(index))
+
+
+class ImportFileReader(object):
+    """
+    Read an import sheet row by row with openpyxl in read-only mode, so the
+    memory used does not depend on the number of rows. Legacy .xls files
+    are read with xlrd, as `pd.read_excel` did.
+
+    The header is the row at index `title_row_offset` (0-based, like the
+    `header` of `pd.read_excel`), data rows come after it and blank rows are
+    skipped. Rows are keyed by the header, or by the row at index
+    `code_row_offset` when given, e.g. the column codes above the
+    descriptions of the product templates.
+    """
+
+    def __init__(self, file, sheet_name=0, title_row_offset=1, code_row_offset=None):
+        try:
+            if _is_xls(file):
+                self._workbook = _XlsWorkbook(file)
+            else:
+                self._workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        except (InvalidFileException, xlrd.XLRDError, KeyError, OSError, ValueError) as e:
+            _logger.warning(f'Can not read import file: {e}')
+            raise exc.BadRequestException('File không đúng định dạng')
+        try:
+            if isinstance(sheet_name, int):
+                self._sheet = self._workbook.worksheets[sheet_name]
+            else:
+                self._sheet = self._workbook[sheet_name]
+        except (IndexError, KeyError):
+            self.close()
+            raise exc.BadRequestException(f'Không tìm thấy sheet {sheet_name} trong file')
+        self._header_row = title_row_offset + 1
+        self._key_row = code_row_offset + 1 if code_row_offset is not None else self._header_row
+        self._headers = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._workbook.close()
+
+    @property
+    def headers(self):
+        if self._headers is None:
+            row = next(self._sheet.iter_rows(
+                min_row=self._key_row, max_row=self._key_row, values_only=True), ())
+            self._headers = [str(value).strip() if not _is_blank(value) else None for value in row]
+        return self._headers
+
+    def _iter_values(self):
+        for row in self._sheet.iter_rows(min_row=self._header_row + 1, values_only=True):
+            if not all(_is_blank(value) for value in row):
+                yield row
+
+    def iter_rows(self):
+        """
+        Yield each data row as a dict keyed by the header of its column
+        """
+        headers = self.headers
+        for row in self._iter_values():
+            yield {header: value for header, value in zip(headers, row) if header}
+
+    def count_rows(self):
+        return sum(1 for _ in self._iter_values())
+
+    def validate_headers(self, columns_config):
+        """
+        Check that every required column of `columns_config` (as returned by
+        `get_static_columns_config`) has its code in the header rows
+
+        :raise exc.BadRequestException: when required columns are missing
+        """
+        codes = set()
+        for row in self._sheet.iter_rows(min_row=1, max_row=self._header_row, values_only=True):
+            codes.update(str(value).strip().lower() for value in row if not _is_blank(value))
+        missing = [column['title'] for code, column in columns_config.items()
+                   if column.get('required') and code.lower() not in codes]
+        if missing:
+            raise exc.BadRequestException(f'File không đúng định dạng, thiếu cột: {", ".join(missing)}')
@@ -0,0 +1,155 @@
+# coding=utf-8
+import logging
+
+from catalog import models as m
+from catalog.constants import UOM_CODE_ATTRIBUTE
+from catalog.extensions import exceptions as exc
+
+_logger = logging.getLogger(__name__)
+
+
+def _key(value):
+    # reference names are compared case-insensitively, like the MySQL collation
+    return str(value).strip().lower() if value is not None else None
+
+
+def _code(value):
+    # selection cells hold `code=>name`
+    return _key(str(value).split('=>')[0]) if value is not None else None
+
+
+class ReferenceDataResolver(object):
+    """
+    Reference data of an import job. Each table is loaded once, on its first
+    lookup, then every cell is resolved from memory; a resolver lives as long
+    as its job, so changes made meanwhile are not seen.
+
+    Lookups raise `exc.BadRequestException` when nothing matches, which fails
+    the row like the `.first().id` of `static_column_convert`; empty cells
+    give None.
+    """
+
+    def __init__(self, seller_id=None, session=None):
+        self.seller_id = seller_id
+        self.session = session or m.db.session
+        self._tables = {}
+
+    def _table(self, name, loader):
+        if name not in self._tables:
+            table = {}
+            for key, value in loader():
+                # the first row wins, like `.first()` on the same filter
+                table.setdefault(key, value)
+            self._tables[name] = table
+        return self._tables[name]
+
+    def _brands(self):
+        for id, name in self.session.query(m.Brand.id, m.Brand.name).order_by(m.Brand.id):
+            yield _key(name), id
+
+    def _categories(self):
+        query = self.session.query(m.Category.id, m.Category.code)
+        if self.seller_id:
+            query = query.filter(m.Category.seller_id == self.seller_id)
+        for id, code in query.order_by(m.Category.id):
+            yield _key(code), id
+
+    def _master_categories(self):
+        for id, code in self.session.query(m.MasterCategory.id, m.MasterCategory.code).order_by(m.MasterCategory.id):
+            yield _key(code), id
+
+    def _taxes(self):
+        for id, label in self.session.query(m.Tax.id, m.Tax.label).order_by(m.Tax.id):
+            yield _key(label), id
+
+    def _product_types(self):
+        for id, name in self.session.query(m.Misc.id, m.Misc.name).filter(
+                m.Misc.type == 'product_type').order_by(m.Misc.id):
+            yield _key(name), id
+
+    def _tax_codes(self):
+        for code, label in self.session.query(m.Tax.code, m.Tax.label).order_by(m.Tax.id):
+            yield _key(label), code
+
+    def _product_type_codes(self):
+        for code, name in self.session.query(m.Misc.code, m.Misc.name).filter(
+                m.Misc.type == 'product_type').order_by(m.Misc.id):
+            yield _key(name), code
+
+    def _shipping_types(self):
+        for id, name in self.session.query(m.ShippingType.id, m.ShippingType.name).filter(
+                m.ShippingType.is_active.is_(True)).order_by(m.ShippingType.id):
+            yield _key(name), id
+
+    def _uoms(self):
+        for id, value in self.session.query(m.AttributeOption.id, m.AttributeOption.value).join(
+                m.Attribute, m.Attribute.id == m.AttributeOption.attribute_id
+        ).filter(m.Attribute.code == UOM_CODE_ATTRIBUTE).order_by(m.AttributeOption.id):
+            yield _key(value), id
+
+    def _units(self):
+        query = self.session.query(m.Unit.id, m.Unit.name)
+        if self.seller_id:
+            query = query.filter(m.Unit.seller_id == self.seller_id)
+        for id, name in query.order_by(m.Unit.id):
+            yield _key(name), id
+
+    def _terminal_groups(self):
+        query = self.session.query(m.TerminalGroup.id, m.TerminalGroup.code)
+        if self.seller_id:
+            query = query.join(
+                m.SellerTerminalGroup, m.SellerTerminalGroup.terminal_group_id == m.TerminalGroup.id
+            ).filter(m.SellerTerminalGroup.seller_id == self.seller_id)
+        for id, code in query.order_by(m.TerminalGroup.id):
+            yield _key(code), id
+
+    def _lookup(self, name, loader, key, title, value):
+        if key is None or key == '':
+            return None
+        id = self._table(name, loader).get(key)
+        if id is None:
+            raise exc.BadRequestException(f'{title} "{value}" không tồn tại trên hệ thống')
+        return id
+
+    def brand_id(self, name):
+        return self._lookup('brands', self._brands, _key(name), 'Thương hiệu', name)
+
+    def category_id(self, value):
+        return self._lookup('categories', self._categories, _code(value), 'Danh mục ngành hàng', value)
+
+    def master_category_id(self, value):
+        return self._lookup('master_categories', self._master_categories, _code(value),
+                            'Danh mục hệ thống', value)
+
+    def tax_id(self, label):
+        return self._lookup('taxes', self._taxes, _key(label), 'Thuế mua vào', label)
+
+    def product_type_id(self, name):
+        return self._lookup('product_types', self._product_types, _key(name), 'Loại hình sản phẩm', name)
+
+    def tax_code(self, label):
+        return self._lookup('tax_codes', self._tax_codes, _key(label), 'Thuế mua vào', label)
+
+    def product_type_code(self, name):
+        return self._lookup('product_type_codes', self._product_type_codes, _key(name),
+                            'Loại hình sản phẩm', name)
+
+    def shipping_type_ids(self, names):
+        """
+        :param names: comma separated names of active shipping types
+        """
+        names = [name.strip() for name in str(names).split(',') if name.strip()] if names else []
+        return [self._lookup('shipping_types', self._shipping_types, _key(name), 'Loại hình vận chuyển', name)
+                for name in names]
+
+    def uom_id(self, value):
+        """
+        :return: id of the option of the uom attribute
+        """
+        return self._lookup('uoms', self._uoms, _key(value), 'Đơn vị tính', value)
+
+    def unit_id(self, name):
+        return self._lookup('units', self._units, _key(name), 'Đơn vị tính', name)
+
+    def terminal_group_id(self, code):
+        return self._lookup('terminal_groups', self._terminal_groups, _key(code), 'Nhóm điểm bán', code)
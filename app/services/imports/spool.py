@@ -0,0 +1,111 @@
+# coding=utf-8
+import io
+import logging
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from catalog import models as m
+
+_logger = logging.getLogger(__name__)
+
+_session = requests.Session()
+_session.mount('http://', HTTPAdapter(pool_maxsize=config.FILE_UPLOAD_POOL_SIZE))
+_session.mount('https://', HTTPAdapter(pool_maxsize=config.FILE_UPLOAD_POOL_SIZE))
+
+
+def _spool_dir():
+    if not config.IMPORT_SPOOL_DIR:
+        raise IOError('IMPORT_SPOOL_DIR is not configured')
+    return config.IMPORT_SPOOL_DIR
+
+
+def spool_path(key):
+    return os.path.join(_spool_dir(), key)
+
+
+def spool_file(file, key):
+    """
+    Copy an uploaded file to the spool, uploaded files older than
+    IMPORT_SPOOL_TTL_HOURS are removed at the same time
+    """
+    os.makedirs(_spool_dir(), exist_ok=True)
+    _prune()
+    path = spool_path(key)
+    file.seek(0)
+    with open(path, 'wb') as f:
+        while True:
+            data = file.read(1024 * 1024)
+            if not data:
+                break
+            f.write(data)
+    file.seek(0)
+    return path
+
+
+def _prune():
+    """
+    Remove the expired files, except those of imports without `path`: a
+    file not uploaded yet is the only copy of its import
+    """
+    expired_at = time.time() - config.IMPORT_SPOOL_TTL_HOURS * 3600
+    expired = {}
+    for name in os.listdir(_spool_dir()):
+        path = os.path.join(_spool_dir(), name)
+        try:
+            if os.path.getmtime(path) < expired_at:
+                expired[name] = path
+        except OSError:
+            pass
+    if not expired:
+        return
+    not_uploaded = {key for key, in m.db.session.query(m.FileImport.key).filter(
+        m.FileImport.key.in_(list(expired)),
+        m.FileImport.path.is_(None)
+    )}
+    for name, path in expired.items():
+        if name in not_uploaded:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def open_import_file(import_record):
+    """
+    Content of an import file, read from the spool while it is there,
+    downloaded from the file service otherwise
+
+    :rtype: io.BytesIO
+    """
+    path = spool_path(import_record.key)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return io.BytesIO(f.read())
+    if not import_record.path:
+        raise IOError(f'File of import {import_record.id} is neither spooled nor uploaded')
+    resp = _session.get(import_record.path, timeout=config.FILE_UPLOAD_TIMEOUT)
+    resp.raise_for_status()
+    return io.BytesIO(resp.content)
+
+
+def upload_spooled_file(import_record, content_type=None):
+    """
+    Push the spooled file of `import_record` to the file service
+
+    :return: url of the uploaded file
+    :raise IOError: when the upload fails
+    """
+    with open(spool_path(import_record.key), 'rb') as f:
+        resp = _session.post(
+            url=config.FILE_API + '/upload/doc',
+            files={'file': (import_record.name, f, content_type)},
+            timeout=config.FILE_UPLOAD_TIMEOUT
+        )
+    if resp.status_code != 200:
+        raise IOError(f'Upload {import_record.name} failed: {resp.status_code} {resp.text}')
+    return resp.json().get('url')
@@ -8,7 +8,6 @@ from flask import send_file
 from flask_login import current_user
 
 from sqlalchemy.orm import (
-    joinedload,
     load_only,
 )
 import openpyxl
@@ -17,6 +16,7 @@ import config
 from catalog import models
 from catalog.constants import UOM_CODE_ATTRIBUTE, IMPORT
 
+from catalog.services.attribute_sets.metadata import get_attribute_set_metadata
 from catalog.services.categories import category
 from catalog.services.seller import get_default_platform_owner_of_seller
 
@@ -48,7 +48,7 @@ class TemplateBase:
     # _______________________MANAGE COLUMN___________________________
     def _add_column_system_group_attributes(self, ws, attributes):
         # ================= Thuộc tính hệ thống ==================
-        system_attributes = [x for x in attributes if bool(x.attribute_group.system_group)]
+        system_attributes = [x for x in attributes if bool(x['system_group'])]
         if len(system_attributes) > 0:
             self.generate_group(
                 ws, 'Thông số hệ thống',
@@ -62,7 +62,7 @@ class TemplateBase:
 
     def _add_column_variation_attribute(self, ws, attributes):
         # ================= Thuộc tính biến thể ==================
-        variation_attributes = [x for x in attributes if bool(x.is_variation)]
+        variation_attributes = [x for x in attributes if bool(x['is_variation'])]
         if len(variation_attributes) > 0:
             self.generate_group(
                 ws, 'Thuộc tính biến thể',
@@ -76,7 +76,7 @@ class TemplateBase:
 
     def _add_column_not_variant_attribute(self, ws, attributes):
         # ================= Thông số kĩ thuật ================ ==
-        normal_attributes = [x for x in attributes if not bool(x.is_variation)]
+        normal_attributes = [x for x in attributes if not bool(x['is_variation'])]
         if len(normal_attributes) > 0:
             self.generate_group(
                 ws, 'Thông số kĩ thuật',
@@ -253,33 +253,18 @@ class TemplateBase:
         return attribute_set
 
     def _load_sample_data_attributes(self, attribute_set_id):
-        attributes = models.db.session.query(models.AttributeGroupAttribute).join(
-            models.AttributeGroup,
-            models.AttributeGroupAttribute.attribute_group_id == models.AttributeGroup.id
-        ).join(
-            models.Attribute,
-            models.Attribute.id == models.AttributeGroupAttribute.attribute_id
-        ).filter(
-            models.Attribute.code.notin_(['uom', 'uom_ratio', ]),
-            models.AttributeGroup.attribute_set_id == attribute_set_id
-        ).options(
-            load_only('is_variation'),
-            joinedload('attribute_group').load_only('system_group'),
-            joinedload('attribute').load_only('name', 'display_name', 'code', 'value_type').options(
-                joinedload('options').load_only('value')
-            )
-        ).order_by(models.AttributeGroup.priority, models.AttributeGroupAttribute.priority).all()
-        return attributes
+        """
+        :return: list[dict], attributes of the set from the shared attribute set metadata
+        """
+        metadata = get_attribute_set_metadata(attribute_set_id)
+        return [x for x in metadata['attributes'] if x['code'] not in ('uom', 'uom_ratio')]
 
     def _load_sample_data_attribute_options(self, attributes):
         sample_data_queries = {}
         for attr_info in attributes:
-            if attr_info.attribute.value_type in ('selection', 'multiple_select'):
-                option_key = attr_info.attribute.display_name or attr_info.attribute.name
-                sample_data_queries[option_key] = map(
-                    lambda x: x.value,
-                    attr_info.attribute.options
-                )
+            if attr_info['value_type'] in ('selection', 'multiple_select'):
+                option_key = attr_info['display_name'] or attr_info['name']
+                sample_data_queries[option_key] = iter(attr_info['option_values'])
         return sample_data_queries
 
     # _______________________WORK WITH EXCEL FILE__________________________
@@ -363,15 +348,15 @@ class TemplateBase:
 
     def attribute_object_to_dict(self, attributes, description=None, force_required=False):
         """
-        :param: attributes, list[AttributeGroupAttribute]
+        :param: attributes, list[dict] from the attribute set metadata
         """
         ret = []
         for x in attributes:
             ret.append({
-                'name': x.attribute.name,
-                'display_name': x.attribute.display_name,
-                'code': x.attribute.code,
-                'description': x.attribute.description,
+                'name': x['name'],
+                'display_name': x['display_name'],
+                'code': x['code'],
+                'description': x['description'],
                 'required': force_required,
             })
         return ret
@@ -11,6 +11,7 @@ import sqlalchemy as sa
 from catalog import models as m
 from catalog import utils
 from catalog.services import Singleton
+from catalog.utils.category import sync_closure
 from .query import MasterCategoryQuery
 
 __author__ = 'Thanh.NK'
@@ -56,6 +57,7 @@ class MasterCategoryService(Singleton):
         else:
             category.path = str(category.id)
             category.depth = 1
+        sync_closure(category)
         m.db.session.commit()
         return category
 
@@ -78,9 +80,11 @@ class MasterCategoryService(Singleton):
             else:
                 category.path = category.parent.path + '/' + str(category.id)
             category.depth = len(category.path.split('/'))
+            sync_closure(category)
             for node in all_node:
                 node.path = node.parent.path + '/' + str(node.id)
                 node.depth = len(node.path.split('/'))
+                sync_closure(node)
 
         m.db.session.commit()
         return category
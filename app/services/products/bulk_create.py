@@ -0,0 +1,366 @@
+# coding=utf-8
+import logging
+from collections import namedtuple
+
+from catalog import models as m, utils
+from catalog import constants
+from catalog.extensions import signals
+from catalog.models.db_constants import AttributeValueType
+from catalog.services.shipping_types.shipping_type import get_default_shipping_type
+from catalog.utils import decapitalize, safe_cast
+from .sellable import allocate_skus
+
+_logger = logging.getLogger(__name__)
+
+BulkRowResult = namedtuple('BulkRowResult', ['key', 'product', 'sellables', 'error'])
+
+_OPTION_VALUE_TYPES = (AttributeValueType.SELECTION.value, AttributeValueType.MULTI_SELECT.value)
+
+
+class _Row(object):
+    def __init__(self, key, product_data, variants_data):
+        self.key = key
+        self.product_data = product_data
+        self.variants_data = variants_data
+        self.product = None
+        self.sellables = []
+
+
+class BulkProductCreator(object):
+    """
+    Create the products of an import chunk together: products, variants and
+    sellables are flushed once per table for the whole chunk, and variant
+    attributes, categories, SEO info, shipping types and barcodes are
+    written with bulk inserts. The same rules as ProductService.create_product,
+    ProductVariantService.create_variants and create_sellable_product apply.
+
+    Each row is a new product with its variants:
+        creator.add(key, product_data, [{
+            'attributes': [{'id': ..., 'value': ...}],  # uom and uom_ratio included
+            'name': optional,
+            'images': optional [{'url': ...}],
+            'sellable': data of create_sellable_product,
+        }])
+
+    Attributes with `'is_variation': False` are stored on the variant but
+    left out of its generated name and of its uom grouping. `sellable` may carry `terminal_groups`,
+    a list of terminal group codes.
+
+    If the chunk can not be written at once, its rows are written one by one
+    so a bad row only fails itself.
+    """
+
+    def __init__(self, seller, created_by, session=None):
+        self.seller = seller
+        self.created_by = created_by
+        self.session = session or m.db.session
+        self._rows = []
+        self._default_shipping_type = None
+
+    def add(self, key, product_data, variants_data):
+        self._rows.append(_Row(key, dict(product_data), [dict(v) for v in variants_data]))
+
+    def save(self, commit=True):
+        """
+        :param commit: with False, the caller commits and sends
+            `sellable_create_signal` for the sellables of the results
+        :return: list of BulkRowResult, `error` is None for the created rows
+        """
+        errors = {}
+        try:
+            with self.session.begin_nested():
+                self._write(self._rows)
+        except Exception as e:
+            _logger.warning(f'Can not create {len(self._rows)} products at once, creating them one by one: {e}')
+            for row in self._rows:
+                try:
+                    with self.session.begin_nested():
+                        self._write([row])
+                except Exception as error:
+                    _logger.exception(error)
+                    errors[row.key] = str(error)
+
+        if commit:
+            with signals.outbox():
+                for row in self._rows:
+                    if row.key not in errors:
+                        for sellable in row.sellables:
+                            signals.stage(signals.sellable_create_signal, sellable)
+                self.session.commit()
+
+        results = [BulkRowResult(row.key, row.product if row.key not in errors else None,
+                                 row.sellables if row.key not in errors else [], errors.get(row.key))
+                   for row in self._rows]
+        self._rows = []
+        return results
+
+    def _load_references(self, rows):
+        attribute_ids = {a['id'] for row in rows for v in row.variants_data for a in v.get('attributes') or []}
+        self.attributes = {a.id: a for a in self.session.query(m.Attribute).filter(
+            m.Attribute.id.in_(attribute_ids))} if attribute_ids else {}
+        option_ids = set()
+        for row in rows:
+            for variant_data in row.variants_data:
+                for attr in variant_data.get('attributes') or []:
+                    attribute = self.attributes.get(attr['id'])
+                    if attribute and attribute.value_type in _OPTION_VALUE_TYPES:
+                        option_ids.update(safe_cast(x, int) for x in str(attr['value']).split(','))
+        option_ids.discard(None)
+        self.options = {o.id: o for o in self.session.query(m.AttributeOption).filter(
+            m.AttributeOption.id.in_(option_ids))} if option_ids else {}
+        category_ids = {(row.product_data.get('category_ids') or [row.product_data.get('category_id')])[0]
+                        for row in rows if not row.product_data.get('attribute_set_id')}
+        category_ids.discard(None)
+        self.categories = {c.id: c for c in self.session.query(m.Category).filter(
+            m.Category.id.in_(category_ids))} if category_ids else {}
+        if self._default_shipping_type is None:
+            self._default_shipping_type = get_default_shipping_type() or False
+
+    def _option_value(self, attribute, value):
+        if attribute.value_type not in _OPTION_VALUE_TYPES:
+            return str(value)
+        options = [self.options.get(safe_cast(x, int)) for x in str(value).split(',')]
+        return ','.join(o.value for o in options if o)
+
+    def _write(self, rows):
+        for row in rows:
+            row.product = None
+            row.sellables = []
+        self._load_references(rows)
+
+        # ================= products ==================
+        for row in rows:
+            data = row.product_data
+            if data.get('is_bundle'):
+                raise ValueError('Không hỗ trợ tạo sản phẩm bundle theo lô')
+            product_data = {k: v for k, v in data.items() if k != 'category_ids'}
+            category_ids = data.get('category_ids')
+            if category_ids:
+                product_data['category_id'] = category_ids[0]
+            product_data['unit_po_id'] = product_data.get('unit_id')
+            product_data['spu'] = 'SPU{}'.format(utils.random_string(10))
+            if product_data.get('category_id') and not product_data.get('attribute_set_id'):
+                category = self.categories.get(product_data['category_id'])
+                default_attribute_set = category.default_attribute_set if category else None
+                product_data['attribute_set_id'] = default_attribute_set.id if default_attribute_set else None
+            product = m.Product(**product_data)
+            product.url_key = utils.convert(utils.slugify(product_data['name']))
+            product.created_by = self.created_by
+            product.editing_status_code = 'processing'
+            row.product = product
+        self.session.add_all([row.product for row in rows])
+        self.session.flush()
+
+        self.session.bulk_insert_mappings(m.ProductCategory, [{
+            'product_id': row.product.id,
+            'category_id': category_id,
+            'created_by': self.created_by,
+        } for row in rows for category_id in (
+            row.product_data.get('category_ids') or ([row.product.category_id] if row.product.category_id else [])
+        )])
+
+        # ================= variants ==================
+        variants = []
+        for row in rows:
+            row.variants = []
+            for variant_data in row.variants_data:
+                variant = m.ProductVariant(product_id=row.product.id)
+                variant.code = utils.random_string(9)
+                variant.created_by = self.created_by
+                variant.name = variant_data.get('name') or self._variant_name(row.product, variant_data)
+                variant.url_key = utils.generate_url_key(variant.name)
+                row.variants.append(variant)
+                variants.append(variant)
+        self.session.add_all(variants)
+        self.session.flush()
+
+        self.session.bulk_insert_mappings(m.VariantAttribute, [{
+            'variant_id': variant.id,
+            'attribute_id': attr['id'],
+            'value': str(attr['value']),
+        } for row in rows for variant, variant_data in zip(row.variants, row.variants_data)
+            for attr in variant_data.get('attributes') or []])
+
+        self.session.bulk_insert_mappings(m.VariantImage, [{
+            'product_variant_id': variant.id,
+            'url': image.get('url'),
+            'label': image.get('alt_text'),
+            'is_displayed': image.get('allow_display', True),
+            'priority': priority,
+            'created_by': self.created_by,
+            'updated_by': self.created_by,
+        } for row in rows for variant, variant_data in zip(row.variants, row.variants_data)
+            for priority, image in enumerate(variant_data.get('images') or [], 1)])
+
+        for row in rows:
+            self._update_uoms(row)
+            row.product.default_variant_id = row.variants[0].id
+
+        # ================= sellables ==================
+        skus = iter(allocate_skus(sum(len(row.variants) for row in rows)))
+        for row in rows:
+            self._build_sellables(row, skus)
+        self.session.add_all([s for row in rows for s in row.sellables])
+        self.session.flush()
+
+        self._insert_sellable_dependents(rows)
+        self.session.flush()
+
+    def _uom(self, variant_data):
+        uom = ratio = None
+        for attr in variant_data.get('attributes') or []:
+            attribute = self.attributes.get(attr['id'])
+            if attribute and attribute.code == constants.UOM_CODE_ATTRIBUTE:
+                uom = self.options.get(safe_cast(attr['value'], int))
+            elif attribute and attribute.code == constants.UOM_RATIO_CODE_ATTRIBUTE:
+                ratio = attr['value']
+        return uom, ratio
+
+    def _variant_name(self, product, variant_data):
+        suffix = ', '.join(
+            self._option_value(self.attributes[attr['id']], attr['value'])
+            for attr in variant_data.get('attributes') or []
+            if attr['id'] in self.attributes and attr.get('is_variation', True) and self.attributes[attr['id']].code
+            not in (constants.UOM_CODE_ATTRIBUTE, constants.UOM_RATIO_CODE_ATTRIBUTE)
+        )
+        return f'{product.name} ({suffix})' if suffix else product.name
+
+    def _update_uoms(self, row):
+        """
+        Same as ProductVariantService.__update_uoms for variants all created
+        in this batch: variants differing only by uom are grouped under the
+        one of ratio 1
+        """
+        groups = {}
+        row.uoms = []
+        for variant, variant_data in zip(row.variants, row.variants_data):
+            uom, ratio = self._uom(variant_data)
+            if not uom:
+                raise ValueError('Sản phẩm thiếu đơn vị tính')
+            row.uoms.append((uom, ratio))
+            key = str(sorted(
+                ({'id': a['id'], 'value': str(a['value'])} for a in variant_data.get('attributes') or []
+                 if self.attributes.get(a['id']) and a.get('is_variation', True) and self.attributes[a['id']].code
+                 not in (constants.UOM_CODE_ATTRIBUTE, constants.UOM_RATIO_CODE_ATTRIBUTE)),
+                key=lambda x: x['id']))
+            groups.setdefault(key, []).append((variant, variant_data, uom, ratio))
+
+        row.base_variants = {}
+        for group in groups.values():
+            base = next((g for g in group if safe_cast(g[3], float) == 1.0), None)
+            if not base:
+                continue
+            base_variant, _, base_uom, _ = base
+            all_uom_ratios = ''.join(f'{v.id}:{safe_cast(r, float)},' for v, _, _, r in group)
+            for variant, variant_data, uom, ratio in group:
+                variant.all_uom_ratios = all_uom_ratios
+                row.base_variants[variant.id] = base_variant
+                if variant is base_variant or variant_data.get('name'):
+                    continue
+                name = '{} {} {}'.format(ratio, base_uom.value, decapitalize(variant.name))
+                if uom.id != base_uom.id:
+                    name = f'{uom.value.capitalize()} {name}'
+                variant.name = name
+                variant.url_key = utils.generate_url_key(variant.name)
+
+    def _build_sellables(self, row, skus):
+        product = row.product
+        sellable_by_variant = {}
+        for variant, variant_data, (uom, ratio) in zip(row.variants, row.variants_data, row.uoms):
+            data = variant_data.get('sellable') or {}
+            created_by = data.get('created_by') or self.created_by
+            sellable = m.SellableProduct()
+            sellable.variant_id = variant.id
+            sellable.name = data.get('name') or variant.name
+            sellable.supplier_sale_price = data.get('supplier_sale_price')
+            sellable.allow_selling_without_stock = data.get('allow_selling_without_stock', False)
+            sellable.expiry_tracking = data.get('expiry_tracking')
+            sellable.expiration_type = data.get('expiration_type')
+            sellable.tracking_type = data.get('tracking_type', False) or data.get('manage_serial', False)
+            sellable.days_before_exp_lock = data.get('days_before_exp_lock')
+            sellable.provider_id = data.get('provider_id', self.seller.get('id'))
+            sellable.product_id = product.id
+            sellable.seller_id = self.seller.get('id')
+            sellable.brand_id = product.brand_id
+            sellable.category_id = product.category_id
+            sellable.master_category_id = product.master_category_id
+            sellable.attribute_set_id = product.attribute_set_id
+            sellable.model = product.model
+            sellable.warranty_months = product.warranty_months
+            sellable.warranty_note = product.warranty_note
+            sellable.tax_in_code = product.tax_in_code
+            sellable.tax_out_code = product.tax_out_code
+            sellable.product_type = data.get('product_type') or product.type
+            sellable.unit_id = uom.id
+            sellable.unit_po_id = uom.id
+            sellable.uom_code = uom.code
+            sellable.uom_ratio = safe_cast(ratio, float)
+            sellable.uom_name = uom.value
+            sellable.updated_by = created_by
+            barcodes = data.get('barcodes')
+            sellable.barcode = barcodes[-1].get('barcode') if barcodes else data.get('barcode')
+            sellable.part_number = data.get('part_number')
+            sellable.manage_serial = data.get('manage_serial')
+            sellable.auto_generate_serial = data.get('auto_generate_serial')
+            sellable.sku = next(skus)
+            if not self.seller.get('isAutoGeneratedSKU'):
+                sellable.seller_sku = data.get('seller_sku', data.get('sku', sellable.sku))
+            elif safe_cast(ratio, float) == 1:
+                sellable.seller_sku = sellable.sku
+            else:
+                base_sellable = sellable_by_variant.get(getattr(row.base_variants.get(variant.id), 'id', None))
+                if base_sellable:
+                    sellable.seller_sku = base_sellable.seller_sku
+            if self.seller.get('servicePackage') == 'FBS':
+                sellable.selling_status_code = 'hang_ban'
+            sellable.editing_status_code = 'processing'
+            sellable_by_variant[variant.id] = sellable
+            row.sellables.append(sellable)
+
+        # same uom with another ratio in the product needs quantity conversion
+        for sellable in row.sellables:
+            if any(s.uom_code == sellable.uom_code and s.uom_ratio != sellable.uom_ratio for s in row.sellables):
+                sellable.need_convert_qty = 1
+
+    def _insert_sellable_dependents(self, rows):
+        seo_terminals = []
+        shipping_types = []
+        barcodes = []
+        terminal_groups = []
+        for row in rows:
+            for sellable, variant_data in zip(row.sellables, row.variants_data):
+                data = variant_data.get('sellable') or {}
+                created_by = data.get('created_by') or self.created_by
+                seo_terminals.append({
+                    'terminal_id': 0,
+                    'sellable_product_id': sellable.id,
+                    'short_description': data.get('short_description') or row.product.description,
+                    'description': data.get('description') or row.product.detailed_description,
+                    'created_by': created_by,
+                    'updated_by': created_by,
+                })
+                shipping_type_ids = data.get('shipping_types') or (
+                    [self._default_shipping_type.id] if self._default_shipping_type else [])
+                shipping_types += [{
+                    'sellable_product_id': sellable.id,
+                    'shipping_type_id': shipping_type_id,
+                    'created_by': self.created_by,
+                } for shipping_type_id in shipping_type_ids]
+                items = data.get('barcodes') or []
+                barcodes += [{
+                    'sellable_product_id': sellable.id,
+                    'barcode': item.get('barcode'),
+                    'source': item.get('source'),
+                    'created_by': created_by,
+                    'is_default': item.get('barcode') == items[-1].get('barcode'),
+                } for item in items]
+                terminal_groups += [{
+                    'sellable_product_id': sellable.id,
+                    'terminal_group_code': code,
+                    'created_by': created_by,
+                    'updated_by': created_by,
+                } for code in data.get('terminal_groups') or []]
+        self.session.bulk_insert_mappings(m.SellableProductSeoInfoTerminal, seo_terminals)
+        self.session.bulk_insert_mappings(m.SellableProductShippingType, shipping_types)
+        self.session.bulk_insert_mappings(m.SellableProductBarcode, barcodes)
+        self.session.bulk_insert_mappings(m.SellableProductTerminalGroup, terminal_groups)
@@ -0,0 +1,228 @@
+# coding=utf-8
+import logging
+
+from sqlalchemy import event, func, union
+from sqlalchemy.orm import sessionmaker
+
+from catalog import models as m
+from catalog.extensions import signals
+from catalog.extensions.flask_cache import cache
+from catalog.utils import remove_accents
+
+_logger = logging.getLogger(__name__)
+
+NGRAM_SIZE = 3
+NAME_PREFIX = 'n:'
+BARCODE_PREFIX = 'b:'
+
+# the index is used by searches once a full rebuild has finished
+REBUILD_JOB_NAME = 'sellable_search_index'
+
+# changed in a transaction or savepoint, dropped if it is rolled back
+_PENDING_KEY = 'sellable_search_index_pending'
+# committed, indexed when the outermost transaction ends
+_COMMITTED_KEY = 'sellable_search_index_committed'
+# set when the running transaction of the session has written something
+_WRITES_KEY = 'sellable_search_index_writes'
+
+Session = sessionmaker()
+
+
+def normalize(text):
+    """
+    Strip accents, lowercase and collapse spaces, so that "Bàn  Phím" and
+    "ban phim" give the same n-grams
+    """
+    if not text:
+        return ''
+    return ' '.join(remove_accents(str(text)).lower().split())
+
+
+def ngrams(text, size=NGRAM_SIZE):
+    text = normalize(text)
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _tokens_of(name, barcodes):
+    tokens = {f'{NAME_PREFIX}{gram}' for gram in ngrams(name)}
+    for barcode in barcodes:
+        tokens.update(f'{BARCODE_PREFIX}{gram}' for gram in ngrams(barcode))
+    return tokens
+
+
+def index_sellables(session, sellable_ids):
+    """
+    Recompute the tokens of the given sellable products from their current
+    name and barcodes
+
+    :param session:
+    :param list[int] sellable_ids:
+    """
+    if not sellable_ids:
+        return
+
+    names = dict(session.query(m.SellableProduct.id, m.SellableProduct.name).filter(
+        m.SellableProduct.id.in_(sellable_ids)
+    ).all())
+    barcodes = {}
+    for sellable_id, barcode in session.query(
+            m.SellableProductBarcode.sellable_product_id,
+            m.SellableProductBarcode.barcode
+    ).filter(m.SellableProductBarcode.sellable_product_id.in_(sellable_ids)):
+        barcodes.setdefault(sellable_id, []).append(barcode)
+
+    session.query(m.SellableProductSearchToken).filter(
+        m.SellableProductSearchToken.sellable_product_id.in_(sellable_ids)
+    ).delete(synchronize_session=False)
+    session.bulk_insert_mappings(m.SellableProductSearchToken, [
+        {'token': token, 'sellable_product_id': sellable_id}
+        for sellable_id, name in names.items()
+        for token in _tokens_of(name, barcodes.get(sellable_id, []))
+    ])
+
+
+def rebuild_search_index(batch_size=1000):
+    """
+    Re-index every sellable product, one transaction per batch of ids. The
+    index is marked built once every product is indexed.
+
+    :return: number of indexed sellable products
+    """
+    total = 0
+    last_id = 0
+    session = Session(bind=m.db.engine)
+    job = m.FanOutJob(name=REBUILD_JOB_NAME, last_id=last_id)
+    session.add(job)
+    session.commit()
+    try:
+        while True:
+            ids = [row.id for row in session.query(m.SellableProduct.id).filter(
+                m.SellableProduct.id > last_id
+            ).order_by(m.SellableProduct.id).limit(batch_size)]
+            if not ids:
+                break
+            index_sellables(session, ids)
+            total += len(ids)
+            last_id = ids[-1]
+            job.last_id = last_id
+            job.chunk_count += 1
+            session.commit()
+            _logger.info(f'Indexed {total} sellable products, last id {last_id}')
+        job.status = m.FanOutJob.STATUS_DONE
+        session.commit()
+    except Exception:
+        session.rollback()
+        job.status = m.FanOutJob.STATUS_FAILED
+        session.commit()
+        raise
+    finally:
+        session.close()
+    cache.delete_memoized(is_index_built)
+    return total
+
+
+@cache.memoize(timeout=300)
+def is_index_built():
+    return m.db.session.query(m.FanOutJob.query.filter(
+        m.FanOutJob.name == REBUILD_JOB_NAME,
+        m.FanOutJob.status == m.FanOutJob.STATUS_DONE
+    ).exists()).scalar()
+
+
+def candidate_ids_query(keywords):
+    """
+    Ids of the sellable products that may match the keyword search: those
+    containing every n-gram of the keyword in their name or in one barcode,
+    plus exact sku/seller_sku matches. None if the keyword is too short to
+    be looked up in the index or the index is not built yet.
+
+    :param list[str] keywords:
+    """
+    grams = ngrams(''.join(keywords))
+    if not grams or not is_index_built():
+        return None
+
+    def _match_all(prefix):
+        tokens = [f'{prefix}{gram}' for gram in grams]
+        return m.db.session.query(m.SellableProductSearchToken.sellable_product_id).filter(
+            m.SellableProductSearchToken.token.in_(tokens)
+        ).group_by(
+            m.SellableProductSearchToken.sellable_product_id
+        ).having(func.count() == len(tokens))
+
+    codes = m.db.session.query(m.SellableProduct.id).filter(
+        m.SellableProduct.sku.in_(keywords) | m.SellableProduct.seller_sku.in_(keywords)
+    )
+    return union(
+        _match_all(NAME_PREFIX).statement,
+        _match_all(BARCODE_PREFIX).statement,
+        codes.statement,
+    )
+
+
+def _index_committed(sellable_ids):
+    index_session = Session(bind=m.db.engine)
+    try:
+        index_sellables(index_session, sellable_ids)
+        index_session.commit()
+    except Exception as e:
+        index_session.rollback()
+        _logger.exception(f'Can not index sellable products {sellable_ids}: {e}')
+    finally:
+        index_session.close()
+
+
+def _boundary(transaction):
+    # subtransactions share the database transaction of their parent
+    while transaction.parent is not None and not transaction.nested:
+        transaction = transaction.parent
+    return transaction
+
+
+@signals.on_sellable_create
+@signals.on_sellable_update
+def on_sellable_changed(sellable, **kwargs):
+    """
+    Senders emit these signals either before or after committing. A
+    sellable changed in the running transaction or savepoint waits for it
+    to be committed and is forgotten if it is rolled back, one already
+    committed waits for the running transaction to end. The sellables are
+    indexed together once the outermost transaction ends.
+    """
+    session = m.db.session()
+    if session.info.get(_WRITES_KEY) or session.new or session.dirty or session.deleted:
+        pending = session.info.setdefault(_PENDING_KEY, {})
+        pending.setdefault(_boundary(session.transaction), set()).add(sellable.id)
+    else:
+        session.info.setdefault(_COMMITTED_KEY, set()).add(sellable.id)
+
+
+@event.listens_for(m.db.session, 'after_flush')
+def _on_flush(session, flush_context):
+    session.info[_WRITES_KEY] = True
+
+
+@event.listens_for(m.db.session, 'after_commit')
+def _on_commit(session):
+    # also fired when a savepoint is released: its sellables then wait for
+    # the enclosing transaction
+    transaction = session.transaction
+    sellable_ids = session.info.get(_PENDING_KEY, {}).pop(transaction, None)
+    if not sellable_ids:
+        return
+    if transaction.parent is not None:
+        session.info[_PENDING_KEY].setdefault(_boundary(transaction.parent), set()).update(sellable_ids)
+    else:
+        session.info.setdefault(_COMMITTED_KEY, set()).update(sellable_ids)
+
+
+@event.listens_for(m.db.session, 'after_transaction_end')
+def _on_transaction_end(session, transaction):
+    # what is left for a transaction or savepoint here was rolled back
+    session.info.get(_PENDING_KEY, {}).pop(transaction, None)
+    if transaction.parent is not None:
+        return
+    session.info.pop(_WRITES_KEY, None)
+    sellable_ids = session.info.pop(_COMMITTED_KEY, None)
+    if sellable_ids:
+        _index_committed(sorted(sellable_ids))
@@ -15,10 +15,10 @@ from sqlalchemy.orm import (
     load_only,
     noload,
 )
-from sqlalchemy.sql.expression import cast, text, exists
+from sqlalchemy.sql.expression import cast, exists
 from flask_login import current_user
 from funcy import lpluck_attr
-from sqlalchemy import or_, and_, case, func
+from sqlalchemy import or_, and_, case, func, text
 
 from catalog import models as m, utils
 from catalog.constants import UOM_CODE_ATTRIBUTE, ExportSellable, MAX_RECORD
@@ -31,8 +31,10 @@ from catalog.extensions import (
 from catalog.models.sellable_product import SellableProduct
 from catalog.services import QueryBase
 from catalog.services import shipping_policy as svr
+from catalog.services.products import search_index
 from catalog.services import seller as seller_services
 from catalog.services.attribute_sets.attribute_set import get_variant_attribute_by_attribute_set_id
+from catalog.services.attribute_sets.metadata import get_attribute_set_metadata
 from catalog.services.attributes import AttributeService
 from catalog.services.shipping_types.sellable_product_shipping_type import SellableProductShippingTypeService
 from catalog.services.shipping_types.shipping_type import get_default_shipping_type
@@ -40,6 +42,7 @@ from catalog.utils import (
     cast_separated_string_to_ints,
     safe_cast,
 )
+from catalog.utils.category import descendant_query
 from catalog.utils.lambda_list import LambdaList
 from catalog.validators import sellable as sellable_validator
 from config import ROOT_DIR
@@ -64,10 +67,11 @@ def _get_same_uom(sellable):
     ).first()
 
 
-def gen_new_sku():
+def _max_sku():
     """
+    Greatest numeric SKU of the month in sellable_products
 
-    :return:
+    :return: int
     """
     now = strftime('%y%m')
 
@@ -89,11 +93,42 @@ def gen_new_sku():
 
     if max_sku:
         try:
-            return str(int(max_sku) + 1)
+            return int(max_sku)
         except ValueError as ex:
             raise ex
 
-    return str(int(now) * 100000)
+    return int(now) * 100000 - 1
+
+
+def gen_new_sku():
+    """
+    Reserve the next SKU from the same sequence as `allocate_skus`, so a
+    block held by an uncommitted import is never handed out again
+
+    :return:
+    """
+    return allocate_skus(1)[0]
+
+
+def allocate_skus(count):
+    """
+    Reserve a block of `count` consecutive SKUs. The block is taken from
+    the month sequence in its own transaction, so concurrent callers get
+    disjoint blocks; the sequence never goes below the current max SKU.
+    SKUs of a block that is not used are skipped.
+
+    :return: list of SKUs
+    """
+    prefix = strftime('%y%m')
+    current_max = _max_sku()
+    with db.engine.begin() as conn:
+        conn.execute(text("""
+INSERT INTO sku_sequences (prefix, last_sku) VALUES (:prefix, :current_max + :count)
+ON DUPLICATE KEY UPDATE last_sku = GREATEST(last_sku, :current_max) + :count
+"""), prefix=prefix, current_max=current_max, count=count)
+        last_sku = conn.execute(text('SELECT last_sku FROM sku_sequences WHERE prefix = :prefix'),
+                                prefix=prefix).scalar()
+    return [str(last_sku - count + 1 + i) for i in range(count)]
 
 
 def gen_new_bundle_sku():
@@ -509,25 +544,25 @@ def set_sellable_terminal(skus, seller_terminals):
             'seller_terminals': seller_terminals
         }
 
-    # delete old records
-    m.SellableProductTerminal.query.filter(
-        m.SellableProductTerminal.sellable_product_id.in_(
-            lpluck_attr('id', sellable_products)
-        )
-    ).delete(False)
-
-    for terminal_data in seller_terminals:
-        apply_seller_id = terminal_data.get('apply_seller_id')
-        set_seller_terminals(
-            seller_id=apply_seller_id,
-            terminal_list=terminal_data.get('terminals'),
-            sellable_products=sellable_products
-        )
-
-    m.db.session.commit()
+    with signals.outbox():
+        # delete old records
+        m.SellableProductTerminal.query.filter(
+            m.SellableProductTerminal.sellable_product_id.in_(
+                lpluck_attr('id', sellable_products)
+            )
+        ).delete(False)
+
+        for terminal_data in seller_terminals:
+            apply_seller_id = terminal_data.get('apply_seller_id')
+            set_seller_terminals(
+                seller_id=apply_seller_id,
+                terminal_list=terminal_data.get('terminals'),
+                sellable_products=sellable_products
+            )
 
-    for sellable in sellable_products:
-        signals.sellable_update_signal.send(sellable)
+        for sellable in sellable_products:
+            signals.stage(signals.sellable_update_signal, sellable)
+        m.db.session.commit()
 
     return {
         'skus': skus,
@@ -565,12 +600,14 @@ def set_seller_terminals(seller_id, terminal_list, sellable_products):
 
 class SellableProductListQuery(QueryBase):
     model = m.SellableProduct
+    cursor_columns = (m.SellableProduct.product_id, m.SellableProduct.id)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.not_found = None
         self.query = self.query.order_by(
-            m.SellableProduct.product_id.desc()
+            m.SellableProduct.product_id.desc(),
+            m.SellableProduct.id.desc()
         )
 
     def apply_filters(self, restrict_seller=True, **kwargs):
@@ -771,6 +808,11 @@ class SellableProductListQuery(QueryBase):
 
     def _apply_keyword_filter(self, kw):
         name = ''.join(kw)
+        candidate_ids = search_index.candidate_ids_query(kw)
+        if candidate_ids is not None:
+            self.query = self.query.filter(
+                m.SellableProduct.id.in_(candidate_ids)
+            )
         alias_barcodes = m.db.aliased(m.SellableProductBarcode)
         self.query = self.query.filter(
             or_(
@@ -793,29 +835,16 @@ class SellableProductListQuery(QueryBase):
                         m.ProductCategory.category_id.in_(list_category_ids)
                     ).exists())
 
-        query = m.Category.query.filter(
-            m.Category.id.in_(category_ids),
-            m.Category.is_active.is_(True)
-        )
-        if restrict_seller:
-            query = query.filter(
-                m.Category.seller_id == current_user.seller_id
-            )
-        categories = query.all()
+        # select all categories, include children
+        full_categories = descendant_query(
+            m.Category, category_ids, m.Category.id, m.Category.seller_id,
+            seller_id=current_user.seller_id if restrict_seller else None
+        ).all()
 
-        if not categories:
+        if not full_categories:
             self.query = self.query.filter(False)
             return
 
-        paths = [category.path for category in categories]
-        # select all categories, include children
-        full_categories = m.Category.query.filter(
-            or_(
-                *[m.Category.path.like('{}'.format(path)) for path in paths],
-                *[m.Category.path.like('{}/%'.format(path)) for path in paths]
-            ),
-            m.Category.is_active.is_(True)
-        ).all() if paths else []
         cat_ids = []
         platform_cat_ids = []
         seller_id = safe_cast(seller_id, int)
@@ -832,22 +861,8 @@ class SellableProductListQuery(QueryBase):
         _filter_by_category_ids(platform_cat_ids)
 
     def _apply_master_category_filter(self, category_ids: List[int]):
-        query = m.MasterCategory.query.filter(
-            m.MasterCategory.id.in_(category_ids),
-            m.MasterCategory.is_active.is_(True)
-        )
-        categories = query.all()
-
-        paths = [category.path for category in categories]
         # select all categories, include children
-        full_categories = m.MasterCategory.query.filter(
-            or_(
-                *[m.MasterCategory.path.like('{}'.format(path)) for path in paths],
-                *[m.MasterCategory.path.like('{}/%'.format(path)) for path in paths]
-            ),
-            m.MasterCategory.is_active.is_(True)
-        ).all() if paths else []
-        cat_ids = [category.id for category in full_categories]
+        cat_ids = descendant_query(m.MasterCategory, category_ids).subquery()
         self.query = self.query.filter(
             m.SellableProduct.master_category_id.in_(cat_ids)
         )
@@ -993,39 +1008,85 @@ def _get_variant_attribute_sets(sellables):
     return dict(q)
 
 
+def get_requested_fields(params):
+    """
+    Sparse fieldset of a list request
+
+    :param params: request params, `fields` is a list or a comma-separated string
+    :return: set of field names, None when every field is requested
+    """
+    fields = params.get('fields')
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    return {field.strip() for field in fields if field.strip()}
+
+
+def sparse_load_columns(fields, columns, base_columns=('id',)):
+    """
+    Columns of SellableProduct to load for a sparse fieldset
+
+    :param fields: requested fields, None for all
+    :param columns: columns loaded when every field is requested
+    :param base_columns: columns always loaded
+    """
+    if fields is None:
+        return list(columns)
+    return list(base_columns) + [c for c in columns if c in fields and c not in base_columns]
+
+
+_SELLABLE_LIST_COLUMNS = ('id', 'name', 'product_id', 'sku', 'variant_id', 'seller_id', 'is_bundle', 'barcode',
+                          'attribute_set_id', 'provider_id', 'seller_sku', 'uom_code', 'uom_name', 'uom_ratio')
+_SELLABLE_LIST_RELATIONS = {
+    'category': ('code', 'name'),
+    'brand': ('id', 'name'),
+    'editing_status': ('code', 'name', 'config'),
+    'selling_status': ('code', 'name', 'config'),
+    'product': ('name',),
+}
+
+
 def get_sellable_products(params, restrict_seller=True):
     """
 
     :param restrict_seller:
-    :param params:
+    :param params: `fields` restricts the loaded columns and relations
     :return:
     """
     query = SellableProductListQuery()
     query.apply_filters(restrict_seller, **params)
-    total = len(query)
+    total = query.count(params.get('include_total', True), params.get('count_mode'))
     page = params.get('page')
     page_size = params.get('page_size')
+    fields = get_requested_fields(params)
     query.query = query.query.options(
-        load_only('id', 'name', 'product_id', 'sku', 'variant_id', 'seller_id', 'is_bundle', 'barcode',
-                  'attribute_set_id', 'provider_id', 'seller_sku', 'uom_code', 'uom_name', 'uom_ratio'),
-        joinedload('category').load_only('code', 'name'),
-        joinedload('brand').load_only('id', 'name'),
-        joinedload('editing_status').load_only('code', 'name', 'config'),
-        joinedload('selling_status').load_only('code', 'name', 'config'),
-        joinedload('product').load_only('name'),
+        load_only(*sparse_load_columns(
+            fields, _SELLABLE_LIST_COLUMNS,
+            base_columns=('id', 'product_id', 'is_bundle', 'attribute_set_id')
+        )),
+        *[joinedload(relation).load_only(*columns)
+          for relation, columns in _SELLABLE_LIST_RELATIONS.items()
+          if fields is None or relation in fields]
     )
-    query.pagination(page, page_size)
+    after = params.get('after')
+    if after is not None:
+        query.seek(after, page_size)
+    else:
+        query.pagination(page, page_size)
     items = query.all()
-    variant_attribute_sets = _get_variant_attribute_sets(items)
+    if fields is None or 'is_allow_create_variant' in fields:
+        variant_attribute_sets = _get_variant_attribute_sets(items)
 
-    for item in items:
-        flag = item.is_bundle or not item.attribute_set_id in variant_attribute_sets
-        setattr(item, 'is_allow_create_variant', flag)
+        for item in items:
+            flag = item.is_bundle or not item.attribute_set_id in variant_attribute_sets
+            setattr(item, 'is_allow_create_variant', flag)
 
     return {
         'current_page': page,
         'page_size': page_size,
         'totalRecords': total,
+        'next_cursor': query.next_cursor(items, page_size),
         'skus': items
     }
 
@@ -1039,7 +1100,7 @@ def get_skus_uom_info(params, restrict_seller=False):
     """
     query = SellableProductListQuery()
     query.apply_filters(**params)
-    total = len(query)
+    total = query.count(params.get('include_total', True), params.get('count_mode'))
     page = params.get('page', 1)
     page_size = params.get('page_size', 10)
     query.query = query.query.options(
@@ -1104,10 +1165,11 @@ def update_sellable_editing_status(
         sellable.updated_by = updated_by or current_user.email
 
     if auto_commit:
-        m.db.session.commit()
-        for item in sellables:
-            signals.sellable_common_update_signal.send(item)
-            signals.sellable_update_signal.send(item)
+        with signals.outbox():
+            for item in sellables:
+                signals.stage(signals.sellable_common_update_signal, item)
+                signals.stage(signals.sellable_update_signal, item)
+            m.db.session.commit()
     return sellables
 
 
@@ -1601,19 +1663,12 @@ def detail_sellables_exporter(items, attribute_set_id):
         column_map[col.value] = index + 1
 
     # attribute header
-    attribute_query = text("select a.id, a.code, a.name from attributes a "
-                           "join attribute_group_attribute aga on a.id = aga.attribute_id "
-                           "join attribute_groups ag on aga.attribute_group_id = ag.id "
-                           "where ag.attribute_set_id = :attribute_set_id and ag.system_group != 1 "
-                           "order by ag.priority asc, aga.priority asc")
-    rs = db.engine.execute(attribute_query, {
-        'attribute_set_id': attribute_set_id
-    })
     attribute_headers = [{
-        "id": row[0],
-        "code": row[1],
-        "name": row[2]
-    } for row in rs]
+        "id": attribute['id'],
+        "code": attribute['code'],
+        "name": attribute['name']
+    } for attribute in get_attribute_set_metadata(attribute_set_id)['attributes']
+        if attribute['system_group'] is not None and attribute['system_group'] != 1]
 
     name_header_row_idx = 0
     code_header_row_idx = 1
@@ -1884,32 +1939,32 @@ def upsert_sellable_product_terminal_group(sellable_products, terminal_groups):
     :param terminal_groups list<string>
     """
 
-    m.SellableProductTerminalGroup.query.filter(
-        m.SellableProductTerminalGroup.sellable_product_id.in_(sellable_products)
-    ).delete(False)
-    m.db.session.commit()
+    with signals.outbox():
+        m.SellableProductTerminalGroup.query.filter(
+            m.SellableProductTerminalGroup.sellable_product_id.in_(sellable_products)
+        ).delete(False)
+
+        data = []
+        for sellable_id in sellable_products:
+            for terminal_group_code in terminal_groups:
+                data.append(
+                    {"sellable_product_id": sellable_id,
+                     "terminal_group_code": terminal_group_code,
+                     "created_by": current_user.email,
+                     "updated_by": current_user.email})
+
+        if data:
+            insert_query = m.db.insert(m.SellableProductTerminalGroup).values(data)
+            m.db.session.execute(insert_query)
+
+        active_sellable_products = m.SellableProduct.query.filter(
+            m.SellableProduct.id.in_(sellable_products)
+        ).all()
 
-    data = []
-    for sellable_id in sellable_products:
-        for terminal_group_code in terminal_groups:
-            data.append(
-                {"sellable_product_id": sellable_id,
-                 "terminal_group_code": terminal_group_code,
-                 "created_by": current_user.email,
-                 "updated_by": current_user.email})
-
-    if data:
-        insert_query = m.db.insert(m.SellableProductTerminalGroup).values(data)
-        m.db.session.execute(insert_query)
+        for sellable in active_sellable_products:
+            signals.stage(signals.sellable_update_signal, sellable)
         m.db.session.commit()
 
-    active_sellable_products = m.SellableProduct.query.filter(
-        m.SellableProduct.id.in_(sellable_products)
-    ).all()
-
-    for sellable in active_sellable_products:
-        signals.sellable_update_signal.send(sellable)
-
 
 def get_sellable_product(sp_id):
     return m.SellableProduct.query.filter(m.SellableProduct.id == sp_id).first()
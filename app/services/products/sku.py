@@ -5,11 +5,20 @@ from catalog.constants import SUB_SKU_POSTFIX
 from catalog.services.categories.category import ProductCategoryService
 from sqlalchemy.orm import load_only
 from catalog.services.products import ProductService
-from catalog.services.products.sellable import SellableProductListQuery, SubSkuListQuery
-from catalog.services.seller import get_default_platform_owner_of_seller, get_platform_owner
+from catalog.services.products.sellable import (
+    SellableProductListQuery,
+    SubSkuListQuery,
+    get_requested_fields,
+    sparse_load_columns,
+)
+from catalog.services.seller import get_default_platform_owners_of_sellers, get_platform_owner
 
 product_service = ProductService.get_instance()
 
+# columns read while attaching the related data, loaded whatever fields are requested
+_SKU_BASE_COLUMNS = ('id', 'product_id', 'variant_id', 'seller_id', 'brand_id', 'attribute_set_id',
+                     'editing_status_code', 'master_category_id')
+
 
 class SkuService:
     @staticmethod
@@ -54,39 +63,27 @@ class SkuService:
             seller_ids = new_seller_ids
         seller_ids = list(set(seller_ids))
 
-        platform_owner_seller_ids = []
-        default_platform_owner_seller_ids = [get_default_platform_owner_of_seller(seller_id)
-                                             for seller_id in seller_ids]
+        default_platform_owners = get_default_platform_owners_of_sellers(seller_ids)
         if platform_id:
             platform_owner = get_platform_owner(platform_id)
-            platform_owner_seller_ids = [platform_owner for _ in seller_ids]
+            platform_owners = {seller_id: platform_owner for seller_id in seller_ids}
         else:
-            platform_owner_seller_ids.extend(default_platform_owner_seller_ids)
-
-        product_ids = [item.product_id for item in items]
+            platform_owners = default_platform_owners
 
-        items_platform_categories = ProductCategoryService.get_product_category(product_ids, platform_owner_seller_ids)
-        items_default_platform_categories = ProductCategoryService.get_product_category(product_ids,
-                                                                                        default_platform_owner_seller_ids)
+        product_ids = list({item.product_id for item in items})
+        owner_seller_ids = set(platform_owners.values()) | set(default_platform_owners.values())
+        owner_seller_ids.discard(None)
+        product_categories = ProductCategoryService.get_product_category_map(product_ids, list(owner_seller_ids))
 
         for item in items:
-            item.platform_category = None
-            seller_id_index = seller_ids.index(item.seller_id)
-
-            platform_owner_seller_id = platform_owner_seller_ids[seller_id_index]
-
-            for ipc in items_platform_categories:
-                if ipc.category.seller_id == platform_owner_seller_id and ipc.product_id == item.product_id:
-                    item.platform_category = ipc.category
-                    break
-
-            default_platform_owner_seller_id = default_platform_owner_seller_ids[seller_id_index]
-
-            for default_category in items_default_platform_categories:
-                if default_category.category.seller_id == default_platform_owner_seller_id and \
-                        default_category.product_id == item.product_id:
-                    item.default_category = default_category.category
-                    break
+            item.platform_category = product_categories.get(
+                (item.product_id, platform_owners.get(item.seller_id))
+            )
+            default_category = product_categories.get(
+                (item.product_id, default_platform_owners.get(item.seller_id))
+            )
+            if default_category:
+                item.default_category = default_category
 
     @staticmethod
     def _get_category_path(categories, model: models.db.Model):
@@ -110,14 +107,24 @@ class SkuService:
         return {i.id: i for i in categories}
 
     @staticmethod
-    def _set_sku_extension_data(items):
+    def _set_sku_extension_data(items, fields=None):
+        """
+        Bulk load the related data of the SKUs
+
+        :param items:
+        :param fields: requested SKU list fields, only the related data they need is loaded.
+            None to load everything
+        """
+
+        def _wants(name):
+            return fields is None or name in fields
+
         brand_ids = set()
         attribute_set_ids = set()
         editing_status_codes = set()
         sku_ids = set()
         product_ids = set()
         variant_ids = set()
-        category_ids = set()
         master_category_ids = set()
         for item in items:
             brand_ids.add(item.brand_id)
@@ -126,64 +133,71 @@ class SkuService:
             sku_ids.add(item.id)
             product_ids.add(item.product_id)
             variant_ids.add(item.variant_id)
-            category_ids.add(item.category_id)
             if item.master_category_id:
                 master_category_ids.add(item.master_category_id)
-        brands = models.Brand.query.filter(models.Brand.id.in_(brand_ids)).all()
-        brands = {i.id: i for i in brands}
-        attribute_sets = models.AttributeSet.query.filter(models.AttributeSet.id.in_(attribute_set_ids)).all()
-        attribute_sets = {i.id: i for i in attribute_sets}
-        editing_statuses = models.EditingStatus.query.filter(models.EditingStatus.code.in_(editing_status_codes)).all()
-        editing_statuses = {i.code: i for i in editing_statuses}
-        products = models.Product.query.filter(models.Product.id.in_(product_ids)).options(
-            load_only('id', 'name', 'model')).all()
-        products = {i.id: i for i in products}
-        variants = models.ProductVariant.query.filter(models.ProductVariant.id.in_(variant_ids)).options(
-            load_only('id', 'url_key')).all()
-        variants = {i.id: i for i in variants}
-        variant_images = models.VariantImage.query.filter(models.VariantImage.product_variant_id.in_(variant_ids)).all()
-        map_variant_images = {}
-        for img in variant_images:
-            values = map_variant_images.get(img.product_variant_id)
-            if values:
-                values.append(img)
-            else:
-                values = [img]
-            map_variant_images[img.product_variant_id] = values
-        master_categories = models.MasterCategory.query.filter(models.MasterCategory.id.in_(master_category_ids)).all()
-        master_categories = SkuService._get_category_path(master_categories, models.MasterCategory)
-        source_barcodes = models.SellableProductBarcode.query.filter(
-            models.SellableProductBarcode.sellable_product_id.in_(sku_ids)).all()
-        barcodes = {}
-        for sb in source_barcodes:
-            values = barcodes.get(sb.sellable_product_id)
-            if values:
-                values.append(sb)
-            else:
-                values = [sb]
-            barcodes[sb.sellable_product_id] = values
 
-        shipping_types = models.SellableProductShippingType.query.filter(
-            models.SellableProductShippingType.sellable_product_id.in_(sku_ids)).all()
-        shipping_types = {i.sellable_product_id: i for i in shipping_types}
+        extensions = {}
+        if _wants('brand'):
+            brands = models.Brand.query.filter(models.Brand.id.in_(brand_ids)).all()
+            brands = {i.id: i for i in brands}
+            extensions['ext_brand_data'] = lambda item: brands.get(item.brand_id, None)
+        if _wants('attribute_set'):
+            attribute_sets = models.AttributeSet.query.filter(models.AttributeSet.id.in_(attribute_set_ids)).all()
+            attribute_sets = {i.id: i for i in attribute_sets}
+            extensions['ext_attribute_set_data'] = lambda item: attribute_sets.get(item.attribute_set_id)
+        if _wants('editing_status'):
+            editing_statuses = models.EditingStatus.query.filter(
+                models.EditingStatus.code.in_(editing_status_codes)).all()
+            editing_statuses = {i.code: i for i in editing_statuses}
+            extensions['ext_editing_status_data'] = lambda item: editing_statuses.get(item.editing_status_code)
+        if _wants('product'):
+            products = models.Product.query.filter(models.Product.id.in_(product_ids)).options(
+                load_only('id', 'name', 'model')).all()
+            products = {i.id: i for i in products}
+            extensions['ext_product_data'] = lambda item: products.get(item.product_id, None)
+        if _wants('url_key'):
+            variants = models.ProductVariant.query.filter(models.ProductVariant.id.in_(variant_ids)).options(
+                load_only('id', 'url_key')).all()
+            variants = {i.id: i for i in variants}
+            extensions['ext_product_variant_data'] = lambda item: variants.get(item.variant_id, None)
+        if _wants('images'):
+            variant_images = models.VariantImage.query.filter(
+                models.VariantImage.product_variant_id.in_(variant_ids)).all()
+            map_variant_images = {}
+            for img in variant_images:
+                map_variant_images.setdefault(img.product_variant_id, []).append(img)
+            extensions['ext_variant_images_data'] = lambda item: map_variant_images.get(item.variant_id)
+        if _wants('master_category') and master_category_ids:
+            master_categories = models.MasterCategory.query.filter(
+                models.MasterCategory.id.in_(master_category_ids)).all()
+            master_categories = SkuService._get_category_path(master_categories, models.MasterCategory)
+            extensions['ext_master_category_data'] = lambda item: master_categories.get(item.master_category_id)
+        if _wants('barcodes'):
+            source_barcodes = models.SellableProductBarcode.query.filter(
+                models.SellableProductBarcode.sellable_product_id.in_(sku_ids)).all()
+            barcodes = {}
+            for sb in source_barcodes:
+                barcodes.setdefault(sb.sellable_product_id, []).append(sb)
+            extensions['loaded_barcodes'] = lambda item: True
+            extensions['ext_barcodes_data'] = lambda item: barcodes.get(item.id)
+        if _wants('shipping_types'):
+            shipping_types = models.SellableProductShippingType.query.filter(
+                models.SellableProductShippingType.sellable_product_id.in_(sku_ids)).all()
+            shipping_types = {i.sellable_product_id: i for i in shipping_types}
+            extensions['ext_shipping_type_data'] = lambda item: shipping_types.get(item.id)
 
         for item in items:
-            item.loaded_barcodes = True
-            item.ext_brand_data = brands.get(item.brand_id, None)
-            item.ext_attribute_set_data = attribute_sets.get(item.attribute_set_id)
-            item.ext_editing_status_data = editing_statuses.get(item.editing_status_code)
-            item.ext_product_data = products.get(item.product_id, None)
-            item.ext_product_variant_data = variants.get(item.variant_id, None)
-            item.ext_variant_images_data = map_variant_images.get(item.variant_id)
-            if item.master_category_id:
-                item.ext_master_category_data = master_categories.get(item.master_category_id)
-            item.ext_barcodes_data = barcodes.get(item.id)
-            item.ext_shipping_type_data = shipping_types.get(item.id)
+            for attr, getter in extensions.items():
+                if attr == 'ext_master_category_data' and not item.master_category_id:
+                    continue
+                setattr(item, attr, getter(item))
 
     @staticmethod
     def get_list_skus(params):
         page = params.get('page')
         page_size = params.get('page_size')
+        next_cursor = None
+        fields = get_requested_fields(params)
         if params.get('skus') and SUB_SKU_POSTFIX in ''.join(params.get('skus', [])):
             page = 1
             query = SubSkuListQuery()
@@ -205,18 +219,29 @@ class SkuService:
         else:
             query = SellableProductListQuery()
             query.apply_filters(**params, restrict_seller=False)
-            total = len(query)
-            query.pagination(page, page_size)
+            total = query.count(params.get('include_total', True), params.get('count_mode'))
+            if fields is not None:
+                query.load_fields(*sparse_load_columns(
+                    fields, models.SellableProduct.__table__.columns.keys(), _SKU_BASE_COLUMNS
+                ))
+            after = params.get('after')
+            if after is not None:
+                query.seek(after, page_size)
+            else:
+                query.pagination(page, page_size)
             items = query.all()
+            next_cursor = query.next_cursor(items, page_size)
 
         if items:
-            SkuService._set_sku_extension_data(items)
-            SkuService._set_sku_category(items, params)
+            SkuService._set_sku_extension_data(items, fields)
+            if fields is None or {'platform_category', 'default_category'} & fields:
+                SkuService._set_sku_category(items, params)
 
         return {
             'page': page,
             'page_size': page_size,
             'totalRecords': total,
+            'next_cursor': next_cursor,
             'products': items
         }
 
@@ -4,6 +4,7 @@ import config
 import logging
 import requests
 
+from sqlalchemy.orm import aliased
 
 from catalog import models
 from catalog.models import (
@@ -53,6 +54,35 @@ def get_default_platform_owner_of_seller(seller_id: int, session=None) -> int:
         raise e
 
 
+def get_default_platform_owners_of_sellers(seller_ids, session=None) -> dict:
+    """
+    Same as `get_default_platform_owner_of_seller` for many sellers at once,
+    with a single query
+
+    :return: dict {seller_id: owner_seller_id}
+    """
+    owners = {seller_id: seller_id for seller_id in seller_ids}
+    if not seller_ids:
+        return owners
+
+    conn = session or models.db.session
+    default_platform = aliased(PlatformSellers)
+    owner = aliased(PlatformSellers)
+    rows = conn.query(default_platform.seller_id, owner.seller_id).join(
+        owner, owner.platform_id == default_platform.platform_id
+    ).filter(
+        default_platform.seller_id.in_(seller_ids),
+        default_platform.is_default.is_(True),
+        owner.is_owner.is_(True)
+    ).all()
+    resolved = set()
+    for seller_id, owner_seller_id in rows:
+        if seller_id not in resolved:
+            owners[seller_id] = owner_seller_id
+            resolved.add(seller_id)
+    return owners
+
+
 def get_platform_owner(platform_id: int) -> int:
     owner_seller = PlatformSellers.query.filter(PlatformSellers.platform_id == platform_id,
                                                 PlatformSellers.is_owner.is_(True)).first()
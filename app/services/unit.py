@@ -109,11 +109,13 @@ class UnitListQuery(QueryBase):
 def get_list_units(**params):
     page = params.pop('page')
     page_size = params.pop('page_size')
+    include_total = params.pop('include_total', True)
+    count_mode = params.pop('count_mode', None)
 
     list_query = UnitListQuery()
     list_query.apply_filters(params)
 
-    total_records = len(list_query)
+    total_records = list_query.count(include_total, count_mode)
     list_query.pagination(page, page_size)
 
     return list_query.all(), total_records
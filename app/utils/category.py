@@ -1,8 +1,14 @@
-from typing import Deque
+from typing import Deque, List
 from collections import deque
 
+from catalog import models
 from catalog.models.category import Category
 
+_CLOSURE_MODELS = {
+    models.Category: models.CategoryClosure,
+    models.MasterCategory: models.MasterCategoryClosure,
+}
+
 
 def calculate_maximal_children_depth(
     category: Category,
@@ -34,3 +40,47 @@ def calculate_maximal_children_depth(
             remained_categories.extend(current_category.children)
 
     return maximal_depth
+
+
+def sync_closure(node) -> None:
+    """Rewrite the closure rows of a (master) category from its ``path``.
+
+    Must be called once ``node.id`` is known and ``node.path`` is final, for
+    every node whose path changed - a moved subtree re-syncs each of its nodes.
+    """
+    closure_model = _CLOSURE_MODELS[type(node)]
+    ancestor_ids = [int(i) for i in str(node.path).split('/') if i]
+
+    closure_model.query.filter(
+        closure_model.descendant_id == node.id
+    ).delete(synchronize_session=False)
+    models.db.session.bulk_insert_mappings(closure_model, [{
+        'ancestor_id': ancestor_id,
+        'descendant_id': node.id,
+        'depth': len(ancestor_ids) - 1 - index,
+    } for index, ancestor_id in enumerate(ancestor_ids)])
+
+
+def descendant_query(model, ancestor_ids: List[int], *columns, seller_id: int = None):
+    """Query the active nodes of the subtrees rooted at ``ancestor_ids``,
+    the roots included, using one join on the closure table.
+
+    :param model: Category or MasterCategory
+    :param ancestor_ids:
+    :param columns: columns to select, ``model.id`` by default
+    :param seller_id: only accept roots owned by this seller
+    """
+    closure_model = _CLOSURE_MODELS[model]
+    ancestor = models.db.aliased(model)
+    query = models.db.session.query(*(columns or (model.id,))).join(
+        closure_model, closure_model.descendant_id == model.id
+    ).join(
+        ancestor, ancestor.id == closure_model.ancestor_id
+    ).filter(
+        ancestor.id.in_(ancestor_ids),
+        ancestor.is_active.is_(True),
+        model.is_active.is_(True)
+    )
+    if seller_id is not None:
+        query = query.filter(ancestor.seller_id == seller_id)
+    return query.distinct()
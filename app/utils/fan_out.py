@@ -0,0 +1,62 @@
+# coding=utf-8
+import logging
+import time
+
+from sqlalchemy import text
+
+import config
+from catalog import models
+
+_logger = logging.getLogger(__name__)
+
+
+def fan_out_by_id_range(session, name, condition, process_chunk, chunk_size=None, rate=None):
+    """
+    Apply a change to the sellable products matching `condition` in chunks
+    of `chunk_size` matching ids, committing after each chunk and running at
+    most `rate` chunks per second, so locks and queue spikes stay bounded by
+    one chunk. Chunks are paged by id over the matching products only, so
+    sparse ids cost no empty chunks. The progress is kept in `fan_out_jobs`.
+
+    :param session: session the chunks run in, committed after each of them
+    :param str name: name of the job, e.g. `brand:12`
+    :param str condition: WHERE clause on `sellable_products` aliased `a`
+    :param process_chunk: function(session, start_id, end_id) processing the
+        matching products whose id is in [start_id, end_id]
+    :return: the finished FanOutJob
+    """
+    chunk_size = chunk_size or config.FAN_OUT_CHUNK_SIZE
+    rate = config.FAN_OUT_CHUNKS_PER_SECOND if rate is None else rate
+    next_ids = text(f'select a.id from sellable_products a {condition} AND a.id > :last_id '
+                    f'order by a.id limit :limit')
+
+    job = models.FanOutJob(name=name, last_id=0)
+    session.add(job)
+    session.commit()
+
+    try:
+        while True:
+            started_at = time.time()
+            ids = [row[0] for row in session.execute(next_ids, {'last_id': job.last_id, 'limit': chunk_size})]
+            if not ids:
+                break
+            process_chunk(session, ids[0], ids[-1])
+            if job.start_id is None:
+                job.start_id = ids[0]
+            job.end_id = job.last_id = ids[-1]
+            job.chunk_count += 1
+            session.commit()
+            if len(ids) < chunk_size:
+                break
+            if rate:
+                time.sleep(max(1 / rate - (time.time() - started_at), 0))
+    except Exception:
+        session.rollback()
+        job.status = models.FanOutJob.STATUS_FAILED
+        session.commit()
+        raise
+
+    job.status = models.FanOutJob.STATUS_DONE
+    session.commit()
+    _logger.info(f'Fan-out {name}: {job.chunk_count} chunks of ids {job.start_id}..{job.end_id}')
+    return job
@@ -0,0 +1,49 @@
+-- Closure tables of the category trees, kept in sync by the category services
+CREATE TABLE IF NOT EXISTS `category_closures` (
+  `ancestor_id` int(11) NOT NULL,
+  `descendant_id` int(11) NOT NULL,
+  `depth` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`ancestor_id`, `descendant_id`),
+  INDEX `ix_category_closures_descendant_id`(`descendant_id`),
+  CONSTRAINT `fk_category_closures_ancestor_id` FOREIGN KEY (`ancestor_id`) REFERENCES `categories` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_category_closures_descendant_id` FOREIGN KEY (`descendant_id`) REFERENCES `categories` (`id`) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS `master_category_closures` (
+  `ancestor_id` int(11) NOT NULL,
+  `descendant_id` int(11) NOT NULL,
+  `depth` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`ancestor_id`, `descendant_id`),
+  INDEX `ix_master_category_closures_descendant_id`(`descendant_id`),
+  CONSTRAINT `fk_master_category_closures_ancestor_id` FOREIGN KEY (`ancestor_id`) REFERENCES `master_categories` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_master_category_closures_descendant_id` FOREIGN KEY (`descendant_id`) REFERENCES `master_categories` (`id`) ON DELETE CASCADE
+);
+
+-- Backfill from the parent links
+TRUNCATE TABLE category_closures;
+INSERT INTO category_closures (ancestor_id, descendant_id, depth)
+WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+    SELECT id, id, 0 FROM categories
+    UNION ALL
+    SELECT c.parent_id, t.descendant_id, t.depth + 1
+    FROM tree t
+             JOIN categories c ON c.id = t.ancestor_id
+    WHERE c.parent_id IS NOT NULL
+      AND c.parent_id != 0
+)
+SELECT ancestor_id, descendant_id, depth
+FROM tree;
+
+TRUNCATE TABLE master_category_closures;
+INSERT INTO master_category_closures (ancestor_id, descendant_id, depth)
+WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+    SELECT id, id, 0 FROM master_categories
+    UNION ALL
+    SELECT c.parent_id, t.descendant_id, t.depth + 1
+    FROM tree t
+             JOIN master_categories c ON c.id = t.ancestor_id
+    WHERE c.parent_id IS NOT NULL
+      AND c.parent_id != 0
+)
+SELECT ancestor_id, descendant_id, depth
+FROM tree;
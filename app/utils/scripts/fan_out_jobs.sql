@@ -0,0 +1,14 @@
+-- Progress of changes applied to sellable products chunk by chunk
+CREATE TABLE IF NOT EXISTS `fan_out_jobs` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `name` varchar(255) NOT NULL,
+  `status` varchar(16) NOT NULL DEFAULT 'running',
+  `start_id` int(11) DEFAULT NULL,
+  `end_id` int(11) DEFAULT NULL,
+  `last_id` int(11) DEFAULT NULL,
+  `chunk_count` int(11) NOT NULL DEFAULT 0,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  INDEX `ix_fan_out_jobs_name`(`name`)
+);
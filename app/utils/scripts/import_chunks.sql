@@ -0,0 +1,14 @@
+-- Chunks of rows of an import file imported by parallel celery tasks
+CREATE TABLE IF NOT EXISTS `import_chunks` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `import_id` int(11) NOT NULL,
+  `start_row` int(11) NOT NULL,
+  `end_row` int(11) NOT NULL,
+  `status` varchar(16) NOT NULL DEFAULT 'pending',
+  `rows` longtext DEFAULT NULL,
+  `succeeded` int(11) NOT NULL DEFAULT 0,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_import_chunks_import_id_start_row` (`import_id`, `start_row`)
+);
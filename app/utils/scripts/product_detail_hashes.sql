@@ -0,0 +1,8 @@
+-- Digest of the last product detail payload written or published per SKU and target
+CREATE TABLE IF NOT EXISTS `product_detail_hashes` (
+  `sku` varchar(64) NOT NULL,
+  `target` varchar(32) NOT NULL,
+  `hash` varchar(40) NOT NULL,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`sku`, `target`)
+);
@@ -0,0 +1,11 @@
+-- SKUs waiting for a coalesced product_details_v2 rebuild
+CREATE TABLE IF NOT EXISTS `product_detail_rebuilds` (
+  `sku` varchar(64) NOT NULL,
+  `updated_by` varchar(255) DEFAULT NULL,
+  `due_at` datetime NOT NULL,
+  `attempts` int(11) NOT NULL DEFAULT 0,
+  `last_error` text DEFAULT NULL,
+  `failed_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`sku`),
+  INDEX `ix_product_detail_rebuilds_due_at`(`due_at`)
+);
@@ -0,0 +1,12 @@
+-- RAM messages handed off to partitioned workers and not handled yet
+CREATE TABLE IF NOT EXISTS `ram_worker_messages` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `event_key` varchar(255) NOT NULL,
+  `message` longtext NOT NULL,
+  `attempts` int(11) NOT NULL DEFAULT 0,
+  `last_error` text DEFAULT NULL,
+  `failed_at` datetime DEFAULT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  INDEX `ix_ram_worker_messages_event_key_failed_at`(`event_key`, `failed_at`)
+);
@@ -0,0 +1,9 @@
+-- N-gram keyword search index of sellable products, filled by `flask rebuild-sellable-search-index`
+CREATE TABLE IF NOT EXISTS `sellable_product_search_tokens` (
+  `token` varchar(32) NOT NULL,
+  `sellable_product_id` int(11) NOT NULL,
+  PRIMARY KEY (`token`, `sellable_product_id`),
+  INDEX `ix_sellable_product_search_tokens_sellable_product_id`(`sellable_product_id`),
+  CONSTRAINT `fk_sellable_product_search_tokens_sellable_product_id` FOREIGN KEY (`sellable_product_id`)
+    REFERENCES `sellable_products` (`id`) ON DELETE CASCADE
+);
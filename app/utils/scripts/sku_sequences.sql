@@ -0,0 +1,6 @@
+-- Last SKU reserved per month, used to reserve blocks of SKUs for bulk creation
+CREATE TABLE IF NOT EXISTS `sku_sequences` (
+  `prefix` varchar(4) NOT NULL,
+  `last_sku` bigint(20) NOT NULL,
+  PRIMARY KEY (`prefix`)
+);
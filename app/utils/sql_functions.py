@@ -3,9 +3,11 @@ import logging
 import os
 
 from sqlalchemy import text
+from sqlalchemy.orm import Session
 
 import config
 from catalog.models import db
+from catalog.utils.fan_out import fan_out_by_id_range
 
 __author__ = 'Kien.HT'
 _logger = logging.getLogger(__name__)
@@ -41,31 +43,35 @@ ON DUPLICATE KEY UPDATE data = VALUES(data), updated_at = now(), updated_by = :u
 
 
 
-def update_by_brand(brand_id, updated_by=""):
+def _update_product_details(name, condition, updated_by):
     with open(os.path.join(config.ROOT_DIR, 'catalog', 'utils', 'select_listing.sql'), 'r') as file:
         sql = file.read()
-        sql += f' WHERE a.brand_id = {brand_id}'
+        sql += condition + ' AND a.id BETWEEN :start_id AND :end_id'
 
     update_sql = text(
         f"""update product_details, ({sql}) s set data = s.product_json, updated_at = now(), updated_by = :updated_by
             where product_details.sku = s.sku""")
 
-    db.engine.execute(update_sql, updated_by=updated_by)
+    def _update_chunk(session, start_id, end_id):
+        session.execute(update_sql, {'updated_by': updated_by, 'start_id': start_id, 'end_id': end_id})
 
+    # own session, the chunks commit and must not commit what the caller has pending
+    session = Session(bind=db.engine)
+    try:
+        fan_out_by_id_range(session, name, condition, _update_chunk)
+    finally:
+        session.close()
 
-def update_by_attribute(attribute_id, option_id=None, updated_by=""):
-    with open(os.path.join(config.ROOT_DIR, 'catalog', 'utils', 'select_listing.sql'), 'r') as file:
-        sql = file.read()
-        condition = """ WHERE exists (SELECT va.id from variant_attribute va WHERE va.variant_id = a.variant_id
-                AND va.attribute_id = {attribute_id} AND va.value {option_condition})"""
-        if option_id:
-            condition = condition.format(attribute_id=attribute_id, option_condition=f' = {option_id}')
-        else:
-            condition = condition.format(attribute_id=attribute_id, option_condition=' IS NOT NULL')
-        sql += condition
 
-    update_sql = text(
-        f"""update product_details, ({sql}) s set data = s.product_json, updated_at = now(), updated_by = :updated_by
-                where product_details.sku = s.sku""")
+def update_by_brand(brand_id, updated_by=""):
+    _update_product_details(f'brand:{brand_id}', f' WHERE a.brand_id = {brand_id}', updated_by)
 
-    db.engine.execute(update_sql, updated_by=updated_by)
+
+def update_by_attribute(attribute_id, option_id=None, updated_by=""):
+    condition = """ WHERE exists (SELECT va.id from variant_attribute va WHERE va.variant_id = a.variant_id
+            AND va.attribute_id = {attribute_id} AND va.value {option_condition})"""
+    if option_id:
+        condition = condition.format(attribute_id=attribute_id, option_condition=f' = {option_id}')
+    else:
+        condition = condition.format(attribute_id=attribute_id, option_condition=' IS NOT NULL')
+    _update_product_details(f'attribute:{attribute_id}:{option_id or ""}', condition, updated_by)
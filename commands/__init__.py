@@ -1,4 +1,6 @@
 # coding=utf-8
 import logging
 
+from . import product_details_v2, search_index
+
 _logger = logging.getLogger(__name__)
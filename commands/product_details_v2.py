@@ -0,0 +1,131 @@
+# coding=utf-8
+import logging
+import multiprocessing
+import os
+import time
+
+import click
+
+import config
+from catalog import app
+
+_logger = logging.getLogger(__name__)
+
+_CHECKPOINT_DIR = os.path.join(config.ROOT_DIR, 'media', 'backfill', 'product_details_v2')
+_DONE = 'done'
+# shard size the checkpoints of a directory were saved with
+_SHARD_SIZE_FILE = 'shard_size'
+
+
+def _checkpoint_path(checkpoint_dir, start_id):
+    return os.path.join(checkpoint_dir, str(start_id))
+
+
+def _read_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip()
+
+
+def _write_checkpoint(path, value):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(str(value))
+    os.replace(tmp_path, path)
+
+
+def _init_worker():
+    from catalog import models
+
+    # connections inherited from the parent process must not be shared
+    models.db.engine.dispose()
+
+
+def _rebuild_shard(shard):
+    """
+    Rebuild the rows of the sellable products whose id is in [start_id, end_id],
+    one transaction per batch, saving the last rebuilt id after each of them
+
+    :return: (start_id, end_id, number of rebuilt SKUs)
+    """
+    from catalog import models
+    from catalog.extensions.ram_queue_consumer import session_scope, upsert_product_details_v2
+
+    start_id, end_id, batch_size, updated_by, checkpoint_dir = shard
+    path = _checkpoint_path(checkpoint_dir, start_id)
+    checkpoint = _read_checkpoint(path)
+    if checkpoint == _DONE:
+        return start_id, end_id, 0
+
+    last_id = int(checkpoint) if checkpoint else start_id - 1
+    total = 0
+    with app.app_context():
+        while True:
+            with session_scope() as session:
+                rows = session.query(models.SellableProduct.id, models.SellableProduct.sku).filter(
+                    models.SellableProduct.id > last_id,
+                    models.SellableProduct.id <= end_id
+                ).order_by(models.SellableProduct.id).limit(batch_size).all()
+                if not rows:
+                    break
+                upsert_product_details_v2(session, [row.sku for row in rows], updated_by)
+            last_id = rows[-1].id
+            total += len(rows)
+            _write_checkpoint(path, last_id)
+    _write_checkpoint(path, _DONE)
+    return start_id, end_id, total
+
+
+@app.cli.command('rebuild-product-details-v2')
+@click.option('--workers', default=4, show_default=True, help='Number of worker processes')
+@click.option('--shard-size', default=50000, show_default=True,
+              help='Range of sellable product ids handled by one worker at a time')
+@click.option('--batch-size', default=config.PRODUCT_DETAIL_V2_BATCH_SIZE, show_default=True,
+              help='Number of SKUs rebuilt per transaction')
+@click.option('--updated-by', default='system', show_default=True)
+@click.option('--checkpoint-dir', default=_CHECKPOINT_DIR, show_default=True,
+              help='Where the progress of each shard is saved')
+@click.option('--restart', is_flag=True, help='Ignore the saved progress and rebuild everything')
+def rebuild_product_details_v2(workers, shard_size, batch_size, updated_by, checkpoint_dir, restart):
+    """Rebuild product_details_v2 of all SKUs, resuming where the last run stopped"""
+    from sqlalchemy import func
+    from catalog import models
+
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    if restart:
+        for name in os.listdir(checkpoint_dir):
+            os.remove(os.path.join(checkpoint_dir, name))
+    shard_size_path = os.path.join(checkpoint_dir, _SHARD_SIZE_FILE)
+    saved_shard_size = _read_checkpoint(shard_size_path)
+    if saved_shard_size is None:
+        _write_checkpoint(shard_size_path, shard_size)
+    elif int(saved_shard_size) != shard_size:
+        raise click.UsageError(f'{checkpoint_dir} was saved with --shard-size {saved_shard_size}, '
+                               f'resume with the same value or use --restart')
+
+    min_id, max_id = models.db.session.query(
+        func.min(models.SellableProduct.id), func.max(models.SellableProduct.id)).one()
+    models.db.session.remove()
+    if min_id is None:
+        click.echo('No sellable product to rebuild')
+        return
+
+    # shards are aligned on the shard size rather than on the current min id,
+    # so a resumed run finds the checkpoints of the same shards
+    first_id = min_id - (min_id - 1) % shard_size
+    shards = [(start_id, start_id + shard_size - 1, batch_size, updated_by, checkpoint_dir)
+              for start_id in range(first_id, max_id + 1, shard_size)]
+    click.echo(f'Rebuilding ids {min_id}..{max_id} in {len(shards)} shards with {workers} workers')
+
+    started_at = time.time()
+    done = 0
+    total = 0
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        for start_id, end_id, count in pool.imap_unordered(_rebuild_shard, shards):
+            done += 1
+            total += count
+            elapsed = time.time() - started_at
+            click.echo(f'[{done}/{len(shards)}] ids {start_id}..{end_id}: {count} SKUs, '
+                       f'{total} in total, {total / elapsed if elapsed else 0:.1f} SKUs/s')
+    click.echo(f'Rebuilt {total} SKUs in {time.time() - started_at:.0f}s')
@@ -0,0 +1,19 @@
+# coding=utf-8
+import logging
+
+import click
+
+from catalog import app
+
+_logger = logging.getLogger(__name__)
+
+
+@app.cli.command('rebuild-sellable-search-index')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Number of sellable products indexed per transaction')
+def rebuild_sellable_search_index(batch_size):
+    """Rebuild the keyword search index of all sellable products"""
+    from catalog.services.products.search_index import rebuild_search_index
+
+    total = rebuild_search_index(batch_size)
+    click.echo(f'Indexed {total} sellable products')
@@ -59,6 +59,14 @@ AMQP_VHOST = os.getenv('AMQP_VHOST', None)
 TEKO_AMQP_URL = 'amqp://{}:{}@{}:{}/{}'.format(
     AMQP_USER, AMQP_PASSWORD, AMQP_HOST, AMQP_PORT, AMQP_VHOST
 )
+# open connections kept by the queue publisher in each process
+AMQP_CONNECTION_POOL_SIZE = int(os.getenv('AMQP_CONNECTION_POOL_SIZE', 4))
+# messages committed together by QueuePublisher.publish_many
+AMQP_PUBLISH_BATCH_SIZE = int(os.getenv('AMQP_PUBLISH_BATCH_SIZE', 500))
+# messages the legacy queue consumer receives before acking, logged and acked as one batch
+QUEUE_CONSUMER_PREFETCH = int(os.getenv('QUEUE_CONSUMER_PREFETCH', 100))
+# milliseconds the legacy queue consumer waits for a batch to fill up
+QUEUE_CONSUMER_BATCH_WAIT_MS = int(os.getenv('QUEUE_CONSUMER_BATCH_WAIT_MS', 200))
 
 MEDIA_IMPORT_DIR = os.path.join(ROOT_DIR, 'media', 'import')
 MEDIA_BRAND_DIR = os.path.join('media', 'brands')
@@ -80,6 +88,12 @@ BASE_IMAGE_URL = os.getenv('BASE_IMAGE_URL', 'https://lh3.googleusercontent.com'
 
 CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379')
 CACHE_TYPE = os.getenv('CACHE_TYPE', 'simple')
+# seconds a cached total of a list query stays valid
+COUNT_CACHE_TIMEOUT = int(os.getenv('COUNT_CACHE_TIMEOUT', 60))
+# seconds a process keeps the compiled metadata of an attribute set
+ATTRIBUTE_SET_METADATA_TIMEOUT = int(os.getenv('ATTRIBUTE_SET_METADATA_TIMEOUT', 600))
+# receivers of a signal slower than this are logged, 0 disables the log
+SIGNAL_SLOW_RECEIVER_MS = int(os.getenv('SIGNAL_SLOW_RECEIVER_MS', 0))
 
 CELERY_TASK_ALWAYS_EAGER = os.getenv('CELERY_TASK_ALWAYS_EAGER', False)
 SELLER_GATEWAY_INTERNAL_URL = os.getenv('SELLER_GATEWAY_INTERNAL_URL', None)
@@ -110,6 +124,44 @@ SELLER_ONLY_UOM = [4, 18]
 RAM_KAFKA_BOOTSTRAP_SERVER = os.getenv('RAM_KAFKA_BOOTSTRAP_SERVER', 'confluent-kafka-cp-kafka.confluent-kafka:9092')
 RAM_KAFKA_CONSUMER_GROUP_NAME = os.getenv('RAM_KAFKA_CONSUMER_GROUP_NAME', 'catalog-ram-kafka')
 RAM_KAFKA_ENABLE_ADD_VARIANT_SKU_PUBLISHER = True
+# number of SKUs whose product_details_v2 rows are rebuilt together
+PRODUCT_DETAIL_V2_BATCH_SIZE = int(os.getenv('PRODUCT_DETAIL_V2_BATCH_SIZE', 200))
+# events of the same SKU received within this many seconds trigger a single
+# product_details_v2 rebuild, 0 rebuilds on every event
+PRODUCT_DETAIL_V2_COALESCE_SECONDS = int(os.getenv('PRODUCT_DETAIL_V2_COALESCE_SECONDS', 0))
+# failed coalesced rebuilds of a SKU before it is left until its next event
+PRODUCT_DETAIL_V2_REBUILD_MAX_ATTEMPTS = int(os.getenv('PRODUCT_DETAIL_V2_REBUILD_MAX_ATTEMPTS', 5))
+# messages of the product detail RAM consumers handled in one transaction,
+# 1 handles every message on its own
+RAM_CONSUMER_BATCH_SIZE = int(os.getenv('RAM_CONSUMER_BATCH_SIZE', 1))
+# milliseconds a batch of RAM messages waits to fill up
+RAM_CONSUMER_BATCH_WAIT_MS = int(os.getenv('RAM_CONSUMER_BATCH_WAIT_MS', 200))
+# threads of the product detail RAM consumers, messages of one SKU always go
+# to the same thread; above 1 it takes precedence over the batch mode
+RAM_CONSUMER_WORKERS = int(os.getenv('RAM_CONSUMER_WORKERS', 1))
+# messages handed off to a partitioned RAM worker and not handled yet, in memory
+RAM_CONSUMER_WORKER_QUEUE_SIZE = int(os.getenv('RAM_CONSUMER_WORKER_QUEUE_SIZE', 50))
+# retries of a failed message by a partitioned RAM worker, with exponential backoff,
+# before it is left in ram_worker_messages
+RAM_CONSUMER_WORKER_RETRIES = int(os.getenv('RAM_CONSUMER_WORKER_RETRIES', 3))
+# sellable product ids handled per chunk when a brand or attribute change is
+# applied to its products
+FAN_OUT_CHUNK_SIZE = int(os.getenv('FAN_OUT_CHUNK_SIZE', 1000))
+# chunks of a brand or attribute change run per second, 0 runs them back to back
+FAN_OUT_CHUNKS_PER_SECOND = float(os.getenv('FAN_OUT_CHUNKS_PER_SECOND', 2))
+# rows of an import file handled by one celery task
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 500))
+# copy of submitted import files until they are on the file service, required
+# by the imports; must be a storage shared by the API and the celery workers
+IMPORT_SPOOL_DIR = os.getenv('IMPORT_SPOOL_DIR')
+# spooled import files older than this are removed once uploaded
+IMPORT_SPOOL_TTL_HOURS = float(os.getenv('IMPORT_SPOOL_TTL_HOURS', 24))
+# pooled connections to the file service per process
+FILE_UPLOAD_POOL_SIZE = int(os.getenv('FILE_UPLOAD_POOL_SIZE', 4))
+# retries of a failed upload, with exponential backoff
+FILE_UPLOAD_RETRIES = int(os.getenv('FILE_UPLOAD_RETRIES', 3))
+# seconds
+FILE_UPLOAD_TIMEOUT = float(os.getenv('FILE_UPLOAD_TIMEOUT', 60))
 
 
 def _env(name, default):
@@ -0,0 +1,99 @@
+# coding=utf-8
+import pytest
+from mock import patch
+
+from catalog import models as m
+from catalog.biz.create_product_chunks import group_products, process_create_product_rows, IMPORT_TYPE
+from catalog.biz.import_jobs import _processors
+from catalog.biz.result_import import ImportStatus
+from catalog.constants import UOM_CODE_ATTRIBUTE, UOM_RATIO_CODE_ATTRIBUTE
+from tests.faker import fake
+
+
+def _typed(*types):
+    return [(index, {'type': t}) for index, t in enumerate(types)]
+
+
+def test_group_products_keeps_children_with_their_parent():
+    groups = group_products(_typed('DON', 'Cha', 'con', 'con', 'don'))
+
+    assert [[index for index, _ in g.rows] for g in groups] == [[0], [1, 2, 3], [4]]
+    assert [[index for index, _ in g.variant_rows] for g in groups] == [[0], [2, 3], [4]]
+    assert not any(g.error for g in groups)
+    assert groups[1].tag and groups[0].tag is None
+
+
+def test_group_products_fails_rows_without_product():
+    groups = group_products(_typed('con', 'cha', 'don', 'combo'))
+
+    assert [g.error is not None for g in groups] == [True, True, False, True]
+
+
+def test_create_product_processor_is_registered():
+    assert _processors[IMPORT_TYPE].process_rows is process_create_product_rows
+
+
+@pytest.fixture()
+def import_record(mysql_session_by_func):
+    seller = fake.seller()
+    attribute_set = fake.attribute_set()
+    fake.category(code='VPP', seller_id=seller.id, attribute_set_id=attribute_set.id)
+    fake.brand(name='Thiên Long')
+    fake.tax(label='10%')
+    uom = fake.attribute(code=UOM_CODE_ATTRIBUTE, value_type='selection')
+    fake.attribute(code=UOM_RATIO_CODE_ATTRIBUTE, value_type='number')
+    for value in ('Cái', 'Hộp'):
+        fake.attribute_option(uom.id, value=value)
+    record = m.FileImport(type=IMPORT_TYPE, key='create', status='processing', total_row=5,
+                          attribute_set_id=attribute_set.id, seller_id=seller.id,
+                          created_by='import@teko.vn', name='create.xlsx')
+    m.db.session.add(record)
+    m.db.session.commit()
+    seller_info = {'id': seller.id, 'isAutoGeneratedSKU': True}
+    with patch('catalog.services.seller.get_seller_by_id', return_value=seller_info), \
+            patch('catalog.services.imports.resolvers.ReferenceDataResolver.product_type_code',
+                  return_value='product'), \
+            patch('catalog.extensions.signals.sellable_create_signal.send'):
+        yield record
+
+
+def _row(row_type, name='Bút bi', uom='Cái', ratio=1, brand='Thiên Long'):
+    return {
+        'Type': row_type,
+        'category': 'VPP=>Văn phòng phẩm',
+        'product name': name,
+        'brand': brand,
+        'warranty months': 12,
+        'vendor tax': '10%',
+        'product type': 'Hàng hóa',
+        'uom': uom,
+        'uom_ratio': ratio,
+        'allow selling without stock?': 'No',
+    }
+
+
+def test_process_rows_creates_products_and_results(import_record):
+    rows = [
+        (0, _row('DON')),
+        (1, _row('CHA', 'Bút chì')),
+        (2, _row('CON', 'Bút chì')),
+        (3, _row('CON', 'Bút chì', uom='Hộp', ratio=10)),
+        (4, _row('DON', 'Bút mực', brand='Hồng Hà')),
+    ]
+
+    assert process_create_product_rows(import_record, rows) == 4
+
+    results = m.ResultImport.query.filter(m.ResultImport.import_id == import_record.id).all()
+    by_name = {}
+    for result in results:
+        by_name.setdefault(result.data['product name'], []).append(result)
+    assert [r.status for r in by_name['Bút bi']] == [ImportStatus.SUCCESS]
+    assert by_name['Bút bi'][0].data['sku']
+    pencil = by_name['Bút chì']
+    assert {r.status for r in pencil} == {ImportStatus.SUCCESS}
+    assert len({r.product_id for r in pencil}) == 1 and len({r.tag for r in pencil}) == 1
+    assert len({r.data.get('sku') for r in pencil if r.data['type'] == 'CON'}) == 2
+    failed, = by_name['Bút mực']
+    assert failed.status == ImportStatus.FAILURE
+    assert 'Hồng Hà' in failed.message
+    assert m.SellableProduct.query.filter(m.SellableProduct.product_id == pencil[0].product_id).count() == 2
@@ -0,0 +1,154 @@
+# coding=utf-8
+import json
+
+import pytest
+from mock import patch
+
+from catalog import models as m
+from catalog.biz import import_jobs
+from catalog.biz.import_jobs import split_chunks, parent_child_group, process_import_chunk, upload_import_file
+
+IMPORT_TYPE = 'test_chunks'
+
+
+def _rows(*types):
+    return [{'type': t} for t in types]
+
+
+def test_split_chunks_of_fixed_size():
+    rows = _rows(*['don'] * 5)
+
+    assert split_chunks(rows, 2) == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_split_chunks_of_no_rows():
+    assert split_chunks([], 2) == []
+
+
+def test_split_chunks_keeps_parent_and_children_together():
+    rows = _rows('don', 'cha', 'con', 'con', 'don', 'don')
+
+    assert split_chunks(rows, 1, parent_child_group) == [(0, 1), (1, 4), (4, 5), (5, 6)]
+    assert split_chunks(rows, 2, parent_child_group) == [(0, 4), (4, 6)]
+
+
+def test_split_chunks_splits_between_groups():
+    rows = _rows('cha', 'con', 'cha', 'con')
+
+    assert split_chunks(rows, 1, parent_child_group) == [(0, 2), (2, 4)]
+
+
+def test_parent_child_group():
+    assert parent_child_group({'type': ' Con '})
+    assert not parent_child_group({'type': 'cha'})
+    assert not parent_child_group({'type': 'don'})
+    assert not parent_child_group({'type': None})
+
+
+@pytest.fixture()
+def import_record(mysql_session_by_func):
+    processed = []
+
+    def process_rows(import_record, rows):
+        processed.extend(index for index, _ in rows)
+        if any(row.get('fail') for _, row in rows):
+            raise ValueError('bad chunk')
+        return len(rows)
+
+    import_jobs.register_import_processor(IMPORT_TYPE)(process_rows)
+    record = m.FileImport(type=IMPORT_TYPE, key='chunks', status='processing', total_row=5,
+                          created_by='import@teko.vn', name='chunks.xlsx')
+    m.db.session.add(record)
+    m.db.session.commit()
+    record.processed = processed
+    yield record
+    import_jobs._processors.pop(IMPORT_TYPE)
+
+
+def _chunk(import_record, start, rows):
+    chunk = m.ImportChunk(import_id=import_record.id, start_row=start, end_row=start + len(rows),
+                          rows=json.dumps(rows))
+    m.db.session.add(chunk)
+    m.db.session.commit()
+    return chunk.id
+
+
+def _total_row_success(import_record):
+    m.db.session.expire_all()
+    return m.FileImport.query.get(import_record.id).total_row_success
+
+
+def test_chunks_add_their_rows_to_the_import_once(import_record):
+    first = _chunk(import_record, 0, [{'name': 'a'}, {'name': 'b'}])
+    second = _chunk(import_record, 2, [{'name': 'c'}])
+
+    assert process_import_chunk(import_record.id, first) == 2
+    assert process_import_chunk(import_record.id, second) == 1
+    assert process_import_chunk(import_record.id, first) == 2
+
+    assert import_record.processed == [0, 1, 2]
+    assert _total_row_success(import_record) == 3
+    chunk = m.ImportChunk.query.get(first)
+    assert chunk.status == m.ImportChunk.STATUS_DONE
+    assert chunk.rows is None
+
+
+def test_failed_chunk_adds_no_row(import_record):
+    ok = _chunk(import_record, 0, [{'name': 'a'}])
+    failed = _chunk(import_record, 1, [{'name': 'b'}, {'fail': True}])
+
+    process_import_chunk(import_record.id, ok)
+    assert process_import_chunk(import_record.id, failed) == 0
+
+    assert _total_row_success(import_record) == 1
+    assert m.ImportChunk.query.get(failed).status == m.ImportChunk.STATUS_FAILED
+
+
+def test_upload_stores_the_path_before_starting_the_import(mysql_session_by_func):
+    record = m.FileImport(type='create_product_basic_info', key='upload', status='new', total_row=1,
+                          created_by='import@teko.vn', name='upload.xlsx')
+    m.db.session.add(record)
+    m.db.session.commit()
+    paths = []
+
+    def start_import(params):
+        m.db.session.expire_all()
+        paths.append(m.FileImport.query.get(params['id']).path)
+
+    with patch('catalog.biz.import_jobs.upload_spooled_file', return_value='https://files/upload.xlsx'), \
+            patch('catalog.extensions.signals.product_basic_info_import_signal.send', side_effect=start_import):
+        upload_import_file(record.id)
+
+    assert paths == ['https://files/upload.xlsx']
+
+
+def test_import_fails_once_the_upload_retries_are_exhausted(mysql_session_by_func):
+    record = m.FileImport(type='create_product_basic_info', key='upload', status='new', total_row=1,
+                          created_by='import@teko.vn', name='upload.xlsx')
+    m.db.session.add(record)
+    m.db.session.commit()
+
+    with patch('catalog.biz.import_jobs.upload_spooled_file', side_effect=IOError('file service down')), \
+            patch.object(upload_import_file, 'max_retries', 0), \
+            patch('catalog.extensions.signals.product_basic_info_import_signal.send') as start_import:
+        with pytest.raises(IOError):
+            upload_import_file(record.id)
+
+    m.db.session.expire_all()
+    assert m.FileImport.query.get(record.id).status == import_jobs.STATUS_ERROR
+    assert start_import.call_count == 0
+
+
+def test_upload_dispatches_chunked_imports_instead_of_the_signal(mysql_session_by_func):
+    record = m.FileImport(type='create_product', key='upload', status='new', total_row=1,
+                          created_by='import@teko.vn', name='upload.xlsx')
+    m.db.session.add(record)
+    m.db.session.commit()
+
+    with patch('catalog.biz.import_jobs.upload_spooled_file', return_value='https://files/upload.xlsx'), \
+            patch('catalog.biz.import_jobs.dispatch_import', return_value=True) as dispatch_import, \
+            patch('catalog.extensions.signals.product_import_signal.send') as start_import:
+        upload_import_file(record.id)
+
+    dispatch_import.assert_called_once_with(record.id)
+    assert start_import.call_count == 0
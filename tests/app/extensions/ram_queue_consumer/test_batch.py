@@ -0,0 +1,128 @@
+# coding=utf-8
+import threading
+import time
+
+import pytest
+from mock import patch, MagicMock
+
+from catalog.extensions import ram_queue_consumer as consumer
+from catalog.extensions.ram_queue_consumer import batch
+from catalog.extensions.ram_queue_consumer.batch import BatchCollector, BatchHandler, BatchRamConsumer
+
+
+def _submit_all(collector, messages):
+    errors = {}
+
+    def submit(message):
+        try:
+            collector.submit(message)
+        except Exception as e:
+            errors[message] = e
+
+    threads = [threading.Thread(target=submit, args=(message,)) for message in messages]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return errors
+
+
+def test_collector_processes_a_full_batch_without_waiting():
+    handler = BatchHandler(MagicMock(), MagicMock())
+    collector = BatchCollector(handler, batch_size=3, wait_ms=60 * 1000)
+
+    started = time.monotonic()
+    assert _submit_all(collector, ['a', 'b', 'c']) == {}
+
+    assert time.monotonic() - started < 10
+    handler.handle_batch.assert_called_once()
+    assert sorted(handler.handle_batch.call_args[0][0]) == ['a', 'b', 'c']
+    assert handler.handle_one.call_count == 0
+
+
+def test_collector_processes_a_partial_batch_after_the_wait():
+    handler = BatchHandler(MagicMock(), MagicMock())
+    collector = BatchCollector(handler, batch_size=10, wait_ms=50)
+
+    started = time.monotonic()
+    collector.submit('a')
+
+    assert time.monotonic() - started >= 0.05
+    handler.handle_batch.assert_called_once_with(['a'])
+
+
+def test_collector_falls_back_to_one_by_one_and_raises_the_error_of_each_message():
+    handled = []
+
+    def handle_one(message):
+        if message == 'bad':
+            raise ValueError(message)
+        handled.append(message)
+
+    handler = BatchHandler(MagicMock(side_effect=RuntimeError('batch failed')), handle_one)
+    collector = BatchCollector(handler, batch_size=3, wait_ms=60 * 1000)
+
+    errors = _submit_all(collector, ['a', 'bad', 'c'])
+
+    assert sorted(handled) == ['a', 'c']
+    assert list(errors) == ['bad']
+    assert isinstance(errors['bad'], ValueError)
+
+
+def test_collector_re_raises_the_error_of_a_single_message():
+    handler = BatchHandler(MagicMock(side_effect=RuntimeError('batch failed')),
+                           MagicMock(side_effect=ValueError('bad message')))
+    collector = BatchCollector(handler, batch_size=1, wait_ms=10)
+
+    with pytest.raises(ValueError):
+        collector.submit('a')
+
+
+def test_consumer_runs_one_loop_per_batch_slot_feeding_the_collectors():
+    loops = []
+
+    def ram_consumer(map_event_key_with_handler):
+        loops.append(map_event_key_with_handler)
+        return MagicMock()
+
+    handler = BatchHandler(MagicMock(), MagicMock())
+    with patch.object(batch, 'RamConsumer', side_effect=ram_consumer):
+        BatchRamConsumer({'event': handler}, batch_size=3, wait_ms=10).start()
+
+    assert len(loops) == 3
+    submits = {loop['event'] for loop in loops}
+    assert len(submits) == 1
+    submit = submits.pop()
+    assert isinstance(submit.__self__, BatchCollector)
+
+    submit('message')
+    handler.handle_batch.assert_called_once_with(['message'])
+
+
+def test_push_batch_publishes_after_the_commit():
+    events = []
+    session = MagicMock()
+    session.commit.side_effect = lambda: events.append('commit')
+    items = [{'sku': 'A', 'message': b'a', 'routing_key': 'teko.catalog.sellable.updated', 'headers': {}}]
+    with patch.object(consumer, 'Session', return_value=session), \
+            patch.object(consumer, '_push_product_data', side_effect=items + [None]), \
+            patch.object(consumer.queue_publisher, 'QueuePublisher') as publisher:
+        publisher.return_value.publish_many.side_effect = lambda *args, **kwargs: events.append('publish')
+        consumer.process_push_product_data_batch(['{"id": 1}', '{"id": 2}'])
+
+    assert events == ['commit', 'publish']
+    publisher.return_value.publish_many.assert_called_once_with(items, batch_size=1)
+
+
+def test_push_batch_drops_its_hashes_when_publishing_fails():
+    session = MagicMock()
+    items = [{'sku': 'A', 'message': b'a', 'routing_key': 'teko.catalog.sellable.updated', 'headers': {}}]
+    with patch.object(consumer, 'Session', return_value=session), \
+            patch.object(consumer, '_push_product_data', side_effect=items), \
+            patch.object(consumer.queue_publisher, 'QueuePublisher') as publisher:
+        publisher.return_value.publish_many.side_effect = IOError('broker down')
+        with pytest.raises(IOError):
+            consumer.process_push_product_data_batch(['{"id": 1}'])
+
+    session.query.return_value.filter.return_value.delete.assert_called_once_with(synchronize_session=False)
+    assert session.commit.call_count == 2
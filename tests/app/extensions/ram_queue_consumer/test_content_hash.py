@@ -0,0 +1,52 @@
+# coding=utf-8
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from mock import MagicMock
+
+from catalog.extensions.ram_queue_consumer.content_hash import content_hash, ContentHashes, TARGET_DETAIL_V2
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({'sku': 'A', 'name': 'Bút bi', 'price': {'sell': 1, 'list': 2}}) == \
+        content_hash({'price': {'list': 2, 'sell': 1}, 'name': 'Bút bi', 'sku': 'A'})
+
+
+def test_content_hash_changes_with_values():
+    assert content_hash({'sku': 'A', 'name': 'Bút bi'}) != content_hash({'sku': 'A', 'name': 'Bút chì'})
+    assert content_hash([1, 2]) != content_hash([2, 1])
+
+
+def test_content_hash_ignores_excluded_keys():
+    assert content_hash({'sku': 'A', 'updated_at': '2020-01-01'}, exclude=('updated_at',)) == \
+        content_hash({'sku': 'A', 'updated_at': '2020-01-02'}, exclude=('updated_at',))
+
+
+def test_content_hash_accepts_non_json_values():
+    data = {'created_at': datetime(2020, 1, 2, 3, 4, 5), 'price': Decimal('10.50')}
+
+    assert content_hash(data) == content_hash(dict(data))
+
+
+def _hashes(rows):
+    session = MagicMock()
+    session.query.return_value.filter.return_value = rows
+    return session, ContentHashes(session, TARGET_DETAIL_V2, [row.sku for row in rows] + ['NEW'])
+
+
+def test_changed_skips_payload_with_the_stored_digest():
+    _, hashes = _hashes([SimpleNamespace(sku='A', hash='digest')])
+
+    assert hashes.changed('A', 'digest') is False
+
+
+def test_changed_records_new_digest():
+    row = SimpleNamespace(sku='A', hash='old')
+    session, hashes = _hashes([row])
+
+    assert hashes.changed('A', 'new') is True
+    assert row.hash == 'new'
+    assert hashes.changed('NEW', 'digest') is True
+    assert session.add.call_count == 1
+    assert hashes.changed('NEW', 'digest') is False
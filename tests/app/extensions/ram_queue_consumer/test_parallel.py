@@ -0,0 +1,113 @@
+# coding=utf-8
+import json
+import threading
+import time
+from datetime import datetime
+
+from ram.v1_0.stop_retry_exception import StopRetryException
+
+from catalog import models as m
+from catalog.extensions.ram_queue_consumer.parallel import PartitionedRamConsumer, message_key
+
+EVENT_KEY = 'test-event'
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def _saved_messages():
+    m.db.session.expire_all()
+    return m.RamWorkerMessage.query.order_by(m.RamWorkerMessage.id).all()
+
+
+def test_message_key():
+    assert message_key(json.dumps({'sku': 'A', 'id': 1})) == 'A'
+    assert message_key(json.dumps({'id': 1})) == '1'
+    assert message_key('not json') == 'not json'
+
+
+def test_same_key_messages_submitted_concurrently_are_handled_in_order_one_at_a_time(session):
+    lock = threading.Lock()
+    running = set()
+    overlaps = []
+    handled = []
+
+    def handler(message):
+        data = json.loads(message)
+        with lock:
+            if data['sku'] in running:
+                overlaps.append(data)
+            running.add(data['sku'])
+        time.sleep(0.001)
+        with lock:
+            running.discard(data['sku'])
+            handled.append(data)
+
+    consumer = PartitionedRamConsumer({EVENT_KEY: handler}, workers=4, queue_size=5)
+    consumer._start_workers()
+
+    def feed(thread):
+        for seq in range(30):
+            consumer.dispatch(EVENT_KEY, json.dumps({'sku': f'sku-{seq % 3}', 'thread': thread, 'seq': seq}))
+
+    feeders = [threading.Thread(target=feed, args=(i,)) for i in range(4)]
+    for feeder in feeders:
+        feeder.start()
+    for feeder in feeders:
+        feeder.join()
+    _wait_for(lambda: len(handled) == 120)
+
+    assert not overlaps
+    for thread in range(4):
+        for sku in ('sku-0', 'sku-1', 'sku-2'):
+            seqs = [d['seq'] for d in handled if d['thread'] == thread and d['sku'] == sku]
+            assert seqs == sorted(seqs)
+    _wait_for(lambda: not _saved_messages())
+
+
+def test_failed_message_is_retried_before_the_next_one_of_its_key(session):
+    calls = []
+
+    def handler(message):
+        calls.append(message)
+        if message == json.dumps({'sku': 'A', 'seq': 0}) and calls.count(message) < 2:
+            raise ValueError('temporary')
+        if message == json.dumps({'sku': 'A', 'seq': 1}):
+            raise StopRetryException('bad message')
+
+    consumer = PartitionedRamConsumer({EVENT_KEY: handler}, workers=2, retries=2)
+    consumer._start_workers()
+    for seq in range(3):
+        consumer.dispatch(EVENT_KEY, json.dumps({'sku': 'A', 'seq': seq}))
+    _wait_for(lambda: len(calls) == 4)
+
+    assert [json.loads(c)['seq'] for c in calls] == [0, 0, 1, 2]
+    _wait_for(lambda: len(_saved_messages()) == 1)
+    failed, = _saved_messages()
+    assert json.loads(failed.message)['seq'] == 1
+    assert failed.failed_at is not None
+    assert 'bad message' in failed.last_error
+
+
+def test_messages_left_by_a_previous_run_are_handled_first_in_order(session):
+    for seq in range(3):
+        session.add(m.RamWorkerMessage(event_key=EVENT_KEY, message=json.dumps({'sku': 'A', 'seq': seq})))
+    session.add(m.RamWorkerMessage(event_key=EVENT_KEY, message=json.dumps({'sku': 'A', 'seq': -1}),
+                                   failed_at=datetime.now()))
+    session.add(m.RamWorkerMessage(event_key='other-event', message=json.dumps({'sku': 'A', 'seq': -2})))
+    session.commit()
+    handled = []
+
+    consumer = PartitionedRamConsumer({EVENT_KEY: handled.append}, workers=2)
+    consumer._start_workers()
+    consumer._replay()
+    consumer.dispatch(EVENT_KEY, json.dumps({'sku': 'A', 'seq': 3}))
+    _wait_for(lambda: len(handled) == 4)
+
+    assert [json.loads(message)['seq'] for message in handled] == [0, 1, 2, 3]
+    _wait_for(lambda: len(_saved_messages()) == 2)
+    assert sorted(json.loads(row.message)['seq'] for row in _saved_messages()) == [-2, -1]
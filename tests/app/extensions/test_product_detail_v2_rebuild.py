@@ -0,0 +1,96 @@
+# coding=utf-8
+from datetime import datetime, timedelta
+
+import pytest
+from mock import patch
+
+import config
+from catalog import models as m
+from catalog.extensions.ram_queue_consumer import enqueue_product_detail_v2_rebuild, \
+    flush_product_detail_v2_rebuilds
+
+UPSERT = 'catalog.extensions.ram_queue_consumer.upsert_product_details_v2'
+
+
+@pytest.fixture()
+def session(mysql_session_by_func):
+    return mysql_session_by_func
+
+
+def _rebuild(session, sku):
+    session.expire_all()
+    return session.query(m.ProductDetailRebuild).get(sku)
+
+
+def _make_due(session, *skus):
+    session.query(m.ProductDetailRebuild).filter(m.ProductDetailRebuild.sku.in_(skus)).update(
+        {'due_at': datetime.now() - timedelta(seconds=1)}, synchronize_session=False)
+
+
+def test_enqueue_coalesces_events_of_a_sku(session):
+    with patch.object(config, 'PRODUCT_DETAIL_V2_COALESCE_SECONDS', 5):
+        enqueue_product_detail_v2_rebuild(session, 'A', 'first@teko.vn')
+        due_at = _rebuild(session, 'A').due_at
+        enqueue_product_detail_v2_rebuild(session, 'A', 'second@teko.vn')
+
+    rebuild = _rebuild(session, 'A')
+    assert session.query(m.ProductDetailRebuild).count() == 1
+    assert rebuild.updated_by == 'second@teko.vn'
+    assert rebuild.due_at == due_at
+
+
+def test_flush_rebuilds_due_skus_by_user(session):
+    with patch.object(config, 'PRODUCT_DETAIL_V2_COALESCE_SECONDS', 5):
+        enqueue_product_detail_v2_rebuild(session, 'A', 'first@teko.vn')
+        enqueue_product_detail_v2_rebuild(session, 'B', 'first@teko.vn')
+        enqueue_product_detail_v2_rebuild(session, 'C', 'second@teko.vn')
+        enqueue_product_detail_v2_rebuild(session, 'D', 'second@teko.vn')
+    _make_due(session, 'A', 'B', 'C')
+
+    with patch(UPSERT) as upsert:
+        assert flush_product_detail_v2_rebuilds(session) == 3
+
+    calls = sorted((args[2], sorted(args[1])) for args, _ in upsert.call_args_list)
+    assert calls == [('first@teko.vn', ['A', 'B']), ('second@teko.vn', ['C'])]
+    assert [r.sku for r in session.query(m.ProductDetailRebuild)] == ['D']
+
+
+def test_flush_keeps_failing_sku_without_blocking_others(session):
+    for sku in ('A', 'B', 'C'):
+        enqueue_product_detail_v2_rebuild(session, sku, 'user@teko.vn')
+    _make_due(session, 'A', 'B', 'C')
+
+    def upsert(_, skus, __):
+        if 'B' in skus:
+            raise ValueError('broken sku')
+
+    with patch(UPSERT, side_effect=upsert):
+        flush_product_detail_v2_rebuilds(session)
+
+    assert [r.sku for r in session.query(m.ProductDetailRebuild)] == ['B']
+    rebuild = _rebuild(session, 'B')
+    assert rebuild.attempts == 1
+    assert rebuild.failed_at is None
+    assert rebuild.due_at > datetime.now()
+    assert 'broken sku' in rebuild.last_error
+
+
+def test_flush_gives_up_after_max_attempts_until_next_event(session):
+    enqueue_product_detail_v2_rebuild(session, 'A', 'user@teko.vn')
+
+    with patch(UPSERT, side_effect=ValueError('broken sku')), \
+            patch.object(config, 'PRODUCT_DETAIL_V2_REBUILD_MAX_ATTEMPTS', 2):
+        for _ in range(2):
+            _make_due(session, 'A')
+            flush_product_detail_v2_rebuilds(session)
+        _make_due(session, 'A')
+        assert flush_product_detail_v2_rebuilds(session) == 0
+
+    rebuild = _rebuild(session, 'A')
+    assert rebuild.attempts == 2
+    assert rebuild.failed_at is not None
+
+    enqueue_product_detail_v2_rebuild(session, 'A', 'user@teko.vn')
+    rebuild = _rebuild(session, 'A')
+    assert rebuild.attempts == 0
+    assert rebuild.failed_at is None
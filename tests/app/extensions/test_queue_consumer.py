@@ -0,0 +1,99 @@
+# coding=utf-8
+import time
+from queue import Queue
+
+import pytest
+from mock import patch, MagicMock
+
+from catalog import models as m
+from catalog.extensions import queue_consumer
+from catalog.extensions.queue_consumer import QueueConsumer
+
+QUEUE_NAME = 'test_queue'
+
+
+def _consumer(prefetch=3, batch_wait_ms=60 * 1000, debug=False):
+    with patch.object(queue_consumer.orm, 'sessionmaker'):
+        return QueueConsumer('amqp://localhost', QUEUE_NAME, debug=debug, prefetch=prefetch,
+                             batch_wait_ms=batch_wait_ms)
+
+
+def _buffer(*items):
+    buffer = Queue()
+    for item in items:
+        buffer.put(item)
+    return buffer
+
+
+def _msg(body):
+    return MagicMock(routing_key='teko.test', exchange='teko', body=body.encode(), properties={})
+
+
+def test_next_batch_takes_up_to_prefetch_messages_without_waiting():
+    consumer = _consumer(prefetch=3)
+    buffer = _buffer('a', 'b', 'c', 'd')
+
+    started = time.monotonic()
+    assert consumer._next_batch(buffer) == ['a', 'b', 'c']
+    assert time.monotonic() - started < 10
+
+
+def test_next_batch_returns_a_partial_batch_after_the_wait():
+    consumer = _consumer(prefetch=3, batch_wait_ms=50)
+
+    started = time.monotonic()
+    assert consumer._next_batch(_buffer('a')) == ['a']
+    assert time.monotonic() - started >= 0.05
+
+
+def test_next_batch_stops_at_a_receive_error():
+    consumer = _consumer(prefetch=3)
+    error = RuntimeError('connection lost')
+
+    assert consumer._next_batch(_buffer('a', error, 'b')) == ['a', error]
+
+
+def test_failing_handler_in_debug_mode_saves_the_handled_logs_and_acks_them(session):
+    consumer = QueueConsumer('amqp://localhost', QUEUE_NAME, debug=True, prefetch=3)
+    msgs = [_msg('{"id": 1}'), _msg('{"id": 2}'), _msg('{"id": 3}')]
+
+    with patch.object(queue_consumer.MessageProcessor, 'process_message',
+                      side_effect=[None, ValueError('handler failed')]) as process_message:
+        with pytest.raises(ValueError):
+            consumer._on_msgs_received(msgs)
+
+    assert process_message.call_count == 2
+    assert sorted(log.body_raw for log in m.MsgLog.query.all()) == ['{"id": 1}', '{"id": 2}']
+    msgs[1].ack.assert_called_once_with(all_previous=True)
+    assert msgs[0].ack.call_count == 0 and msgs[2].ack.call_count == 0
+
+
+def test_batch_is_saved_and_acked_once(session):
+    consumer = QueueConsumer('amqp://localhost', QUEUE_NAME, prefetch=3)
+    msgs = [_msg('{"id": 1}'), _msg('{"id": 2}')]
+
+    with patch.object(queue_consumer.MessageProcessor, 'process_message'):
+        consumer._on_msgs_received(msgs)
+
+    assert m.MsgLog.query.count() == 2
+    msgs[1].ack.assert_called_once_with(all_previous=True)
+    assert msgs[0].ack.call_count == 0
+
+
+def test_run_handles_the_received_messages_then_raises_the_receive_error():
+    consumer = _consumer(prefetch=3, batch_wait_ms=10)
+    msg = _msg('{"id": 1}')
+
+    def consume(prefetch):
+        yield msg
+        raise RuntimeError('connection lost')
+
+    queue = MagicMock()
+    queue.consume.side_effect = consume
+    with patch.object(queue_consumer.rabbitpy, 'Connection'), \
+            patch.object(queue_consumer.rabbitpy, 'Queue', return_value=queue), \
+            patch.object(consumer, '_on_msgs_received') as on_msgs_received:
+        with pytest.raises(RuntimeError):
+            consumer.run()
+
+    on_msgs_received.assert_called_once_with(msgs=[msg], queue_name=queue.name)
@@ -0,0 +1,91 @@
+# coding=utf-8
+from types import SimpleNamespace
+
+import pytest
+from blinker import Namespace
+
+from catalog import models as m
+from catalog.extensions.signals import outbox, stage
+
+
+class Received(list):
+    """Senders of a test signal, in the order they were sent"""
+
+    def __init__(self):
+        super().__init__()
+        self.signal = Namespace().signal('outbox-test')
+        self.signal.connect(self.append, weak=False)
+
+
+@pytest.fixture()
+def received(session):
+    return Received()
+
+
+def test_signals_are_sent_after_the_commit_when_the_scope_exits(received):
+    with outbox():
+        stage(received.signal, 1)
+        m.db.session.commit()
+        assert received == []
+
+    assert received == [1]
+
+
+def test_rolled_back_signals_are_dropped(received):
+    with outbox():
+        stage(received.signal, 1)
+        m.db.session.rollback()
+        stage(received.signal, 2)
+        m.db.session.commit()
+
+    assert received == [2]
+
+
+def test_signals_are_sent_right_away_outside_of_a_scope(received):
+    stage(received.signal, 1)
+
+    assert received == [1]
+
+
+def test_same_object_is_sent_once(received):
+    first, second = SimpleNamespace(id=1), SimpleNamespace(id=2)
+    with outbox():
+        stage(received.signal, first)
+        stage(received.signal, second)
+        stage(received.signal, first)
+        m.db.session.commit()
+
+    assert received == [first, second]
+
+
+def test_nested_scopes_send_when_the_outermost_exits(received):
+    with outbox():
+        with outbox():
+            stage(received.signal, 1)
+            m.db.session.commit()
+        assert received == []
+
+    assert received == [1]
+
+
+def test_released_savepoint_waits_for_the_outer_transaction(received):
+    with outbox():
+        stage(received.signal, 1)
+        m.db.session.commit()
+        with m.db.session.begin_nested():
+            stage(received.signal, 2)
+        m.db.session.rollback()
+
+    assert received == [1]
+
+
+def test_rolled_back_savepoint_keeps_signals_of_the_outer_transaction(received):
+    with outbox():
+        stage(received.signal, 1)
+        m.db.session.begin_nested()
+        stage(received.signal, 2)
+        m.db.session.rollback()
+        stage(received.signal, 3)
+        m.db.session.commit()
+
+    assert received == [1, 3]
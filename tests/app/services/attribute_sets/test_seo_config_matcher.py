@@ -0,0 +1,92 @@
+# coding=utf-8
+from types import SimpleNamespace
+
+from mock import MagicMock
+
+from catalog import models as m
+from catalog.services.attribute_sets.seo_config_matcher import SeoConfigMatcher, NUMBER_SET_CONFIG_ATTRIBUTES
+
+BRAND_ID = 1
+OTHER_BRAND_ID = 2
+COLOR = 10
+SIZE = 11
+
+
+def _config(id, brand_id=None, slots=()):
+    """Config with `slots` as (attribute_id, value) pairs, the other slots are empty"""
+    slots = list(slots) + [(None, None)] * (NUMBER_SET_CONFIG_ATTRIBUTES - len(slots))
+    config = SimpleNamespace(id=id, brand_id=brand_id)
+    for i, (attribute_id, value) in enumerate(slots):
+        setattr(config, f'attribute_{i + 1}_id', attribute_id)
+        setattr(config, f'attribute_{i + 1}_value', value)
+    return config
+
+
+def _full(id, brand_id=None, attribute_id=COLOR, values=('1', '2', '3', '4', '5')):
+    return _config(id, brand_id, [(attribute_id, value) for value in values])
+
+
+def _session(configs, default=None, details=()):
+    """Session returning `configs` in priority order, like `_order_attribute_set_configs`"""
+    queries = {m.AttributeSetConfig: MagicMock(), m.AttributeSetConfigDetail: MagicMock()}
+    configs_query = queries[m.AttributeSetConfig].filter.return_value.order_by.return_value
+    configs_query.all.return_value = configs
+    configs_query.first.return_value = default
+    queries[m.AttributeSetConfigDetail].filter.return_value.order_by.return_value = list(details)
+    session = MagicMock()
+    session.query.side_effect = queries.get
+    return session
+
+
+def _attributes(*pairs):
+    return [{'attribute_id': attribute_id, 'value': value} for attribute_id, value in pairs]
+
+
+def test_match_returns_none_without_matching_config():
+    matcher = SeoConfigMatcher(1, _session([_full(1, values=('1', '2', '3', '4', '5'))]))
+
+    assert matcher.match(BRAND_ID, _attributes((COLOR, '9'), (SIZE, '1'))) is None
+
+
+def test_match_on_any_attribute_slot():
+    matcher = SeoConfigMatcher(1, _session([_full(1, values=('1', '2', '3', '4', '5'))]))
+
+    assert matcher.match(BRAND_ID, _attributes((SIZE, '9'), (COLOR, '4'))).id == 1
+
+
+def test_config_with_an_empty_slot_matches_any_sku_of_its_brand():
+    matcher = SeoConfigMatcher(1, _session([_config(1, BRAND_ID, [(COLOR, '1')])]))
+
+    assert matcher.match(BRAND_ID, _attributes((COLOR, '9'))).id == 1
+    assert matcher.match(OTHER_BRAND_ID, _attributes((COLOR, '9'))) is None
+
+
+def test_config_without_brand_matches_any_brand():
+    matcher = SeoConfigMatcher(1, _session([_full(1)]))
+
+    assert matcher.match(BRAND_ID, _attributes((COLOR, '1'))).id == 1
+    assert matcher.match(None, _attributes((COLOR, '1'))).id == 1
+
+
+def test_first_matching_config_in_priority_order_wins():
+    matcher = SeoConfigMatcher(1, _session([
+        _full(1, BRAND_ID, values=('1', '2', '3', '4', '5')),
+        _full(2, values=('1', '2', '3', '4', '5')),
+        _config(3),
+    ]))
+
+    assert matcher.match(BRAND_ID, _attributes((COLOR, '1'))).id == 1
+    assert matcher.match(OTHER_BRAND_ID, _attributes((COLOR, '1'))).id == 2
+    assert matcher.match(OTHER_BRAND_ID, _attributes((COLOR, '9'))).id == 3
+
+
+def test_details_are_grouped_by_config():
+    details = [SimpleNamespace(attribute_set_config_id=config_id, field_display=field, object_type='text',
+                               object_value=field, text_before=None, text_after=None)
+               for config_id, field in ((1, 'name'), (2, 'name'), (1, 'brand'))]
+    matcher = SeoConfigMatcher(1, _session([_config(1)], default=_config(2), details=details))
+
+    assert [d['field_display'] for d in matcher.get_details(1)] == ['name', 'brand']
+    assert [d['field_display'] for d in matcher.get_details(2)] == ['name']
+    assert matcher.default.id == 2
+    assert matcher.get_details(3) == []
@@ -0,0 +1,105 @@
+# coding=utf-8
+import io
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+from catalog.extensions import exceptions as exc
+from catalog.services.imports.reader import ImportFileReader
+
+ROWS = [
+    ['Mẫu import sản phẩm'],
+    ['name', 'Brand', 'uom'],
+    ['Bút bi', 'Thiên Long', 'Cái'],
+    [None, '  ', None],
+    ['Bút chì', 'Thiên Long', 'Hộp'],
+]
+
+COLUMNS_CONFIG = {
+    'name': {'title': 'Tên sản phẩm', 'required': True},
+    'brand': {'title': 'Thương hiệu', 'required': True},
+    'model': {'title': 'Model', 'required': False},
+}
+
+
+def _xlsx(rows, sheet_name='Import_SanPham'):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = sheet_name
+    for row in rows:
+        sheet.append(row)
+    file = io.BytesIO()
+    workbook.save(file)
+    file.seek(0)
+    return file
+
+
+def test_reader_maps_data_rows_to_headers_and_skips_blank_rows():
+    with ImportFileReader(_xlsx(ROWS), sheet_name='Import_SanPham', title_row_offset=1) as reader:
+        assert reader.headers == ['name', 'Brand', 'uom']
+        assert reader.count_rows() == 2
+        assert list(reader.iter_rows()) == [
+            {'name': 'Bút bi', 'Brand': 'Thiên Long', 'uom': 'Cái'},
+            {'name': 'Bút chì', 'Brand': 'Thiên Long', 'uom': 'Hộp'},
+        ]
+
+
+def test_reader_keys_rows_by_the_code_row():
+    rows = [['Tên sản phẩm', 'Thương hiệu'], ['product name', 'brand'], ['Nhập tên', 'Chọn thương hiệu'],
+            ['Bút bi', 'Thiên Long']]
+
+    with ImportFileReader(_xlsx(rows), title_row_offset=2, code_row_offset=1) as reader:
+        assert list(reader.iter_rows()) == [{'product name': 'Bút bi', 'brand': 'Thiên Long'}]
+
+
+def test_reader_reads_sheet_by_index():
+    with ImportFileReader(_xlsx(ROWS), sheet_name=0, title_row_offset=1) as reader:
+        assert reader.count_rows() == 2
+
+
+def test_reader_rejects_unknown_sheet():
+    with pytest.raises(exc.BadRequestException):
+        ImportFileReader(_xlsx(ROWS), sheet_name='Update_SanPham')
+
+
+def test_reader_rejects_file_that_is_not_a_workbook():
+    with pytest.raises(exc.BadRequestException):
+        ImportFileReader(io.BytesIO(b'name,brand\nBut bi,Thien Long\n'))
+
+
+def test_validate_headers_accepts_codes_in_any_case():
+    with ImportFileReader(_xlsx(ROWS), title_row_offset=1) as reader:
+        reader.validate_headers(COLUMNS_CONFIG)
+
+
+def test_validate_headers_lists_missing_required_columns():
+    rows = [ROWS[0], ['name', 'uom']] + ROWS[2:]
+    with ImportFileReader(_xlsx(rows), title_row_offset=1) as reader:
+        with pytest.raises(exc.BadRequestException) as error:
+            reader.validate_headers(COLUMNS_CONFIG)
+
+    assert 'Thương hiệu' in error.value.message
+    assert 'Model' not in error.value.message
+
+
+def test_reader_reads_legacy_xls_files():
+    xlwt = pytest.importorskip('xlwt')
+    workbook = xlwt.Workbook()
+    sheet = workbook.add_sheet('Import_SanPham')
+    rows = ROWS + [['Thước kẻ', 12.0, datetime(2020, 1, 2)]]
+    date_style = xlwt.easyxf(num_format_str='yyyy-mm-dd')
+    for row_index, row in enumerate(rows):
+        for col_index, value in enumerate(row):
+            if isinstance(value, datetime):
+                sheet.write(row_index, col_index, value, date_style)
+            elif value is not None:
+                sheet.write(row_index, col_index, value)
+    file = io.BytesIO()
+    workbook.save(file)
+    file.seek(0)
+
+    with ImportFileReader(file, sheet_name='Import_SanPham', title_row_offset=1) as reader:
+        assert reader.headers == ['name', 'Brand', 'uom']
+        assert reader.count_rows() == 3
+        assert list(reader.iter_rows())[-1] == {'name': 'Thước kẻ', 'Brand': 12, 'uom': datetime(2020, 1, 2)}
@@ -0,0 +1,65 @@
+# coding=utf-8
+import pytest
+
+from catalog.constants import UOM_CODE_ATTRIBUTE
+from catalog.extensions import exceptions as exc
+from catalog.services.imports.resolvers import ReferenceDataResolver
+from tests.faker import fake
+
+
+@pytest.fixture()
+def seller(mysql_session_by_func):
+    return fake.seller()
+
+
+def test_resolver_matches_names_case_insensitively(seller):
+    brand = fake.brand(name='Thiên Long')
+    tax = fake.tax(label='10%')
+    resolver = ReferenceDataResolver(seller_id=seller.id)
+
+    assert resolver.brand_id(' thiên long ') == brand.id
+    assert resolver.tax_id('10%') == tax.id
+
+
+def test_resolver_reads_code_of_selection_cells(seller):
+    category = fake.category(code='VPP', seller_id=seller.id)
+    resolver = ReferenceDataResolver(seller_id=seller.id)
+
+    assert resolver.category_id('VPP=>Văn phòng phẩm') == category.id
+    assert resolver.category_id('vpp') == category.id
+
+
+def test_resolver_only_sees_categories_of_the_seller(seller):
+    fake.category(code='VPP', seller_id=fake.seller().id)
+    resolver = ReferenceDataResolver(seller_id=seller.id)
+
+    with pytest.raises(exc.BadRequestException):
+        resolver.category_id('VPP=>Văn phòng phẩm')
+
+
+def test_resolver_fails_the_row_on_unknown_value(seller):
+    fake.brand(name='Thiên Long')
+    resolver = ReferenceDataResolver(seller_id=seller.id)
+
+    with pytest.raises(exc.BadRequestException) as error:
+        resolver.brand_id('Hồng Hà')
+
+    assert 'Hồng Hà' in error.value.message
+
+
+def test_resolver_gives_none_for_empty_cells(seller):
+    resolver = ReferenceDataResolver(seller_id=seller.id)
+
+    assert resolver.brand_id(None) is None
+    assert resolver.product_type_id('  ') is None
+
+
+def test_resolver_gives_codes_and_uom_options(seller):
+    tax = fake.tax(label='10%')
+    uom = fake.attribute(code=UOM_CODE_ATTRIBUTE, value_type='selection')
+    box = fake.attribute_option(uom.id, value='Hộp')
+    resolver = ReferenceDataResolver(seller_id=seller.id)
+
+    assert resolver.tax_code('10%') == tax.code
+    assert resolver.uom_id('hộp') == box.id
+    assert resolver.shipping_type_ids(None) == []
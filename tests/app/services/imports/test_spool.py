@@ -0,0 +1,54 @@
+# coding=utf-8
+import io
+import os
+import time
+
+import pytest
+from mock import patch
+
+import config
+from catalog import models as m
+from catalog.services.imports import spool
+
+
+@pytest.fixture()
+def spool_dir(mysql_session_by_func, tmpdir):
+    with patch.object(config, 'IMPORT_SPOOL_DIR', str(tmpdir)):
+        yield tmpdir
+
+
+def _import(key, path=None):
+    m.db.session.add(m.FileImport(type='create_product', key=key, status='new', total_row=1, path=path,
+                                  created_by='import@teko.vn', name=f'{key}.xlsx'))
+    m.db.session.commit()
+
+
+def _expired_file(spool_dir, name):
+    path = str(spool_dir.join(name))
+    with open(path, 'wb') as f:
+        f.write(b'content')
+    expired_at = time.time() - config.IMPORT_SPOOL_TTL_HOURS * 3600 - 60
+    os.utime(path, (expired_at, expired_at))
+
+
+def test_spool_keeps_expired_files_not_uploaded_yet(spool_dir):
+    _import('uploaded', path='https://files/uploaded.xlsx')
+    _import('pending')
+    for name in ('uploaded', 'pending', 'orphan'):
+        _expired_file(spool_dir, name)
+
+    spool.spool_file(io.BytesIO(b'new file'), 'new')
+
+    assert sorted(os.listdir(str(spool_dir))) == ['new', 'pending']
+
+
+def test_spooled_file_is_read_before_the_uploaded_one(spool_dir):
+    spool.spool_file(io.BytesIO(b'new file'), 'new')
+
+    assert spool.open_import_file(m.FileImport(key='new')).read() == b'new file'
+
+
+def test_spool_requires_a_configured_dir():
+    with patch.object(config, 'IMPORT_SPOOL_DIR', None):
+        with pytest.raises(IOError):
+            spool.spool_file(io.BytesIO(b'new file'), 'new')
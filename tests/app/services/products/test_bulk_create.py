@@ -0,0 +1,172 @@
+# coding=utf-8
+import pytest
+from mock import patch
+
+from catalog import models as m
+from catalog.constants import UOM_CODE_ATTRIBUTE, UOM_RATIO_CODE_ATTRIBUTE
+from catalog.services.products import sellable as sellable_service
+from catalog.services.products.bulk_create import BulkProductCreator
+from catalog.services.products.product import ProductService
+from catalog.services.products.variant import ProductVariantService
+from tests.faker import fake
+
+EMAIL = 'import@teko.vn'
+
+
+@pytest.fixture()
+def data(mysql_session_by_func):
+    attribute_set = fake.attribute_set()
+    category = fake.category(attribute_set_id=attribute_set.id)
+    uom = fake.attribute(code=UOM_CODE_ATTRIBUTE, value_type='selection')
+    ratio = fake.attribute(code=UOM_RATIO_CODE_ATTRIBUTE, value_type='number')
+    color = fake.attribute(value_type='selection')
+    return {
+        'seller': {'id': fake.seller().id, 'isAutoGeneratedSKU': True},
+        'category': category,
+        'brand': fake.brand(),
+        'tax': fake.tax(),
+        'uom': uom,
+        'ratio': ratio,
+        'color': color,
+        'units': [fake.attribute_option(uom.id, value=value) for value in ('Cái', 'Hộp')],
+        'colors': [fake.attribute_option(color.id, value=value) for value in ('Đỏ', 'Xanh')],
+    }
+
+
+def _product_data(data, name):
+    return {
+        'name': name,
+        'category_id': data['category'].id,
+        'brand_id': data['brand'].id,
+        'tax_in_code': data['tax'].code,
+        'type': 'product',
+        'model': 'model',
+        'warranty_months': 12,
+    }
+
+
+def _variants_data(data, variants):
+    return [{'attributes': [
+        {'id': data['color'].id, 'value': color.id},
+        {'id': data['uom'].id, 'value': unit.id},
+        {'id': data['ratio'].id, 'value': ratio},
+    ]} for color, unit, ratio in variants]
+
+
+def _create_with_orm(data, name, variants):
+    product = ProductService.get_instance().create_product(_product_data(data, name), EMAIL)
+    created = ProductVariantService.get_instance().create_variants(
+        product.id, _variants_data(data, variants), EMAIL)
+    with patch('catalog.extensions.signals.sellable_create_signal.send'):
+        sellable_service.create_sellable_products({
+            'product_id': product.id,
+            'sellable_products': [{'variant_id': v['id'], 'created_by': EMAIL} for v in created],
+        }, seller=data['seller'])
+    return product
+
+
+def _create_with_bulk(data, name, variants):
+    creator = BulkProductCreator(data['seller'], EMAIL)
+    creator.add(0, _product_data(data, name), [
+        dict(v, sellable={'created_by': EMAIL}) for v in _variants_data(data, variants)
+    ])
+    with patch('catalog.extensions.signals.sellable_create_signal.send'):
+        result, = creator.save()
+    assert result.error is None
+    return result.product
+
+
+def _snapshot(product):
+    m.db.session.expire_all()
+    product = m.Product.query.get(product.id)
+    variants = m.ProductVariant.query.filter(
+        m.ProductVariant.product_id == product.id).order_by(m.ProductVariant.id).all()
+    variant_ids = [v.id for v in variants]
+    sellables = m.SellableProduct.query.filter(
+        m.SellableProduct.product_id == product.id).order_by(m.SellableProduct.variant_id).all()
+    sku_index = {s.sku: i for i, s in enumerate(sellables)}
+
+    def _uom_ratios(variant):
+        # variant ids differ between the two paths, compare their positions
+        return [(variant_ids.index(int(item.split(':')[0])), item.split(':')[1])
+                for item in (variant.all_uom_ratios or '').split(',') if item]
+
+    return {
+        'product': (product.name, product.url_key, product.category_id, product.attribute_set_id,
+                    product.editing_status_code, product.default_variant_id == variant_ids[0]),
+        'categories': sorted(c.category_id for c in m.ProductCategory.query.filter(
+            m.ProductCategory.product_id == product.id)),
+        'variants': [(v.name, v.url_key, _uom_ratios(v), sorted(
+            (a.attribute_id, a.value) for a in m.VariantAttribute.query.filter(
+                m.VariantAttribute.variant_id == v.id))) for v in variants],
+        'sellables': [(s.name, s.unit_id, s.uom_code, s.uom_name, float(s.uom_ratio), s.need_convert_qty,
+                       s.editing_status_code, s.brand_id, s.category_id, s.attribute_set_id,
+                       sku_index.get(s.seller_sku),
+                       m.SellableProductSeoInfoTerminal.query.filter(
+                           m.SellableProductSeoInfoTerminal.sellable_product_id == s.id).count(),
+                       sorted(t.shipping_type_id for t in m.SellableProductShippingType.query.filter(
+                           m.SellableProductShippingType.sellable_product_id == s.id)))
+                      for s in sellables],
+    }
+
+
+def test_bulk_create_matches_orm_path_for_single_uom_product(data):
+    variants = [(data['colors'][0], data['units'][0], 1), (data['colors'][1], data['units'][0], 1)]
+
+    expected = _snapshot(_create_with_orm(data, 'Áo thun', variants))
+    actual = _snapshot(_create_with_bulk(data, 'Áo thun', variants))
+
+    assert actual == expected
+
+
+def test_bulk_create_matches_orm_path_for_multi_uom_product(data):
+    cai, hop = data['units']
+    variants = [
+        (data['colors'][0], cai, 1),
+        (data['colors'][0], hop, 10),
+        (data['colors'][0], cai, 5),
+        (data['colors'][1], cai, 1),
+    ]
+
+    expected = _snapshot(_create_with_orm(data, 'Bút bi', variants))
+    actual = _snapshot(_create_with_bulk(data, 'Bút bi', variants))
+
+    assert actual == expected
+
+
+def test_bulk_create_reports_bad_row_and_keeps_others(data):
+    creator = BulkProductCreator(data['seller'], EMAIL)
+    variants = _variants_data(data, [(data['colors'][0], data['units'][0], 1)])
+    creator.add('good', _product_data(data, 'Bút chì'), variants)
+    creator.add('bundle', dict(_product_data(data, 'Combo'), is_bundle=True), variants)
+
+    with patch('catalog.extensions.signals.sellable_create_signal.send') as send:
+        results = {r.key: r for r in creator.save()}
+
+    assert results['good'].error is None
+    assert len(results['good'].sellables) == 1
+    assert results['bundle'].error
+    assert send.call_count == 1
+    assert m.Product.query.filter(m.Product.name == 'Combo').count() == 0
+
+
+def test_bulk_create_without_commit_leaves_signals_to_the_caller(data):
+    creator = BulkProductCreator(data['seller'], EMAIL)
+    creator.add(0, _product_data(data, 'Bút chì'), _variants_data(data, [(data['colors'][0], data['units'][0], 1)]))
+
+    with patch('catalog.extensions.signals.sellable_create_signal.send') as send:
+        result, = creator.save(commit=False)
+
+    assert send.call_count == 0
+    assert len(result.sellables) == 1
+
+
+def test_single_create_does_not_reuse_skus_reserved_by_bulk_create(data):
+    reserved = sellable_service.allocate_skus(3)
+
+    product = _create_with_orm(data, 'Bút bi', [(data['colors'][0], data['units'][0], 1)])
+
+    sku = m.SellableProduct.query.filter(m.SellableProduct.product_id == product.id).one().sku
+    assert sku not in reserved
+    assert int(sku) == int(reserved[-1]) + 1
+    assert sellable_service.allocate_skus(1) == [str(int(sku) + 1)]
@@ -0,0 +1,109 @@
+# coding=utf-8
+import pytest
+from mock import patch, MagicMock
+
+from catalog import models as m
+from catalog.services.products import search_index
+from catalog.services.products.search_index import normalize, ngrams, candidate_ids_query, on_sellable_changed
+from tests.faker import fake
+
+
+def test_normalize_strips_accents_case_and_spaces():
+    assert normalize(' Bàn  Phím  Cơ ') == 'ban phim co'
+    assert normalize(None) == ''
+    assert normalize(123) == '123'
+
+
+def test_ngrams():
+    assert ngrams('Bàn') == {'ban'}
+    assert ngrams('abcd') == {'abc', 'bcd'}
+    assert ngrams('ab') == set()
+    assert ngrams('abcd', size=2) == {'ab', 'bc', 'cd'}
+
+
+def test_candidate_ids_query_needs_a_built_index_and_long_keywords():
+    with patch.object(search_index, 'is_index_built', return_value=True):
+        assert candidate_ids_query(['ab']) is None
+    with patch.object(search_index, 'is_index_built', return_value=False):
+        assert candidate_ids_query(['phim']) is None
+
+
+def test_candidate_ids_query_matches_every_ngram_or_the_sku(mysql_session_by_func):
+    keyboard = fake.sellable_product(name='Bàn phím cơ')
+    mouse = fake.sellable_product(name='Chuột không dây')
+    search_index.index_sellables(m.db.session, [keyboard.id, mouse.id])
+    m.db.session.commit()
+
+    def candidates(keywords):
+        return {id for id, in m.db.session.execute(candidate_ids_query(keywords))}
+
+    with patch.object(search_index, 'is_index_built', return_value=True):
+        assert candidates(['phim']) == {keyboard.id}
+        assert candidates(['khong day']) == {mouse.id}
+        assert candidates(['phim day']) == set()
+        assert mouse.id in candidates([mouse.sku])
+
+
+@pytest.fixture()
+def indexed(mysql_session_by_func):
+    with patch.object(search_index, '_index_committed') as index:
+        yield index
+
+
+def _changed(sellable_id, write=True):
+    if write:
+        m.db.session.add(m.FanOutJob(name=fake.text()))
+        m.db.session.flush()
+    on_sellable_changed(MagicMock(id=sellable_id))
+
+
+def test_sellables_are_indexed_once_on_commit(indexed):
+    _changed(1)
+    _changed(2)
+    assert indexed.call_count == 0
+
+    m.db.session.commit()
+
+    indexed.assert_called_once_with([1, 2])
+
+
+def test_sellables_are_not_indexed_on_rollback(indexed):
+    _changed(1)
+
+    m.db.session.rollback()
+
+    assert indexed.call_count == 0
+
+
+def test_released_savepoint_waits_for_the_outer_commit(indexed):
+    _changed(1)
+    with m.db.session.begin_nested():
+        _changed(2)
+    assert indexed.call_count == 0
+
+    m.db.session.rollback()
+
+    assert indexed.call_count == 0
+
+
+def test_savepoint_rollback_keeps_the_outer_sellables(indexed):
+    _changed(1)
+    with pytest.raises(ValueError):
+        with m.db.session.begin_nested():
+            _changed(2)
+            raise ValueError()
+
+    m.db.session.commit()
+
+    indexed.assert_called_once_with([1])
+
+
+def test_committed_sellables_are_indexed_when_the_transaction_ends(indexed):
+    m.db.session.commit()
+    _changed(1, write=False)
+    _changed(2, write=False)
+    assert indexed.call_count == 0
+
+    m.db.session.close()
+
+    indexed.assert_called_once_with([1, 2])
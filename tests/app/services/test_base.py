@@ -0,0 +1,44 @@
+# coding=utf-8
+import pytest
+from sqlalchemy import column
+
+from catalog.extensions import exceptions as exc
+from catalog.services._base import encode_cursor, decode_cursor, _seek_condition
+
+
+def _sql(condition):
+    return str(condition.compile(compile_kwargs={'literal_binds': True}))
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(['2020-01-02 03:04:05', 12])
+
+    assert decode_cursor(cursor, 2) == ['2020-01-02 03:04:05', 12]
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(['?/+' * 10, 1])
+
+    assert not set(cursor) & set('+/?&')
+
+
+# not base64, base64 of the JSON object {"id":1}, missing
+@pytest.mark.parametrize('cursor', ['not a cursor', 'eyJpZCI6MX0=', None])
+def test_decode_cursor_rejects_invalid_cursor(cursor):
+    with pytest.raises(exc.BadRequestException):
+        decode_cursor(cursor, 1)
+
+
+def test_decode_cursor_rejects_cursor_of_another_sort_key():
+    with pytest.raises(exc.BadRequestException):
+        decode_cursor(encode_cursor([1]), 2)
+
+
+def test_seek_condition_on_one_column():
+    assert _sql(_seek_condition([column('id')], [10])) == 'id < 10'
+
+
+def test_seek_condition_expands_row_value_comparison():
+    condition = _seek_condition([column('updated_at'), column('id')], ['2020-01-02', 10])
+
+    assert _sql(condition) == "updated_at < '2020-01-02' OR updated_at = '2020-01-02' AND id < 10"
@@ -0,0 +1,60 @@
+# coding=utf-8
+import pytest
+from mock import patch
+
+from catalog import models as m
+from catalog.utils import fan_out
+from catalog.utils.fan_out import fan_out_by_id_range
+
+SPARSE_IDS = [3, 10, 11, 500, 501, 9000, 9001]
+
+
+@pytest.fixture()
+def db_session(session):
+    db_session = m.db.session()
+
+    def execute(statement, params):
+        return [(id,) for id in SPARSE_IDS if id > params['last_id']][:params['limit']]
+
+    with patch.object(db_session, 'execute', side_effect=execute):
+        yield db_session
+
+
+def _saved(job):
+    m.db.session.expire_all()
+    return m.FanOutJob.query.get(job.id)
+
+
+def test_chunks_page_over_matching_ids(db_session):
+    chunks = []
+
+    job = fan_out_by_id_range(db_session, 'brand:1', ' WHERE a.brand_id = 1',
+                              lambda s, start, end: chunks.append((start, end)), chunk_size=3, rate=0)
+
+    assert chunks == [(3, 11), (500, 9000), (9001, 9001)]
+    job = _saved(job)
+    assert job.status == m.FanOutJob.STATUS_DONE
+    assert (job.start_id, job.end_id, job.last_id, job.chunk_count) == (3, 9001, 9001, 3)
+
+
+def test_failed_chunk_keeps_the_progress_and_fails_the_job(db_session):
+    def process_chunk(s, start, end):
+        if start == 500:
+            raise ValueError('chunk failed')
+
+    with pytest.raises(ValueError):
+        fan_out_by_id_range(db_session, 'brand:1', ' WHERE a.brand_id = 1', process_chunk, chunk_size=3, rate=0)
+
+    job = m.FanOutJob.query.filter(m.FanOutJob.name == 'brand:1').one()
+    assert job.status == m.FanOutJob.STATUS_FAILED
+    assert (job.last_id, job.chunk_count) == (11, 1)
+
+
+def test_chunks_are_rate_limited(db_session):
+    with patch.object(fan_out.time, 'sleep') as sleep:
+        fan_out_by_id_range(db_session, 'brand:1', ' WHERE a.brand_id = 1', lambda s, start, end: None,
+                            chunk_size=3, rate=2)
+
+    # no wait after the last chunk, which is not full
+    assert sleep.call_count == 2
+    assert all(0 <= call[0][0] <= 0.5 for call in sleep.call_args_list)